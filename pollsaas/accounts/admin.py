@@ -3,6 +3,12 @@ from django.contrib import admin
 # Register your models here.
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
+from django.utils.text import capfirst
+
+from polls.models import Poll
+
+from .deletion import request_account_deletion, retry_deletions
+from .models import AccountDeletion, CreatorStats
 
 User = get_user_model()
 
@@ -46,7 +52,7 @@ class CustomUserAdmin(UserAdmin):
         return form
     
     # Custom actions
-    actions = ['make_premium', 'remove_premium', 'reset_poll_count']
+    actions = ['make_premium', 'remove_premium', 'reset_poll_count', 'delete_accounts']
     
     def make_premium(self, request, queryset):
         """Make selected users premium"""
@@ -73,4 +79,94 @@ class CustomUserAdmin(UserAdmin):
             request, 
             f'Poll count reset for {updated} users.'
         )
-    reset_poll_count.short_description = 'Reset poll count for selected users'
\ No newline at end of file
+    reset_poll_count.short_description = 'Reset poll count for selected users'
+    
+    def delete_accounts(self, request, queryset):
+        """Queue selected users for background deletion"""
+        for user in queryset:
+            request_account_deletion(user)
+        self.message_user(
+            request,
+            f'{queryset.count()} accounts were deactivated and queued for deletion.'
+        )
+    delete_accounts.short_description = 'Delete selected accounts (in background)'
+    
+    def delete_model(self, request, obj):
+        """Heavy accounts are deleted in the background"""
+        request_account_deletion(obj)
+    
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            request_account_deletion(user)
+    
+    def get_deleted_objects(self, objs, request):
+        """
+        Summarise instead of collecting every poll and vote for the
+        confirmation page; the background deletion removes the polls and
+        anonymizes the votes
+        """
+        user_ids = [user.pk for user in objs]
+        deleted_objects = [f"{capfirst(User._meta.verbose_name)}: {user}" for user in objs]
+        model_count = {
+            User._meta.verbose_name_plural: len(user_ids),
+            Poll._meta.verbose_name_plural: Poll.all_objects.filter(creator_id__in=user_ids).count(),
+        }
+        perms_needed = set() if self.has_delete_permission(request) else {User._meta.verbose_name}
+        return deleted_objects, model_count, perms_needed, []
+
+
+@admin.register(CreatorStats)
+class CreatorStatsAdmin(admin.ModelAdmin):
+    """
+    Read-only view of materialized creator statistics
+    """
+    list_display = (
+        'user', 'total_polls', 'active_polls', 'total_votes',
+        'unique_voters', 'last_activity_at', 'updated_at'
+    )
+    search_fields = ('user__email', 'user__username')
+    readonly_fields = (
+        'user', 'total_polls', 'active_polls', 'total_votes',
+        'unique_voters', 'last_activity_at', 'updated_at'
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+    def has_add_permission(self, request):
+        """Rows are maintained by the application"""
+        return False
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    """
+    Progress of background account deletions
+    """
+    list_display = (
+        'email', 'status', 'progress', 'votes_anonymized', 'votes_total',
+        'polls_removed', 'polls_total', 'requested_at', 'completed_at'
+    )
+    list_filter = ('status', 'requested_at')
+    search_fields = ('email',)
+    readonly_fields = (
+        'user', 'email', 'status', 'votes_total', 'votes_anonymized',
+        'polls_total', 'polls_removed', 'error', 'requested_at',
+        'updated_at', 'completed_at'
+    )
+
+    actions = ['retry_failed']
+
+    def has_add_permission(self, request):
+        """Deletions are queued from the user admin"""
+        return False
+
+    def retry_failed(self, request, queryset):
+        """Queue failed deletions again"""
+        retried = retry_deletions(queryset)
+        self.message_user(
+            request,
+            f'{retried} failed deletions were queued again.'
+        )
+    retry_failed.short_description = 'Retry selected failed deletions'
+
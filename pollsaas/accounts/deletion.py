@@ -0,0 +1,116 @@
+"""
+Background account deletion.
+
+Deleting a user directly makes the ORM null ``Vote.voter`` on every vote
+they cast and cascade through every poll they own, all inside one
+request. ``request_account_deletion`` instead deactivates the account
+and queues an ``AccountDeletion``; the ``process_account_deletions``
+command then anonymizes the user's votes in primary-key batches, purges
+owned polls through the poll purger (keeping creator stats current) and
+only deletes the user row once nothing large is left hanging off it.
+Progress is saved after every batch, so a crashed worker resumes where
+it stopped.
+"""
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from polls.models import Poll, Vote
+from polls.purge import PURGE_BATCH_SIZE, PURGE_PAUSE, delete_poll, purge_poll
+
+from .models import AccountDeletion, CreatorStats
+
+
+def request_account_deletion(user):
+    """Lock the account and queue it for deletion"""
+    with transaction.atomic():
+        type(user).objects.filter(pk=user.pk).update(is_active=False)
+        job, _ = AccountDeletion.objects.get_or_create(
+            user=user, defaults={'email': user.email}
+        )
+        if job.status == 'failed':
+            retry_deletions(AccountDeletion.objects.filter(pk=job.pk))
+            job.refresh_from_db()
+    return job
+
+
+def retry_deletions(queryset):
+    """Queue failed deletions again; they resume from their saved progress"""
+    return queryset.filter(status='failed').update(
+        status='pending', error='', updated_at=timezone.now()
+    )
+
+
+def claim_next_deletion(stale_after=timedelta(minutes=10)):
+    """
+    Claim the oldest pending deletion, or a running one whose worker has
+    stopped reporting progress.
+    """
+    stale_before = timezone.now() - stale_after
+    with transaction.atomic():
+        job = (
+            AccountDeletion.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='running', updated_at__lt=stale_before))
+            .order_by('requested_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def _anonymize_votes(job, batch_size, pause):
+    while True:
+        ids = list(
+            Vote.objects.filter(voter_id=job.user_id).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        Vote.objects.filter(id__in=ids).update(voter=None)
+        job.votes_anonymized += len(ids)
+        job.save(update_fields=['votes_anonymized', 'updated_at'])
+        time.sleep(pause)
+
+
+def _remove_polls(job, batch_size, pause):
+    for poll in Poll.all_objects.filter(creator_id=job.user_id).order_by('id'):
+        if poll.deleted_at is None:
+            delete_poll(poll)
+        purge_poll(poll.id, batch_size=batch_size, pause=pause)
+        job.polls_removed += 1
+        job.save(update_fields=['polls_removed', 'updated_at'])
+
+
+def run_account_deletion(job, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE):
+    """Carry out a claimed deletion job; safe to call again after a crash"""
+    try:
+        if job.user_id is not None:
+            if not job.votes_total and not job.polls_total:
+                job.votes_total = Vote.objects.filter(voter_id=job.user_id).count()
+                job.polls_total = Poll.all_objects.filter(creator_id=job.user_id).count()
+                job.save(update_fields=['votes_total', 'polls_total', 'updated_at'])
+
+            _anonymize_votes(job, batch_size, pause)
+            _remove_polls(job, batch_size, pause)
+
+            with transaction.atomic():
+                CreatorStats.objects.filter(user_id=job.user_id).delete()
+                # Only small relations are left for the collector to visit
+                job.user.delete()
+            job.user = None
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    job.status = 'completed'
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'completed_at', 'updated_at'])
+    return job
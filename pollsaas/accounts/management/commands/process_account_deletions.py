@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from accounts.deletion import claim_next_deletion, run_account_deletion
+from polls.purge import PURGE_BATCH_SIZE, PURGE_PAUSE
+
+
+class Command(BaseCommand):
+    help = "Process queued account deletions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=PURGE_BATCH_SIZE,
+            help="Votes updated or deleted per statement"
+        )
+        parser.add_argument(
+            '--pause', type=float, default=PURGE_PAUSE,
+            help="Seconds to wait between batches"
+        )
+        parser.add_argument(
+            '--stale-minutes', type=int, default=10,
+            help="Reclaim running deletions with no progress for this long"
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new deletions instead of exiting when idle"
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=10.0,
+            help="Seconds to wait when idle (with --loop)"
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_minutes'])
+
+        while True:
+            job = claim_next_deletion(stale_after=stale_after)
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f"Deleting account {job.email} (job {job.pk})")
+            try:
+                run_account_deletion(job, batch_size=options['batch_size'], pause=options['pause'])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"Job {job.pk} failed: {e}"))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"Deleted {job.email}: {job.votes_anonymized} votes anonymized, "
+                f"{job.polls_removed} polls removed"
+            ))
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.stats import rebuild_creator_stats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute materialized creator stats and report any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Users recomputed per upsert"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = 0
+        drifted = 0
+
+        while True:
+            user_ids = list(
+                User.objects
+                .filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+
+            drift = rebuild_creator_stats(user_ids)
+            for user_id, fields in drift.items():
+                details = ', '.join(
+                    f"{field} {stored} -> {actual}"
+                    for field, (stored, actual) in fields.items()
+                )
+                self.stdout.write(f"User {user_id}: {details}")
+
+            checked += len(user_ids)
+            drifted += len(drift)
+            last_id = user_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} users, repaired {drifted} drifted stats rows."
+        ))
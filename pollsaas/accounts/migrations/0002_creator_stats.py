@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreatorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='creator_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+                ('total_polls', models.IntegerField(default=0, verbose_name='Total Polls')),
+                ('active_polls', models.IntegerField(default=0, verbose_name='Active Polls')),
+                ('total_votes', models.IntegerField(default=0, verbose_name='Total Votes')),
+                ('unique_voters', models.IntegerField(default=0, verbose_name='Unique Voters')),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Activity')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Creator Stats',
+                'verbose_name_plural': 'Creator Stats',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_creator_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email Address')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Status')),
+                ('votes_total', models.PositiveIntegerField(default=0)),
+                ('votes_anonymized', models.PositiveIntegerField(default=0)),
+                ('polls_total', models.PositiveIntegerField(default=0)),
+                ('polls_removed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='account_deletion', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Account Deletion',
+                'verbose_name_plural': 'Account Deletions',
+                'ordering': ['-requested_at'],
+                'indexes': [models.Index(fields=['status', 'requested_at'], name='accounts_ac_status_4a1f8e_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
 class CustomUser(AbstractUser):
@@ -61,10 +62,130 @@ class CustomUser(AbstractUser):
         """Check if user can create a new poll"""
         return self.is_premium_active or self.polls_created < 1
     
-    def increment_poll_count(self):
+    @property
+    def poll_limit(self):
+        """Maximum number of polls this user may hold"""
+        return 50 if self.is_premium else 1
+    
+    def reserve_poll_slots(self, count=1):
+        """
+        Atomically claim quota for ``count`` new polls.
+        A single conditional UPDATE, so parallel submits cannot both pass
+        the limit. Returns True if the slots were reserved.
+        """
+        reserved = CustomUser.objects.filter(
+            pk=self.pk,
+            polls_created__lte=self.poll_limit - count
+        ).update(polls_created=models.F('polls_created') + count)
+        if reserved:
+            self.polls_created += count
+        return bool(reserved)
+    
+    def release_poll_slots(self, count=1):
+        """Give back quota after polls are deleted"""
+        CustomUser.objects.filter(pk=self.pk).update(
+            polls_created=Greatest(models.F('polls_created') - count, 0)
+        )
+        self.polls_created = max(0, self.polls_created - count)
+    
+    def increment_poll_count(self, count=1):
         """Increment the user's poll count"""
-        self.polls_created += 1
-        self.save(update_fields=['polls_created'])
+        CustomUser.objects.filter(pk=self.pk).update(
+            polls_created=models.F('polls_created') + count
+        )
+        self.polls_created += count
         
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+class CreatorStats(models.Model):
+    """
+    Materialized dashboard statistics for a poll creator.
+    Kept current incrementally by the vote pipeline and poll lifecycle
+    views; ``reconcile_creator_stats`` repairs any drift.
+    """
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='creator_stats',
+        verbose_name="User"
+    )
+    total_polls = models.IntegerField(default=0, verbose_name="Total Polls")
+    active_polls = models.IntegerField(default=0, verbose_name="Active Polls")
+    total_votes = models.IntegerField(default=0, verbose_name="Total Votes")
+    unique_voters = models.IntegerField(default=0, verbose_name="Unique Voters")
+    last_activity_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Last Activity"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Creator Stats"
+        verbose_name_plural = "Creator Stats"
+
+    def __str__(self):
+        return f"Stats for {self.user_id}"
+
+
+class AccountDeletion(models.Model):
+    """
+    Background deletion of a user account: votes are anonymized and owned
+    polls removed in batches before the user row itself is deleted.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='account_deletion',
+        verbose_name="User"
+    )
+    email = models.EmailField(verbose_name="Email Address")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Status"
+    )
+
+    # Progress, persisted after every batch
+    votes_total = models.PositiveIntegerField(default=0)
+    votes_anonymized = models.PositiveIntegerField(default=0)
+    polls_total = models.PositiveIntegerField(default=0)
+    polls_removed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    requested_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Account Deletion"
+        verbose_name_plural = "Account Deletions"
+        ordering = ['-requested_at']
+        indexes = [
+            models.Index(fields=['status', 'requested_at']),
+        ]
+
+    @property
+    def progress(self):
+        """Percentage of votes and polls processed so far"""
+        if self.status == 'completed':
+            return 100
+        total = self.votes_total + self.polls_total
+        if not total:
+            return 0
+        return min(99, int((self.votes_anonymized + self.polls_removed) * 100 / total))
+
+    def __str__(self):
+        return f"Deletion of {self.email} ({self.get_status_display()})"
@@ -0,0 +1,114 @@
+"""
+Incremental maintenance of per-creator dashboard statistics.
+
+``bump_creator_stats`` applies deltas with a single ``UPDATE ... SET x = x + n``
+so concurrent votes never lose increments. ``rebuild_creator_stats``
+recomputes rows from grouped aggregates over ``Poll`` and is used both to
+seed missing rows and by the reconciliation command.
+"""
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from polls.models import Poll
+
+from .models import CreatorStats
+
+STAT_FIELDS = ('total_polls', 'active_polls', 'total_votes', 'unique_voters')
+
+
+def bump_creator_stats(user_id, polls=0, active=0, votes=0, voters=0):
+    """Apply deltas to a creator's stats row, building it if missing"""
+    deltas = {
+        'total_polls': polls,
+        'active_polls': active,
+        'total_votes': votes,
+        'unique_voters': voters,
+    }
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    updates['last_activity_at'] = timezone.now()
+    updates['updated_at'] = timezone.now()
+
+    if not CreatorStats.objects.filter(user_id=user_id).update(**updates):
+        # No row yet: the aggregates already include this change
+        rebuild_creator_stats([user_id])
+
+
+def compute_creator_stats(user_ids):
+    """Grouped aggregates over Poll for the given creators"""
+    rows = (
+        Poll.objects
+        .filter(creator_id__in=user_ids)
+        .values('creator_id')
+        .annotate(
+            total_polls=Count('id'),
+            active_polls=Count('id', filter=Q(status='active')),
+            total_votes=Sum('total_votes'),
+            unique_voters=Sum('unique_voters'),
+            last_poll_at=Max('created_at'),
+        )
+    )
+    computed = {
+        user_id: {field: 0 for field in STAT_FIELDS} | {'last_poll_at': None}
+        for user_id in user_ids
+    }
+    for row in rows:
+        computed[row['creator_id']] = {
+            'total_polls': row['total_polls'],
+            'active_polls': row['active_polls'],
+            'total_votes': row['total_votes'] or 0,
+            'unique_voters': row['unique_voters'] or 0,
+            'last_poll_at': row['last_poll_at'],
+        }
+    return computed
+
+
+def rebuild_creator_stats(user_ids):
+    """
+    Recompute stats rows for the given creators in one upsert.
+    Returns ``{user_id: {field: (stored, actual)}}`` for rows that drifted.
+    """
+    user_ids = list(user_ids)
+    computed = compute_creator_stats(user_ids)
+    existing = CreatorStats.objects.in_bulk(user_ids)
+
+    drift = {}
+    rows = []
+    for user_id, values in computed.items():
+        stored = existing.get(user_id)
+        last_activity_at = stored.last_activity_at if stored else None
+        if values['last_poll_at'] and (
+            last_activity_at is None or values['last_poll_at'] > last_activity_at
+        ):
+            last_activity_at = values['last_poll_at']
+
+        changed = {
+            field: (getattr(stored, field) if stored else None, values[field])
+            for field in STAT_FIELDS
+            if stored is None or getattr(stored, field) != values[field]
+        }
+        if stored is not None and changed:
+            drift[user_id] = changed
+
+        rows.append(CreatorStats(
+            user_id=user_id,
+            last_activity_at=last_activity_at,
+            updated_at=timezone.now(),
+            **{field: values[field] for field in STAT_FIELDS}
+        ))
+
+    CreatorStats.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[*STAT_FIELDS, 'last_activity_at', 'updated_at'],
+    )
+    return drift
+
+
+def get_creator_stats(user):
+    """Fetch a creator's stats with a single primary-key read"""
+    try:
+        return CreatorStats.objects.get(user=user)
+    except CreatorStats.DoesNotExist:
+        rebuild_creator_stats([user.pk])
+        return CreatorStats.objects.get(user=user)
@@ -1,3 +1,122 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+
+from polls.models import Poll
+
+from .deletion import (
+    claim_next_deletion, request_account_deletion, retry_deletions, run_account_deletion,
+)
+from .models import AccountDeletion
+
+User = get_user_model()
+
+
+class AccountDeletionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='leaving', email='leaving@example.com', password='secret'
+        )
+        Poll.objects.create(creator=self.user, title='Lunch?', status='active')
+
+    def mark_failed(self, job):
+        AccountDeletion.objects.filter(pk=job.pk).update(status='failed', error='boom')
+
+    def test_deletion_runs_in_the_background(self):
+        job = request_account_deletion(self.user)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+        job = claim_next_deletion()
+        run_account_deletion(job, pause=0)
+        self.assertEqual(job.status, 'completed')
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Poll.all_objects.filter(creator_id=self.user.pk).exists())
+
+    def test_requesting_again_requeues_a_failed_deletion(self):
+        job = request_account_deletion(self.user)
+        self.mark_failed(job)
+
+        job = request_account_deletion(self.user)
+        self.assertEqual((job.status, job.error), ('pending', ''))
+        self.assertEqual(claim_next_deletion().pk, job.pk)
+
+    def test_retry_only_touches_failed_deletions(self):
+        job = request_account_deletion(self.user)
+        self.assertEqual(retry_deletions(AccountDeletion.objects.all()), 0)
+        self.mark_failed(job)
+        self.assertIsNone(claim_next_deletion())
+        self.assertEqual(retry_deletions(AccountDeletion.objects.all()), 1)
+        self.assertEqual(claim_next_deletion().pk, job.pk)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='creator', email='creator@example.com', password='secret'
+        )
+        for title in ['First', 'Second', 'Third']:
+            Poll.objects.create(creator=self.user, title=title, status='active')
+        self.client.force_login(self.user)
+        self.url = reverse('accounts:dashboard')
+
+    def titles(self, response):
+        return [poll.title for poll in response.context['polls']]
+
+    def test_pages_newest_first_with_cursors(self):
+        with mock.patch('accounts.views.DASHBOARD_PAGE_SIZE', 2):
+            first = self.client.get(self.url)
+            self.assertEqual(self.titles(first), ['Third', 'Second'])
+            self.assertEqual(first.context['approx_total'], 3)
+
+            cursor = first.context['polls'].next_cursor
+            second = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(self.titles(second), ['First'])
+            self.assertFalse(second.context['polls'].has_next)
+
+            back = self.client.get(self.url, {'cursor': second.context['polls'].previous_cursor})
+            self.assertEqual(self.titles(back), ['Third', 'Second'])
+
+    def test_invalid_cursor_shows_the_first_page(self):
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+        self.assertEqual(self.titles(response), ['Third', 'Second', 'First'])
+
+    def test_status_filter_omits_the_total(self):
+        Poll.objects.filter(title='First').update(status='closed')
+        response = self.client.get(self.url, {'status': 'closed'})
+        self.assertEqual(self.titles(response), ['First'])
+        self.assertIsNone(response.context['approx_total'])
+
+
+class PollQuotaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='free', email='free@example.com', password='secret'
+        )
+
+    def test_parallel_reservations_cannot_both_pass_the_limit(self):
+        # Two requests loaded the user before either reserved
+        first, second = User.objects.get(pk=self.user.pk), User.objects.get(pk=self.user.pk)
+        self.assertTrue(first.reserve_poll_slots())
+        self.assertFalse(second.reserve_poll_slots())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.polls_created, 1)
+
+    def test_released_slots_can_be_reserved_again(self):
+        self.assertTrue(self.user.reserve_poll_slots())
+        self.user.release_poll_slots()
+        self.user.release_poll_slots()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.polls_created, 0)
+        self.assertTrue(self.user.reserve_poll_slots())
 
-# Create your tests here.
+    def test_quick_poll_over_quota_shows_the_error(self):
+        self.client.force_login(self.user)
+        data = {'question': 'Lunch?', 'poll_type': 'yes_no', 'expires_in_hours': ''}
+        self.assertEqual(self.client.post(reverse('polls:quick_poll'), data).status_code, 302)
+        response = self.client.post(reverse('polls:quick_poll'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertEqual(Poll.objects.filter(creator=self.user).count(), 1)
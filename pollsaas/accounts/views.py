@@ -12,16 +12,23 @@ from .forms import CustomUserCreationForm, CustomAuthenticationForm, ContactForm
 from django.contrib.auth import get_user_model
 from django.db.models import Sum
 from django.conf import settings
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.views.decorators.http import require_http_methods
 from django.http import JsonResponse
 from django.utils import timezone
 
 from polls.models import Poll
+from polls.pagination import InvalidCursor, KeysetPage, KeysetPaginator
+from polls.purge import delete_poll
+from polls.search import search_polls
+
+from .stats import get_creator_stats
 
 User = get_user_model()
 
+DASHBOARD_PAGE_SIZE = 10
+DASHBOARD_SEARCH_LIMIT = 50
+
 class CustomSignUpView(CreateView):
     """
     User registration view
@@ -85,10 +92,10 @@ def profile_view(request):
     User profile view
     """
     user = request.user
-    polls_qs = Poll.objects.filter(creator=user)
+    stats = get_creator_stats(user)
 
-    polls_created = polls_qs.count()
-    total_votes = polls_qs.aggregate(total=Sum('total_votes'))['total'] or 0
+    polls_created = stats.total_polls
+    total_votes = stats.total_votes
 
     # Free plan limit (fallback to 1 if not set)
     free_limit = getattr(settings, 'FREE_POLL_LIMIT', 1)
@@ -116,44 +123,45 @@ def dashboard_view(request):
    
     user = request.user
     # Poll statistics to be included here later
-    user_polls = Poll.objects.filter(creator=request.user).order_by('-created_at')
+    user_polls = Poll.objects.filter(creator=request.user)
     # Search functionality
     search_query = request.GET.get('search', '')
-    if search_query:
-        polls_list = polls_list.filter(
-            Q(title__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
     
     # Filter by status
     status_filter = request.GET.get('status', '')
     if status_filter:
-        polls_list = polls_list.filter(status=status_filter)
+        user_polls = user_polls.filter(status=status_filter)
     
-    # Pagination
-    paginator = Paginator(user_polls, 10)
-    page_number = request.GET.get('page')
-    polls = paginator.get_page(page_number)
-    total_votes = sum(p.total_votes for p in user_polls)
-    polls_remaining = 1 - user_polls.count() if not request.user.is_premium_active else None
-
-
     # Statistics
-    total_polls = Poll.objects.filter(creator=request.user).count()
-    active_polls = Poll.objects.filter(creator=request.user, status='active').count()
-    total_votes = sum(poll.total_votes for poll in Poll.objects.filter(creator=request.user))
+    stats = get_creator_stats(user)
+    polls_remaining = max(0, 1 - stats.total_polls) if not request.user.is_premium_active else None
+
+    if search_query:
+        # Ranked results are capped rather than paginated
+        polls = KeysetPage(list(search_polls(user_polls, search_query)[:DASHBOARD_SEARCH_LIMIT]))
+        approx_total = None
+    else:
+        # Cursor pagination over the (creator, -created_at) index: no OFFSET, no COUNT
+        paginator = KeysetPaginator(user_polls, ('-created_at', '-id'), DASHBOARD_PAGE_SIZE)
+        try:
+            polls = paginator.get_page(request.GET.get('cursor'))
+        except InvalidCursor:
+            polls = paginator.get_page()
+        approx_total = None if status_filter else stats.total_polls
 
-    
 
     context = {
         'title': 'Dashboard - PollSaaS',
         'user': user,
-        'polls': user_polls,
+        'polls': polls,
+        'approx_total': approx_total,
         'search_query': search_query,
         'status_filter': status_filter,
-        'total_polls': total_polls,
-        'active_polls': active_polls,
-        'total_votes': total_votes,
+        'total_polls': stats.total_polls,
+        'active_polls': stats.active_polls,
+        'total_votes': stats.total_votes,
+        'unique_voters': stats.unique_voters,
+        'last_activity_at': stats.last_activity_at,
         'polls_remaining': polls_remaining,
         'is_premium': request.user.is_premium,
         'max_polls': 50 if request.user.is_premium else 1,
@@ -170,11 +178,9 @@ def delete_poll_view(request, slug):
     poll = get_object_or_404(Poll, slug=slug, creator=request.user)
     
     poll_title = poll.title
-    poll.delete()
-    
-    # Update user's poll count
-    request.user.polls_created = max(0, request.user.polls_created - 1)
-    request.user.save(update_fields=['polls_created'])
+    if delete_poll(poll):
+        # Update user's poll count
+        request.user.release_poll_slots()
     
     messages.success(request, f'🗑️ Poll "{poll_title}" has been deleted.')
     return redirect('polls:dashboard')
@@ -0,0 +1,112 @@
+"""
+Recent-vote activity feed held in the cache.
+
+Each poll keeps a bounded ring buffer of its latest votes: a head counter
+advanced with an atomic ``incr`` and a fixed number of slot keys written
+round-robin. The vote pipeline appends to it after commit, so rendering
+the "recent votes" feed is a couple of cache reads and never touches
+``Vote``. Entries carry their sequence number, which lets readers skip
+slots left over from an earlier generation of the buffer.
+"""
+from django.core.cache import cache
+
+from .degradation import is_degraded
+from .partitioning import poll_votes
+
+ACTIVITY_RING_SIZE = 20
+ACTIVITY_TIMEOUT = 60 * 60 * 24
+
+
+def _head_key(poll_id):
+    return f"poll:{poll_id}:activity:head"
+
+
+def _slot_key(poll_id, seq):
+    return f"poll:{poll_id}:activity:{seq % ACTIVITY_RING_SIZE}"
+
+
+def _entry(seq, vote_id, voted_at, choice_text, username):
+    return {
+        'seq': seq,
+        'id': vote_id,
+        'choice': {'text': choice_text},
+        'voter': {'username': username} if username else None,
+        'voted_at': voted_at,
+    }
+
+
+def _next_seq(poll_id):
+    key = _head_key(poll_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Buffer not started (or evicted); begin a new generation
+        cache.add(key, 0, ACTIVITY_TIMEOUT)
+        return cache.incr(key)
+
+
+def record_activity(poll, votes):
+    """Append newly recorded votes to the poll's activity ring buffer"""
+    entries = {}
+    for vote in votes:
+        seq = _next_seq(poll.id)
+        entries[_slot_key(poll.id, seq)] = _entry(
+            seq,
+            vote.id,
+            vote.voted_at,
+            vote.choice.text,
+            vote.voter.username if vote.voter_id else None,
+        )
+    if entries:
+        cache.set_many(entries, ACTIVITY_TIMEOUT)
+        cache.touch(_head_key(poll.id), ACTIVITY_TIMEOUT)
+
+
+def _warm(poll):
+    """Rebuild the buffer from the database after a cache miss"""
+    rows = list(
+        poll_votes(poll)
+        .order_by('-voted_at', '-id')
+        .values_list('id', 'voted_at', 'choice__text', 'voter__username')[:ACTIVITY_RING_SIZE]
+    )
+    rows.reverse()
+
+    entries = {}
+    for seq, (vote_id, voted_at, choice_text, username) in enumerate(rows, 1):
+        entries[_slot_key(poll.id, seq)] = _entry(
+            seq, vote_id, voted_at, choice_text, username
+        )
+    cache.set_many(entries, ACTIVITY_TIMEOUT)
+    # Another worker may have started the buffer meanwhile; keep theirs
+    cache.add(_head_key(poll.id), len(rows), ACTIVITY_TIMEOUT)
+    return [entries[key] for key in reversed(list(entries))]
+
+
+def recent_activity(poll, limit=10):
+    """Return the poll's latest votes, newest first"""
+    limit = min(limit, ACTIVITY_RING_SIZE)
+    head = cache.get(_head_key(poll.id))
+    if head is None:
+        if is_degraded():
+            # Rebuilding the buffer reads the vote table; wait for the database to recover
+            return []
+        return _warm(poll)[:limit]
+
+    seqs = [seq for seq in range(head, head - limit, -1) if seq > 0]
+    slots = cache.get_many([_slot_key(poll.id, seq) for seq in seqs])
+
+    activity = []
+    for seq in seqs:
+        entry = slots.get(_slot_key(poll.id, seq))
+        if entry is None or entry['seq'] != seq:
+            break
+        activity.append(entry)
+    return activity
+
+
+def clear_activity(poll_id):
+    """Drop the poll's activity buffer"""
+    cache.delete_many(
+        [_head_key(poll_id)]
+        + [f"poll:{poll_id}:activity:{slot}" for slot in range(ACTIVITY_RING_SIZE)]
+    )
@@ -1,10 +1,22 @@
 from django.contrib import admin
 
 # Register your models here.
+from django.db.models import Sum
 from django.utils.html import format_html
+from django.utils.text import capfirst
 from django.urls import reverse
 from django.utils import timezone
-from .models import Poll, Choice, Vote, PollAnalytics
+
+from accounts.stats import rebuild_creator_stats
+
+from .lifecycle import on_polls_closed, on_polls_reopened
+from .purge import delete_poll
+from .models import (
+    Poll, Choice, Vote, PollAnalytics, ExportJob, ResultsSnapshot, VoteArchive, UserAgent,
+    ReconciliationRun,
+)
+from .search import search_polls
+from .tally import set_vote_validity
 
 
 class ChoiceInline(admin.TabularInline):
@@ -81,7 +93,8 @@ class PollAdmin(admin.ModelAdmin):
                 'require_login',
                 'show_results',
                 'allow_anonymous',
-                'expires_at'
+                'expires_at',
+                'pii_retention_days'
             )
         }),
         ('URLs & Sharing', {
@@ -111,6 +124,29 @@ class PollAdmin(admin.ModelAdmin):
         """Optimize queryset with select_related"""
         return super().get_queryset(request).select_related('creator')
     
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Ranked full-text/trigram search instead of icontains scans;
+        an email address looks up that creator's polls directly.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if self._is_email(search_term):
+            return queryset.filter(creator__email__iexact=search_term), False
+        return search_polls(queryset, search_term), False
+    
+    def get_ordering(self, request):
+        """Keep relevance order for searches"""
+        search_term = request.GET.get('q', '').strip()
+        if search_term and not self._is_email(search_term):
+            return ['-search_rank', '-search_similarity']
+        return super().get_ordering(request)
+    
+    @staticmethod
+    def _is_email(search_term):
+        return '@' in search_term and ' ' not in search_term
+    
     def view_poll_link(self, obj):
         """Create a link to view the poll"""
         if obj.slug:
@@ -140,21 +176,58 @@ class PollAdmin(admin.ModelAdmin):
         return "No share URL"
     whatsapp_share_url.short_description = "WhatsApp Share"
     
+    def delete_model(self, request, obj):
+        """Soft-delete; the purger removes votes in the background"""
+        if delete_poll(obj):
+            obj.creator.release_poll_slots()
+    
+    def delete_queryset(self, request, queryset):
+        for poll in queryset.select_related('creator'):
+            self.delete_model(request, poll)
+    
+    def get_deleted_objects(self, objs, request):
+        """
+        Summarise instead of collecting every vote for the confirmation
+        page; the votes go with the purge, not this request
+        """
+        poll_ids = [poll.pk for poll in objs]
+        deleted_objects = [f"{capfirst(Poll._meta.verbose_name)}: {poll}" for poll in objs]
+        votes = Poll.objects.filter(pk__in=poll_ids).aggregate(total=Sum('total_votes'))['total']
+        model_count = {
+            Poll._meta.verbose_name_plural: len(poll_ids),
+            Choice._meta.verbose_name_plural: Choice.objects.filter(poll_id__in=poll_ids).count(),
+            Vote._meta.verbose_name_plural: votes or 0,
+        }
+        perms_needed = set() if self.has_delete_permission(request) else {Poll._meta.verbose_name}
+        return deleted_objects, model_count, perms_needed, []
+    
     def activate_polls(self, request, queryset):
         """Bulk action to activate polls"""
-        updated = queryset.update(is_active=True, status='active')
+        # Collected first: a status or is_active filter may no longer
+        # match once the polls are updated
+        polls = list(queryset.values_list('id', 'creator_id'))
+        poll_ids = [poll_id for poll_id, _ in polls]
+        updated = Poll.objects.filter(pk__in=poll_ids).update(is_active=True, status='active')
+        rebuild_creator_stats({creator_id for _, creator_id in polls})
+        on_polls_reopened(poll_ids)
         self.message_user(request, f'{updated} polls were activated.')
     activate_polls.short_description = "Activate selected polls"
     
     def deactivate_polls(self, request, queryset):
         """Bulk action to deactivate polls"""
-        updated = queryset.update(is_active=False)
+        poll_ids = list(queryset.values_list('id', flat=True))
+        updated = Poll.objects.filter(pk__in=poll_ids).update(is_active=False)
+        on_polls_closed(poll_ids)
         self.message_user(request, f'{updated} polls were deactivated.')
     deactivate_polls.short_description = "Deactivate selected polls"
     
     def close_polls(self, request, queryset):
         """Bulk action to close polls"""
-        updated = queryset.update(status='closed', is_active=False)
+        polls = list(queryset.values_list('id', 'creator_id'))
+        poll_ids = [poll_id for poll_id, _ in polls]
+        updated = Poll.objects.filter(pk__in=poll_ids).update(status='closed', is_active=False)
+        rebuild_creator_stats({creator_id for _, creator_id in polls})
+        on_polls_closed(poll_ids)
         self.message_user(request, f'{updated} polls were closed.')
     close_polls.short_description = "Close selected polls"
 
@@ -282,23 +355,22 @@ class VoteAdmin(admin.ModelAdmin):
     
     def mark_as_valid(self, request, queryset):
         """Mark selected votes as valid"""
-        updated = queryset.update(is_valid=True, flagged_reason='')
-        self.message_user(request, f'{updated} votes marked as valid.')
+        updated, poll_ids = set_vote_validity(queryset, True, flagged_reason='')
+        self.message_user(request, f'{updated} votes marked as valid; {len(poll_ids)} polls recounted.')
     mark_as_valid.short_description = "Mark as valid"
     
     def mark_as_invalid(self, request, queryset):
         """Mark selected votes as invalid"""
-        updated = queryset.update(is_valid=False)
-        self.message_user(request, f'{updated} votes marked as invalid.')
+        updated, poll_ids = set_vote_validity(queryset, False)
+        self.message_user(request, f'{updated} votes marked as invalid; {len(poll_ids)} polls recounted.')
     mark_as_invalid.short_description = "Mark as invalid"
     
     def flag_suspicious(self, request, queryset):
         """Flag votes as suspicious"""
-        updated = queryset.update(
-            is_valid=False, 
-            flagged_reason='Admin flagged as suspicious'
+        updated, poll_ids = set_vote_validity(
+            queryset, False, flagged_reason='Admin flagged as suspicious'
         )
-        self.message_user(request, f'{updated} votes flagged as suspicious.')
+        self.message_user(request, f'{updated} votes flagged as suspicious; {len(poll_ids)} polls recounted.')
     flag_suspicious.short_description = "Flag as suspicious"
 
 
@@ -361,7 +433,124 @@ class PollAnalyticsAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Admin interface for background export jobs"""
+    list_display = (
+        'poll',
+        'status',
+        'progress',
+        'rows_written',
+        'total_rows',
+        'created_at',
+        'completed_at'
+    )
+    list_filter = ('status', 'created_at')
+    search_fields = ('poll__title',)
+    readonly_fields = (
+        'poll',
+        'requested_by',
+        'results_version',
+        'last_vote_id',
+        'rows_written',
+        'bytes_written',
+        'total_rows',
+        'artifact',
+        'error',
+        'created_at',
+        'updated_at',
+        'completed_at'
+    )
+
+    def get_queryset(self, request):
+        """Optimize queryset with select_related"""
+        return super().get_queryset(request).select_related('poll')
+
+    def has_add_permission(self, request):
+        """Exports are requested from the poll page"""
+        return False
+
+
+@admin.register(ResultsSnapshot)
+class ResultsSnapshotAdmin(admin.ModelAdmin):
+    """Admin interface for frozen final results (read-only)"""
+    list_display = ('poll', 'etag', 'created_at')
+    search_fields = ('poll__title',)
+    readonly_fields = ('poll', 'document', 'etag', 'created_at')
+
+    def get_queryset(self, request):
+        """Optimize queryset with select_related"""
+        return super().get_queryset(request).select_related('poll')
+
+    def has_add_permission(self, request):
+        """Snapshots are taken when a poll closes"""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VoteArchive)
+class VoteArchiveAdmin(admin.ModelAdmin):
+    """Admin interface for cold-storage vote archives (read-only)"""
+    list_display = (
+        'poll', 'row_count', 'size_bytes', 'created_at', 'verified_at', 'purged_at', 'pii_pruned_at'
+    )
+    list_filter = ('created_at',)
+    search_fields = ('poll__title', 'poll__slug')
+    readonly_fields = (
+        'poll', 'file', 'format_version', 'row_count', 'max_vote_id', 'checksum',
+        'size_bytes', 'created_at', 'verified_at', 'purged_at', 'pii_pruned_at'
+    )
+
+    def get_queryset(self, request):
+        """Optimize queryset with select_related"""
+        return super().get_queryset(request).select_related('poll')
+
+    def has_add_permission(self, request):
+        """Archives are written by the archive_votes command"""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UserAgent)
+class UserAgentAdmin(admin.ModelAdmin):
+    """Admin interface for interned user agents (read-only)"""
+    list_display = ('text', 'device_class', 'created_at')
+    list_filter = ('device_class',)
+    search_fields = ('text',)
+    readonly_fields = ('ua_hash', 'text', 'device_class', 'created_at')
+
+    def has_add_permission(self, request):
+        """Rows are created as votes arrive"""
+        return False
+
+
 # Custom admin site configuration
 admin.site.site_header = "PollSaaS Administration"
 admin.site.site_title = "PollSaaS Admin"
-admin.site.index_title = "Welcome to PollSaaS Administration"
\ No newline at end of file
+admin.site.index_title = "Welcome to PollSaaS Administration"
+
+
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(admin.ModelAdmin):
+    """Admin interface for counter reconciliation runs (read-only)"""
+    list_display = (
+        'started_at', 'mode', 'dry_run', 'polls_checked', 'polls_repaired',
+        'choices_repaired', 'users_repaired', 'finished_at'
+    )
+    list_filter = ('mode', 'dry_run', 'started_at')
+    readonly_fields = (
+        'mode', 'dry_run', 'vote_high_water', 'polls_checked', 'polls_repaired',
+        'choices_repaired', 'users_checked', 'users_repaired', 'drift',
+        'started_at', 'finished_at'
+    )
+
+    def has_add_permission(self, request):
+        """Runs are recorded by the reconcile_counters command"""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
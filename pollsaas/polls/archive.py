@@ -0,0 +1,277 @@
+"""
+Cold-storage archival of votes from long-finished polls.
+
+``archive_poll`` streams a closed poll's votes (keyset order on id) into
+a gzip-compressed, column-oriented file on the default storage: a header
+line followed by JSON row groups of up to ``ARCHIVE_ROW_GROUP`` votes,
+each holding one array per column. The stored file is read back and its
+row count and SHA-256 compared with what was written and with the vote
+table before any row is deleted; deletion then runs in primary-key
+batches. Each stage is recorded on ``VoteArchive``, so an interrupted
+run resumes at the right step.
+
+Readers that need individual votes call ``iter_poll_votes``, which
+serves archived rows from the file and anything newer from the table.
+"""
+import gzip
+import hashlib
+import json
+import tempfile
+import time
+
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Poll, VoteArchive
+from .partitioning import poll_votes
+
+ARCHIVE_FORMAT = 1
+ARCHIVE_ROW_GROUP = 10_000
+ARCHIVE_DELETE_BATCH = 5000
+ARCHIVE_PAUSE = 0.1
+ARCHIVE_AFTER_DAYS = 90
+
+ARCHIVE_COLUMNS = (
+    'id', 'voted_at', 'choice_id', 'voter_id', 'voter_ip', 'voter_session',
+    'user_agent', 'is_valid', 'flagged_reason',
+)
+# The archive keeps the user-agent text rather than the interned id
+_QUERY_FIELDS = tuple('user_agent__text' if name == 'user_agent' else name for name in ARCHIVE_COLUMNS)
+
+
+class ArchiveMismatch(Exception):
+    """The stored archive does not match the rows it was built from"""
+
+
+def _row_digest(digest, row):
+    digest.update(json.dumps(row, separators=(',', ':'), default=str).encode())
+    digest.update(b'\n')
+
+
+def _db_rows(poll, after_id, limit):
+    rows = []
+    for row in poll_votes(poll).filter(id__gt=after_id).order_by('id').values_list(*_QUERY_FIELDS)[:limit]:
+        row = dict(zip(ARCHIVE_COLUMNS, row))
+        row['voted_at'] = row['voted_at'].isoformat()
+        row['user_agent'] = row['user_agent'] or ''
+        rows.append([row[name] for name in ARCHIVE_COLUMNS])
+    return rows
+
+
+def _table_groups(poll, row_group):
+    last_id = 0
+    while True:
+        rows = _db_rows(poll, last_id, row_group)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _write(poll_id, fh, groups):
+    """Write row groups to ``fh``; returns (count, max id, sha256)"""
+    digest = hashlib.sha256()
+    count = 0
+    last_id = 0
+    with gzip.GzipFile(fileobj=fh, mode='wb', compresslevel=6) as out:
+        header = {'format': ARCHIVE_FORMAT, 'poll_id': poll_id, 'columns': ARCHIVE_COLUMNS}
+        out.write(json.dumps(header).encode() + b'\n')
+        for rows in groups:
+            for row in rows:
+                _row_digest(digest, row)
+            group = {
+                'n': len(rows),
+                'columns': {name: [row[i] for row in rows] for i, name in enumerate(ARCHIVE_COLUMNS)},
+            }
+            out.write(json.dumps(group, separators=(',', ':')).encode() + b'\n')
+            count += len(rows)
+            last_id = rows[-1][0]
+    return count, last_id, digest.hexdigest()
+
+
+def _stored_groups(archive):
+    """Yield the stored row groups as lists of rows, exactly as written"""
+    with archive.file.open('rb') as raw, gzip.GzipFile(fileobj=raw) as fh:
+        columns = json.loads(fh.readline())['columns']
+        for line in fh:
+            group = json.loads(line)
+            yield [list(row) for row in zip(*(group['columns'][name] for name in columns))]
+
+
+def read_archive(archive):
+    """Yield archived votes as dicts (``voted_at`` parsed), in id order"""
+    with archive.file.open('rb') as raw, gzip.GzipFile(fileobj=raw) as fh:
+        header = json.loads(fh.readline())
+        columns = header['columns']
+        for line in fh:
+            group = json.loads(line)
+            values = [group['columns'][name] for name in columns]
+            for row in zip(*values):
+                vote = dict(zip(columns, row))
+                vote['voted_at'] = parse_datetime(vote['voted_at'])
+                yield vote
+
+
+def verify_archive(archive):
+    """Re-read the stored file and check its row count and checksum"""
+    digest = hashlib.sha256()
+    count = 0
+    for rows in _stored_groups(archive):
+        for row in rows:
+            _row_digest(digest, row)
+            count += 1
+    if count != archive.row_count or digest.hexdigest() != archive.checksum:
+        raise ArchiveMismatch(
+            f"Archive of poll {archive.poll_id} holds {count} rows "
+            f"(expected {archive.row_count}) or its checksum differs"
+        )
+
+
+def rewrite_archive(archive, transform, **fields):
+    """
+    Replace the stored file with its rows passed through ``transform``
+    (a row in ``ARCHIVE_COLUMNS`` order in, one out), setting ``fields``
+    on the archive. The new file is verified before the old one is
+    removed.
+    """
+    old_name = archive.file.name
+    with tempfile.TemporaryFile() as fh:
+        groups = ([transform(row) for row in rows] for rows in _stored_groups(archive))
+        count, _, checksum = _write(archive.poll_id, fh, groups)
+        if count != archive.row_count:
+            raise ArchiveMismatch(
+                f"Archive of poll {archive.poll_id} holds {count} rows, expected {archive.row_count}"
+            )
+        archive.size_bytes = fh.tell()
+        fh.seek(0)
+        archive.checksum = checksum
+        archive.file.save(f"poll-{archive.poll_id}-votes.jsonl.gz", File(fh), save=False)
+    try:
+        verify_archive(archive)
+    except ArchiveMismatch:
+        archive.file.delete(save=False)
+        raise
+    for name, value in fields.items():
+        setattr(archive, name, value)
+    archive.save()
+    archive.file.storage.delete(old_name)
+    return archive
+
+
+def _delete_archived_rows(archive, batch_size, pause):
+    poll = archive.poll
+    deleted = 0
+    while True:
+        ids = list(
+            poll_votes(poll).filter(id__lte=archive.max_vote_id)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            poll.votes.filter(id__in=ids).delete()
+        deleted += len(ids)
+        time.sleep(pause)
+
+
+def archivable_polls(older_than=timedelta(days=ARCHIVE_AFTER_DAYS)):
+    """
+    Finished polls untouched for ``older_than`` whose votes are still in
+    the table. Voter data is pruned first so it never reaches an archive;
+    ``prune_archive_pii`` scrubs archives written before that rule.
+    """
+    return (
+        Poll.objects
+        .filter(
+            status__in=['closed', 'expired'],
+            updated_at__lt=timezone.now() - older_than,
+            total_votes__gt=0,
+            pii_pruned_at__isnull=False,
+        )
+        .filter(Q(vote_archive__isnull=True) | Q(vote_archive__purged_at__isnull=True))
+        .order_by('updated_at')
+    )
+
+
+def archive_poll(poll, row_group=ARCHIVE_ROW_GROUP, batch_size=ARCHIVE_DELETE_BATCH,
+                 pause=ARCHIVE_PAUSE):
+    """Archive, verify and then delete a finished poll's votes"""
+    archive = VoteArchive.objects.filter(poll=poll).first()
+
+    if archive is None or archive.verified_at is None:
+        if archive is not None:
+            # A previous run stopped before verification; start over
+            archive.file.delete(save=False)
+            archive.delete()
+
+        with tempfile.TemporaryFile() as fh:
+            count, max_id, checksum = _write(poll.id, fh, _table_groups(poll, row_group))
+            size = fh.tell()
+            fh.seek(0)
+            archive = VoteArchive(
+                poll=poll, format_version=ARCHIVE_FORMAT, row_count=count,
+                max_vote_id=max_id, checksum=checksum, size_bytes=size,
+                # Archives written before the retention pass are scrubbed by it
+                pii_pruned_at=poll.pii_pruned_at,
+            )
+            archive.file.save(f"poll-{poll.id}-votes.jsonl.gz", File(fh), save=False)
+        archive.save()
+
+        verify_archive(archive)
+        live = poll_votes(poll).filter(id__lte=max_id).count()
+        if live != count:
+            raise ArchiveMismatch(
+                f"Poll {poll.id} has {live} votes up to id {max_id}, archive has {count}"
+            )
+        archive.verified_at = timezone.now()
+        archive.save(update_fields=['verified_at'])
+
+    if archive.purged_at is None:
+        _delete_archived_rows(archive, batch_size, pause)
+        archive.purged_at = timezone.now()
+        archive.save(update_fields=['purged_at'])
+    return archive
+
+
+def iter_poll_votes(poll, after_id=0, chunk_size=5000):
+    """
+    Yield lists of vote dicts (``ARCHIVE_COLUMNS`` keys) with id above
+    ``after_id``, in id order, from the archive and then the vote table.
+    """
+    archive = VoteArchive.objects.filter(poll=poll, verified_at__isnull=False).first()
+    if archive is not None and after_id < archive.max_vote_id:
+        chunk = []
+        for vote in read_archive(archive):
+            if vote['id'] <= after_id:
+                continue
+            chunk.append(vote)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        after_id = archive.max_vote_id
+
+    while True:
+        rows = [
+            dict(zip(ARCHIVE_COLUMNS, row))
+            for row in poll_votes(poll).filter(id__gt=after_id)
+            .order_by('id').values_list(*_QUERY_FIELDS)[:chunk_size]
+        ]
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1]['id']
+
+
+def count_poll_votes(poll):
+    """Number of votes for ``poll``, archived or not"""
+    archive = VoteArchive.objects.filter(poll=poll, verified_at__isnull=False).first()
+    if archive is None:
+        return poll_votes(poll).count()
+    return archive.row_count + poll_votes(poll).filter(id__gt=archive.max_vote_id).count()
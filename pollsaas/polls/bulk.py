@@ -0,0 +1,153 @@
+"""
+Bulk poll import for integrators.
+
+Definitions (JSON or CSV) are validated up front with the same rules as
+the poll creation form. Nothing is written unless every row is valid;
+then slugs are allocated in bulk and all polls and choices are inserted
+with batched ``bulk_create`` in a single transaction.
+"""
+import csv
+import io
+import json
+import time
+
+from django.db import transaction
+
+from accounts.stats import bump_creator_stats
+
+from .forms import PollCreateForm
+from .models import Choice, Poll
+from .services import poll_limit_error
+
+MAX_BULK_POLLS = 10_000
+BULK_BATCH_SIZE = 1000
+
+BOOLEAN_FIELDS = ('allow_multiple_votes', 'require_login', 'show_results', 'allow_anonymous')
+# Model defaults for fields that are simply left out of a definition
+FIELD_DEFAULTS = {'poll_type': 'single', 'show_results': True, 'allow_anonymous': True}
+
+
+class BulkPollForm(PollCreateForm):
+    """Validate one poll definition; quota is checked for the whole batch"""
+
+    def check_poll_limit(self):
+        pass
+
+
+def parse_definitions(content, content_type):
+    """Parse a JSON list (or ``{"polls": [...]}``) or a CSV document"""
+    if 'csv' in content_type:
+        reader = csv.DictReader(io.StringIO(content))
+        rows = []
+        for row in reader:
+            row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            # Choices are pipe-separated in CSV
+            row['choices'] = [c for c in row.get('choices', '').split('|') if c.strip()]
+            for field in BOOLEAN_FIELDS:
+                if field in row and row[field] != '':
+                    row[field] = row[field].lower() in ('1', 'true', 'yes', 'y')
+                else:
+                    row.pop(field, None)
+            if not row.get('poll_type'):
+                row.pop('poll_type', None)
+            rows.append(row)
+        return rows
+
+    data = json.loads(content)
+    if isinstance(data, dict):
+        data = data.get('polls', [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of poll definitions.")
+    return data
+
+
+def _form_data(definition):
+    data = {field: value for field, value in definition.items() if field != 'choices'}
+    choices = definition.get('choices', [])
+    if isinstance(choices, (list, tuple)):
+        choices = '\n'.join(str(choice) for choice in choices)
+    data['choices'] = choices
+    for field, default in FIELD_DEFAULTS.items():
+        data.setdefault(field, default)
+    return data
+
+
+def validate_definitions(user, definitions):
+    """
+    Validate every definition. Returns ``(polls, errors)`` where polls
+    is a list of ``(unsaved Poll, choice texts)`` and errors a list of
+    ``{'row': n, 'errors': {...}}`` entries (rows numbered from 1).
+    """
+    polls = []
+    errors = []
+    for row_number, definition in enumerate(definitions, 1):
+        if not isinstance(definition, dict):
+            errors.append({'row': row_number, 'errors': {'__all__': ['Expected an object.']}})
+            continue
+        form = BulkPollForm(data=_form_data(definition), user=user)
+        if form.is_valid():
+            polls.append((form.save(commit=False), form.cleaned_data['choices']))
+        else:
+            errors.append({'row': row_number, 'errors': form.errors.get_json_data()})
+    return polls, errors
+
+
+def import_polls(user, definitions, enforce_quota=True):
+    """
+    Validate and create polls in bulk.
+
+    Returns a report dict with ``created`` (slugs), ``errors`` and phase
+    ``timings`` in milliseconds. No polls are created if any row fails.
+    """
+    timings = {}
+    report = {'created': [], 'errors': [], 'timings': timings}
+
+    if len(definitions) > MAX_BULK_POLLS:
+        report['errors'].append({
+            'row': None,
+            'errors': {'__all__': [f"At most {MAX_BULK_POLLS} polls per import."]},
+        })
+        return report
+
+    start = time.perf_counter()
+    polls, errors = validate_definitions(user, definitions)
+    timings['validate'] = round((time.perf_counter() - start) * 1000, 1)
+    if errors:
+        report['errors'] = errors
+        return report
+    if not polls:
+        return report
+
+    with transaction.atomic():
+        if enforce_quota and not user.reserve_poll_slots(len(polls)):
+            report['errors'].append({
+                'row': None,
+                'errors': {'__all__': poll_limit_error(user).messages},
+            })
+            return report
+
+        start = time.perf_counter()
+        for (poll, _), slug in zip(polls, Poll.generate_unique_slugs(len(polls))):
+            poll.slug = slug
+        timings['allocate_slugs'] = round((time.perf_counter() - start) * 1000, 1)
+
+        start = time.perf_counter()
+        Poll.objects.bulk_create([poll for poll, _ in polls], batch_size=BULK_BATCH_SIZE)
+        Choice.objects.bulk_create(
+            [
+                Choice(poll=poll, text=text, order=order)
+                for poll, choice_texts in polls
+                for order, text in enumerate(choice_texts)
+            ],
+            batch_size=BULK_BATCH_SIZE * 5,
+        )
+        timings['insert'] = round((time.perf_counter() - start) * 1000, 1)
+
+        if not enforce_quota:
+            user.increment_poll_count(len(polls))
+        active = sum(1 for poll, _ in polls if poll.status == 'active')
+        bump_creator_stats(user.pk, polls=len(polls), active=active)
+
+    report['created'] = [poll.slug for poll, _ in polls]
+    return report
+
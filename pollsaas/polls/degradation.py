@@ -0,0 +1,377 @@
+"""
+Load shedding while the database is saturated.
+
+``DegradationMiddleware`` times every query a request runs and how long
+it waited for a database connection, and feeds both into a
+per-process ``DegradationController``. The controller keeps
+exponentially weighted moving averages (decaying with time, so quiet
+periods count as recovery) and moves between three levels:
+
+``normal``
+    Everything runs as usual.
+``degraded``
+    Results APIs answer from the last live payload cached for the poll
+    (up to ``STALE_RESULTS_TIMEOUT`` old) and the recent-activity feed
+    skips its database warm-up.
+``critical``
+    In addition, ``vote_api`` queues ballots in the cache and answers 202
+    (``drain_vote_buffer`` records them later) and the views in
+    ``DEGRADE_SHED_VIEWS`` answer 503.
+
+A level is entered when either average crosses its threshold and left
+one step at a time once both have stayed below ``DEGRADE_EXIT_RATIO`` of
+the thresholds for ``DEGRADE_RECOVERY_SECONDS``, so the site does not
+flap at the boundary. The vote buffer needs a cache shared with the
+drain command (Redis); the local-memory cache is per process.
+"""
+import logging
+import secrets
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+NORMAL, DEGRADED, CRITICAL = 0, 1, 2
+LEVEL_NAMES = {NORMAL: 'normal', DEGRADED: 'degraded', CRITICAL: 'critical'}
+
+# (degraded, critical) thresholds in milliseconds
+DEGRADE_QUERY_MS = getattr(settings, 'DEGRADE_QUERY_MS', (150, 600))
+DEGRADE_WAIT_MS = getattr(settings, 'DEGRADE_WAIT_MS', (50, 250))
+DEGRADE_EXIT_RATIO = 0.5
+DEGRADE_RECOVERY_SECONDS = 15
+# Weight of each request in the averages, and how fast they decay without traffic
+DEGRADE_EWMA_WEIGHT = 0.05
+DEGRADE_EWMA_SECONDS = 5
+DEGRADE_SHED_VIEWS = getattr(settings, 'DEGRADE_SHED_VIEWS', {
+    'accounts:dashboard',
+    'polls:poll_analytics',
+    'polls:poll_export',
+    'polls:vote_history_api',
+})
+DEGRADE_RETRY_AFTER = 30
+
+STALE_RESULTS_TIMEOUT = 60 * 5
+VOTE_BUFFER_TIMEOUT = 60 * 60 * 24
+# Entries this close to the head may still be being written
+VOTE_BUFFER_GRACE = 100
+# Renewed before every batch; a drainer that stalls longer loses the lock
+DRAIN_LOCK_TIMEOUT = 120
+
+
+class DegradationController:
+    """Per-process view of database health"""
+
+    def __init__(self, query_ms=DEGRADE_QUERY_MS, wait_ms=DEGRADE_WAIT_MS,
+                 weight=DEGRADE_EWMA_WEIGHT, half_life=DEGRADE_EWMA_SECONDS,
+                 recovery=DEGRADE_RECOVERY_SECONDS, clock=time.monotonic):
+        self.query_ms = query_ms
+        self.wait_ms = wait_ms
+        self.weight = weight
+        self.half_life = half_life
+        self.recovery = recovery
+        self.clock = clock
+        self.level = NORMAL
+        self._query = 0.0
+        self._wait = 0.0
+        self._updated = clock()
+        self._calm_since = None
+        self._lock = threading.Lock()
+
+    def _decay(self, now):
+        # A quiet spell counts as recovery: pull the averages toward zero
+        idle = now - self._updated
+        if idle > self.half_life:
+            keep = 0.5 ** (idle / self.half_life)
+            self._query *= keep
+            self._wait *= keep
+        self._updated = now
+
+    def record(self, query_ms=None, wait_ms=None):
+        """Add a request's mean query time and connection wait"""
+        with self._lock:
+            now = self.clock()
+            self._decay(now)
+            if query_ms is not None:
+                self._query += (query_ms - self._query) * self.weight
+            if wait_ms is not None:
+                self._wait += (wait_ms - self._wait) * self.weight
+            self._update_level(now)
+
+    def _update_level(self, now):
+        wanted = NORMAL
+        for level in (DEGRADED, CRITICAL):
+            if self._query >= self.query_ms[level - 1] or self._wait >= self.wait_ms[level - 1]:
+                wanted = level
+        if wanted >= self.level:
+            self.level = wanted
+            self._calm_since = None
+            return
+
+        threshold = self.level - 1
+        calm = (
+            self._query < self.query_ms[threshold] * DEGRADE_EXIT_RATIO
+            and self._wait < self.wait_ms[threshold] * DEGRADE_EXIT_RATIO
+        )
+        if not calm:
+            self._calm_since = None
+        elif self._calm_since is None:
+            self._calm_since = now
+        elif now - self._calm_since >= self.recovery:
+            self.level -= 1
+            self._calm_since = now
+
+    def current_level(self):
+        with self._lock:
+            now = self.clock()
+            if now - self._updated > self.half_life:
+                self._decay(now)
+                self._update_level(now)
+            return self.level
+
+    def averages(self):
+        return self._query, self._wait
+
+
+controller = DegradationController()
+
+
+def current_level():
+    return controller.current_level()
+
+
+def is_degraded():
+    return current_level() >= DEGRADED
+
+
+def is_critical():
+    return current_level() >= CRITICAL
+
+
+_request = threading.local()
+
+
+def _connection_opened(sender, connection, **kwargs):
+    """Time how long the request that opened ``connection`` waited for it"""
+    waits = getattr(_request, 'connect_waits', None)
+    max_age = connection.settings_dict['CONN_MAX_AGE']
+    if waits is None or max_age is None or connection.close_at is None:
+        return
+    # connect() stamps close_at from the clock before opening the connection
+    waits.append((time.monotonic() - (connection.close_at - max_age)) * 1000)
+
+
+connection_created.connect(_connection_opened, dispatch_uid='polls.degradation')
+
+
+class DegradationMiddleware:
+    """
+    Measures database time per request and sheds non-essential views when
+    critical. Nothing here touches the database itself: connection wait
+    is taken from the request's own connects, so shed requests cost none.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = []
+        _request.connect_waits = waits = []
+
+        def timed(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timings.append(time.perf_counter() - started)
+
+        try:
+            with connection.execute_wrapper(timed):
+                response = self.get_response(request)
+        finally:
+            _request.connect_waits = None
+
+        query_ms = sum(timings) / len(timings) * 1000 if timings else None
+        wait_ms = max(waits) if waits else None
+        if query_ms is not None or wait_ms is not None:
+            controller.record(query_ms=query_ms, wait_ms=wait_ms)
+        response['X-Service-Level'] = LEVEL_NAMES[controller.level]
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if match and match.view_name in DEGRADE_SHED_VIEWS and is_critical():
+            return service_unavailable(wants_json='/api/' in request.path)
+        return None
+
+    def process_exception(self, request, exception):
+        if connection.connection is None and isinstance(exception, OperationalError):
+            # The database refused the connection (e.g. "too many clients"):
+            # count it as a wait at the critical threshold and answer 503
+            controller.record(wait_ms=controller.wait_ms[CRITICAL - 1])
+            return service_unavailable(wants_json='/api/' in request.path)
+        return None
+
+
+def service_unavailable(wants_json=False):
+    message = 'This page is temporarily unavailable while we handle heavy traffic. Please try again shortly.'
+    if wants_json:
+        response = JsonResponse({'success': False, 'error': message}, status=503)
+    else:
+        response = HttpResponse(message, status=503, content_type='text/plain')
+    response['Retry-After'] = str(DEGRADE_RETRY_AFTER)
+    return response
+
+
+# Stale results
+
+def _results_key(poll_id, kind):
+    return f"poll:{poll_id}:live-{kind}"
+
+
+def remember_results(poll_id, kind, data):
+    """Keep the latest live results payload to fall back on when degraded"""
+    cache.set(_results_key(poll_id, kind), data, STALE_RESULTS_TIMEOUT)
+
+
+def stale_results(poll_id, kind):
+    """The cached payload, marked stale, when degraded; None otherwise"""
+    if not is_degraded():
+        return None
+    data = cache.get(_results_key(poll_id, kind))
+    if data is None:
+        return None
+    return dict(data, stale=True)
+
+
+# Buffered votes
+
+def _buffer_key(seq):
+    return f"votes:buffer:{seq}"
+
+
+_BUFFER_HEAD = 'votes:buffer:head'
+_BUFFER_TAIL = 'votes:buffer:tail'
+_DRAIN_LOCK = 'votes:buffer:drain-lock'
+
+
+def buffer_vote(poll, choice_ids, voter_id, client_ip, session_key, user_agent):
+    """Queue a ballot to be recorded by ``drain_vote_buffer``; returns its sequence number"""
+    try:
+        seq = cache.incr(_BUFFER_HEAD)
+    except ValueError:
+        cache.add(_BUFFER_HEAD, 0, None)
+        seq = cache.incr(_BUFFER_HEAD)
+    cache.set(_buffer_key(seq), {
+        'poll_id': poll.id,
+        'choice_ids': [str(choice_id) for choice_id in choice_ids],
+        'voter_id': voter_id,
+        'client_ip': client_ip,
+        'session_key': session_key,
+        'user_agent': user_agent,
+        'queued_at': timezone.now().isoformat(),
+    }, VOTE_BUFFER_TIMEOUT)
+    return seq
+
+
+def buffer_backlog():
+    """``(drained up to, queued up to)`` sequence numbers"""
+    return cache.get(_BUFFER_TAIL) or 0, cache.get(_BUFFER_HEAD) or 0
+
+
+def _accepting(poll, queued_at):
+    """Whether ``poll`` still takes a ballot that ``vote_api`` queued at ``queued_at``"""
+    if poll is None or (poll.expires_at and queued_at > poll.expires_at):
+        return False
+    if poll.can_vote:
+        return True
+    # vote_api checked the poll when it queued the ballot; only count it
+    # if the poll closed after that
+    if poll.closed_at:
+        return queued_at < poll.closed_at
+    # Expired since, but the expiry sweep has not closed it yet
+    return poll.is_active and poll.status == 'active'
+
+
+def _hold(token):
+    """Renew the drain lock if it is still ours"""
+    if cache.get(_DRAIN_LOCK) != token:
+        return False
+    cache.touch(_DRAIN_LOCK, DRAIN_LOCK_TIMEOUT)
+    return True
+
+
+def drain_vote_buffer(batch_size=500, limit=None):
+    """
+    Record queued ballots in order through ``cast_vote``. Returns
+    ``(recorded, rejected, lost)``; lost entries expired from the cache.
+    """
+    from django.contrib.auth import get_user_model
+
+    from .models import Poll
+    from .services import VoteRejected, cast_vote
+    from .snapshots import freeze_results
+
+    User = get_user_model()
+    token = secrets.token_hex(8)
+    if not cache.add(_DRAIN_LOCK, token, DRAIN_LOCK_TIMEOUT):
+        return 0, 0, 0
+
+    recorded = rejected = lost = 0
+    late_polls = set()
+    try:
+        tail, head = buffer_backlog()
+        if limit is not None:
+            head = min(head, tail + limit)
+        while tail < head and _hold(token):
+            seqs = list(range(tail + 1, min(tail + batch_size, head) + 1))
+            entries = cache.get_many([_buffer_key(seq) for seq in seqs])
+            polls = Poll.objects.in_bulk({entry['poll_id'] for entry in entries.values()})
+            users = User.objects.in_bulk({entry['voter_id'] for entry in entries.values()} - {None})
+            for seq in seqs:
+                entry = entries.get(_buffer_key(seq))
+                if entry is None:
+                    if head - seq < VOTE_BUFFER_GRACE:
+                        # Probably still being written; retried on the next pass
+                        head = seq - 1
+                        break
+                    lost += 1
+                else:
+                    poll = polls.get(entry['poll_id'])
+                    voter = users.get(entry['voter_id'])
+                    try:
+                        if not _accepting(poll, datetime.fromisoformat(entry['queued_at'])):
+                            raise VoteRejected('This poll is no longer accepting votes.')
+                        cast_vote(
+                            poll, entry['choice_ids'], voter, entry['client_ip'],
+                            entry['session_key'], entry['user_agent'],
+                        )
+                        recorded += 1
+                        if not poll.can_vote:
+                            late_polls.add(poll.id)
+                    except VoteRejected:
+                        rejected += 1
+                    except OperationalError:
+                        # The database is unreachable: stop here and retry the entry later
+                        raise
+                    except Exception:
+                        # A malformed entry must not block the ones queued after it
+                        logger.exception("Rejected queued ballot %s", seq)
+                        rejected += 1
+                tail = seq
+                cache.set(_BUFFER_TAIL, tail, None)
+            cache.delete_many([_buffer_key(seq) for seq in seqs if seq <= tail])
+    finally:
+        if cache.get(_DRAIN_LOCK) == token:
+            cache.delete(_DRAIN_LOCK)
+    if late_polls:
+        # Closed polls serve frozen results; fold the late ballots in
+        freeze_results(late_polls)
+    return recorded, rejected, lost
@@ -0,0 +1,174 @@
+"""
+Background CSV exports of poll votes.
+
+Exports are written by the ``process_exports`` management command in
+resumable chunks. Votes are walked with keyset pagination on ``Vote.id``
+and the job row records how far the file got after every chunk, so a
+crashed worker picks up where it stopped instead of starting over.
+Votes moved to cold storage are read back from the poll's archive.
+Finished files are kept per poll and results version, which means
+repeated exports of a closed poll are served straight from storage.
+"""
+import csv
+import io
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .archive import count_poll_votes, iter_poll_votes
+from .models import ExportJob, VoteArchive
+from .partitioning import poll_votes
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 5000)
+EXPORT_PARTIAL_DIR = os.path.join(settings.MEDIA_ROOT, 'exports', 'partial')
+
+CSV_HEADER = ['vote_id', 'voted_at', 'choice', 'voter', 'is_valid', 'flagged_reason']
+
+
+def results_version(poll):
+    """Identify the state of a poll's results for artifact caching"""
+    last_vote_id = (
+        poll_votes(poll).order_by('-voted_at').values_list('id', flat=True).first()
+        or VoteArchive.objects.filter(poll=poll).values_list('max_vote_id', flat=True).first()
+        or 0
+    )
+    return f"{poll.total_votes}-{poll.unique_voters}-{last_vote_id}"
+
+
+def enqueue_export(poll, user=None):
+    """
+    Return the export job for the poll's current results version,
+    creating a pending one if no usable job exists yet.
+    """
+    version = results_version(poll)
+    job = (
+        ExportJob.objects
+        .filter(poll=poll, results_version=version)
+        .exclude(status='failed')
+        .order_by('-created_at')
+        .first()
+    )
+    if job is None:
+        job = ExportJob.objects.create(
+            poll=poll,
+            requested_by=user,
+            results_version=version,
+            total_rows=count_poll_votes(poll),
+        )
+    return job
+
+
+def claim_next_job(stale_after=timedelta(minutes=10)):
+    """
+    Claim the oldest pending job, or a running one whose worker has
+    stopped reporting progress.
+    """
+    stale_before = timezone.now() - stale_after
+    with transaction.atomic():
+        job = (
+            ExportJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='running', updated_at__lt=stale_before))
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def _partial_path(job):
+    return os.path.join(EXPORT_PARTIAL_DIR, f"{job.pk}.csv")
+
+
+def delete_export_files(job):
+    """Remove a job's finished artifact and any partial file"""
+    if job.artifact:
+        job.artifact.delete(save=False)
+    try:
+        os.remove(_partial_path(job))
+    except FileNotFoundError:
+        pass
+
+
+def _open_partial(job):
+    """Open the partial file positioned right after the last saved chunk"""
+    os.makedirs(EXPORT_PARTIAL_DIR, exist_ok=True)
+    path = _partial_path(job)
+
+    if job.bytes_written and (
+        not os.path.exists(path) or os.path.getsize(path) < job.bytes_written
+    ):
+        # The partial file is gone or shorter than recorded; start over
+        job.last_vote_id = 0
+        job.rows_written = 0
+        job.bytes_written = 0
+
+    fh = open(path, 'ab')
+    # Drop anything written after the last checkpoint (crash mid-chunk)
+    fh.truncate(job.bytes_written)
+    return fh
+
+
+def run_export_job(job, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the job's CSV chunk by chunk, checkpointing after each one"""
+    poll = job.poll
+    choice_texts = dict(poll.choices.values_list('id', 'text'))
+
+    try:
+        with _open_partial(job) as fh:
+            if job.bytes_written == 0:
+                fh.write(_encode_rows([CSV_HEADER]))
+
+            for rows in iter_poll_votes(poll, job.last_vote_id, chunk_size):
+                voter_ids = {row['voter_id'] for row in rows if row['voter_id']}
+                emails = dict(
+                    get_user_model().objects.filter(pk__in=voter_ids).values_list('pk', 'email')
+                )
+                fh.write(_encode_rows(
+                    [row['id'], row['voted_at'].isoformat(), choice_texts.get(row['choice_id'], ''),
+                     emails.get(row['voter_id']) or 'Anonymous', row['is_valid'],
+                     row['flagged_reason']]
+                    for row in rows
+                ))
+                fh.flush()
+                os.fsync(fh.fileno())
+
+                job.last_vote_id = rows[-1]['id']
+                job.rows_written += len(rows)
+                job.bytes_written = fh.tell()
+                job.save(update_fields=[
+                    'last_vote_id', 'rows_written', 'bytes_written', 'updated_at'
+                ])
+
+        path = _partial_path(job)
+        with open(path, 'rb') as fh:
+            job.artifact.save(
+                f"poll-{poll.slug}-{job.results_version}.csv", File(fh), save=False
+            )
+        os.remove(path)
+
+        job.status = 'completed'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['artifact', 'status', 'completed_at', 'updated_at'])
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    return job
+
+
+def _encode_rows(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode('utf-8')
@@ -2,7 +2,9 @@ from django import forms
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import datetime, timedelta
+
 from .models import Poll, Choice
+from .services import create_poll_with_choices, poll_limit_error
 
 User = get_user_model()
 
@@ -33,6 +35,16 @@ class PollCreateForm(forms.ModelForm):
         label="Expires in (days)"
     )
     
+    publish_at = forms.DateTimeField(
+        required=False,
+        widget=forms.DateTimeInput(attrs={
+            'class': 'form-control',
+            'type': 'datetime-local'
+        }),
+        help_text="Optional: Save as a draft and publish automatically at this time",
+        label="Publish at"
+    )
+    
     class Meta:
         model = Poll
         fields = [
@@ -145,6 +157,12 @@ class PollCreateForm(forms.ModelForm):
                 raise forms.ValidationError("Free users can set expiry up to 30 days. Upgrade for longer polls.")
         return expires_in_days
     
+    def clean_publish_at(self):
+        publish_at = self.cleaned_data.get('publish_at')
+        if publish_at and publish_at <= timezone.now():
+            raise forms.ValidationError("Publish time must be in the future.")
+        return publish_at
+    
     def clean(self):
         cleaned_data = super().clean()
         
@@ -155,50 +173,36 @@ class PollCreateForm(forms.ModelForm):
         if poll_type == 'yes_no' and allow_multiple_votes:
             raise forms.ValidationError("Yes/No polls cannot allow multiple votes.")
         
-        # Check user's poll creation limits
-        if self.user:
-            user_polls = Poll.objects.filter(creator=self.user).count()
-            max_polls = 50 if self.user.is_premium else 1
-            
-            if user_polls >= max_polls:
-                raise forms.ValidationError(
-                    f"You have reached your poll limit ({max_polls} polls). "
-                    f"{'Delete some polls to create new ones.' if self.user.is_premium else 'Upgrade to premium for unlimited polls.'}"
-                )
+        # Check user's poll creation limits (enforced atomically in save)
+        self.check_poll_limit()
         
         return cleaned_data
     
+    def check_poll_limit(self):
+        if self.user and self.user.polls_created >= self.user.poll_limit:
+            raise poll_limit_error(self.user)
+    
     def save(self, commit=True):
         poll = super().save(commit=False)
         
         if self.user:
             poll.creator = self.user
         
-        # Set expiry date if provided
+        # Scheduled polls stay drafts until the scheduler publishes them
+        publish_at = self.cleaned_data.get('publish_at')
+        poll.publish_at = publish_at
+        
+        # Set expiry date if provided (counted from the publish time)
         expires_in_days = self.cleaned_data.get('expires_in_days')
         if expires_in_days:
-            poll.expires_at = timezone.now() + timedelta(days=expires_in_days)
+            poll.expires_at = (publish_at or timezone.now()) + timedelta(days=expires_in_days)
         
         # Set initial status
-        poll.status = 'active'
+        poll.status = 'draft' if publish_at else 'active'
         poll.is_active = True
         
         if commit:
-            poll.save()
-            
-            # Create choices
-            choices = self.cleaned_data.get('choices', [])
-            for i, choice_text in enumerate(choices):
-                Choice.objects.create(
-                    poll=poll,
-                    text=choice_text,
-                    order=i
-                )
-            
-            # Update user's poll count
-            if self.user:
-                self.user.polls_created += 1
-                self.user.save(update_fields=['polls_created'])
+            create_poll_with_choices(poll, self.cleaned_data.get('choices', []))
         
         return poll
 
@@ -340,8 +344,8 @@ class QuickPollForm(forms.Form):
         """Create a poll from the quick form data"""
         cleaned_data = self.cleaned_data
         
-        # Create poll
-        poll = Poll.objects.create(
+        # Build the poll in memory; expiry is set before the single INSERT
+        poll = Poll(
             title=cleaned_data['question'],
             creator=user,
             poll_type=cleaned_data['poll_type'],
@@ -355,25 +359,16 @@ class QuickPollForm(forms.Form):
         expires_in_hours = cleaned_data.get('expires_in_hours')
         if expires_in_hours:
             poll.expires_at = timezone.now() + timedelta(hours=int(expires_in_hours))
-            poll.save()
         
-        # Create choices
+        # Choices
         if cleaned_data['poll_type'] == 'yes_no':
-            Choice.objects.create(poll=poll, text='Yes', order=0)
-            Choice.objects.create(poll=poll, text='No', order=1)
+            choices = ['Yes', 'No']
         else:
             # Multiple choice
             choices = [
-                cleaned_data.get('option_1'),
-                cleaned_data.get('option_2'),
-                cleaned_data.get('option_3'),
+                cleaned_data.get(field)
+                for field in ('option_1', 'option_2', 'option_3')
+                if cleaned_data.get(field)
             ]
-            for i, choice_text in enumerate(choices):
-                if choice_text:
-                    Choice.objects.create(poll=poll, text=choice_text, order=i)
-        
-        # Update user's poll count
-        user.polls_created += 1
-        user.save(update_fields=['polls_created'])
         
-        return poll
\ No newline at end of file
+        return create_poll_with_choices(poll, choices)
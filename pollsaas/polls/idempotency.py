@@ -0,0 +1,130 @@
+"""
+Idempotency keys for API submissions.
+
+Clients on flaky connections retry POSTs they never saw an answer to.
+``idempotent(scope)`` lets them send an ``Idempotency-Key`` header: the
+first request with a key runs the view and its response is kept in the
+cache for ``IDEMPOTENCY_TIMEOUT``; a retry with the same key gets that
+response back (with ``Idempotent-Replayed: true``) without running the
+view again.
+
+Keys are scoped to the caller (user, else the IP rate limiting uses,
+so a forged ``X-Forwarded-For`` cannot reach another client's keys) and
+bound to a fingerprint of the request: reusing a key for a different
+body or URL answers 422. While the first request is still running, a retry
+answers 409 with ``Retry-After`` rather than racing it; the in-flight
+marker is claimed with an atomic ``cache.add``. Server errors and
+rate-limited responses are not kept, so those can be retried for real.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+from .ratelimit import client_address
+
+IDEMPOTENCY_TIMEOUT = getattr(settings, 'IDEMPOTENCY_TIMEOUT', 60 * 60 * 24)
+# How long a request may hold its key before a retry may run it again
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+_IN_FLIGHT = 'in-flight'
+
+
+def _caller(request):
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    # Not the session: a first vote creates it, so its retry may carry a cookie the original lacked
+    return f"ip:{client_address(request)}"
+
+
+def fingerprint(request):
+    """Digest of what the request asks for"""
+    digest = hashlib.sha256()
+    for part in (request.method, request.get_full_path(), request.content_type or ''):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _error(message, status, retry_after=None):
+    response = JsonResponse({'success': False, 'error': message}, status=status)
+    if retry_after:
+        response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _replay(record):
+    response = HttpResponse(
+        record['content'], status=record['status'], content_type=record['content_type']
+    )
+    for header, value in record['headers']:
+        response[header] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _keep(response):
+    return not (
+        response.streaming
+        or response.status_code >= 500
+        or response.status_code == 429
+    )
+
+
+def idempotent(scope):
+    """
+    Decorator honouring the ``Idempotency-Key`` header; requests without
+    one run the view as usual.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                return _error('Idempotency-Key is too long.', 400)
+
+            digest = hashlib.sha256(key.encode()).hexdigest()
+            cache_key = f"idempotency:{scope}:{_caller(request)}:{digest}"
+            request_fingerprint = fingerprint(request)
+            claim = {'fingerprint': request_fingerprint, 'state': _IN_FLIGHT}
+
+            if not cache.add(cache_key, claim, IDEMPOTENCY_LOCK_TIMEOUT):
+                record = cache.get(cache_key)
+                if record is not None:
+                    if record['fingerprint'] != request_fingerprint:
+                        return _error('Idempotency-Key was already used for a different request.', 422)
+                    if record['state'] == _IN_FLIGHT:
+                        return _error('A request with this Idempotency-Key is still being processed.', 409, 1)
+                    return _replay(record)
+                # Expired between the two calls; claim it again
+                if not cache.add(cache_key, claim, IDEMPOTENCY_LOCK_TIMEOUT):
+                    return _error('A request with this Idempotency-Key is still being processed.', 409, 1)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                cache.delete(cache_key)
+                raise
+
+            if not _keep(response):
+                cache.delete(cache_key)
+                return response
+            cache.set(cache_key, {
+                'fingerprint': request_fingerprint,
+                'state': 'done',
+                'status': response.status_code,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'headers': [
+                    (header, value) for header, value in response.items()
+                    if header in ('Location', 'Retry-After')
+                ],
+            }, IDEMPOTENCY_TIMEOUT)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,148 @@
+"""
+Time-driven poll state changes.
+
+``expire_due_polls`` moves active polls past their ``expires_at`` to
+``expired`` so the stored status matches what ``Poll.can_vote`` reports;
+``publish_due_polls`` does the same for drafts whose ``publish_at`` has
+arrived. Due polls are found through partial indexes on ``expires_at``
+(active polls) and ``publish_at`` (drafts) and flipped with one
+set-based UPDATE per batch, so a sweep costs time proportional to the number of polls
+actually changing state.
+
+``on_polls_closed`` and ``on_polls_reopened`` hold the side effects every
+path that stops or restarts voting on a poll (expiry, closing, toggling)
+should trigger once the change is committed.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.utils import timezone
+
+from accounts.stats import bump_creator_stats
+
+from .activity import clear_activity, recent_activity
+from .models import Choice, Poll
+from .snapshots import discard_results, freeze_results
+
+EXPIRY_BATCH_SIZE = 500
+# Fewest active choices a poll may go live with
+MIN_PUBLISH_CHOICES = 2
+
+
+def on_polls_closed(poll_ids):
+    """Freeze final results and drop live state for polls that stopped accepting votes"""
+    # Starts the voter data retention window (see polls.retention)
+    Poll.objects.filter(id__in=poll_ids, closed_at__isnull=True).update(closed_at=timezone.now())
+    freeze_results(poll_ids)
+    for poll_id in poll_ids:
+        clear_activity(poll_id)
+
+
+def on_polls_reopened(poll_ids):
+    """Drop frozen results for polls that accept votes again"""
+    Poll.objects.filter(id__in=poll_ids).update(closed_at=None, pii_pruned_at=None)
+    discard_results(poll_ids)
+
+
+def prewarm_polls(poll_ids):
+    """Fill the caches a poll's pages read before it starts getting traffic"""
+    for poll in Poll.objects.filter(id__in=poll_ids):
+        recent_activity(poll)
+
+
+def _flip(queryset, now, batch_size, active_delta, **updates):
+    """
+    Lock up to ``batch_size`` rows of ``queryset`` and update them in one
+    statement. Returns the ids that were changed.
+    """
+    with transaction.atomic():
+        due = list(
+            queryset
+            .select_for_update(skip_locked=True)
+            .values_list('id', 'creator_id')[:batch_size]
+        )
+        if not due:
+            return []
+
+        poll_ids = [poll_id for poll_id, _ in due]
+        Poll.objects.filter(id__in=poll_ids).update(updated_at=now, **updates)
+        for creator_id, count in Counter(creator_id for _, creator_id in due).items():
+            bump_creator_stats(creator_id, active=active_delta * count)
+    return poll_ids
+
+
+def expire_polls(poll_ids=None, now=None, batch_size=EXPIRY_BATCH_SIZE):
+    """
+    Expire one batch of due polls, optionally restricted to ``poll_ids``.
+    Returns the ids that were expired.
+    """
+    now = now or timezone.now()
+    queryset = Poll.objects.filter(status='active', expires_at__lte=now)
+    if poll_ids is not None:
+        queryset = queryset.filter(id__in=poll_ids)
+    expired = _flip(
+        queryset.order_by('expires_at'), now, batch_size, -1,
+        status='expired', is_active=False,
+    )
+    if expired:
+        transaction.on_commit(lambda: on_polls_closed(expired))
+    return expired
+
+
+def publishable(queryset):
+    """Polls in ``queryset`` with enough active choices to go live"""
+    enough_choices = (
+        Choice.objects.filter(poll=OuterRef('pk'), is_active=True)
+        .order_by().values('poll')
+        .annotate(count=Count('pk'))
+        .filter(count__gte=MIN_PUBLISH_CHOICES)
+    )
+    return queryset.filter(Exists(enough_choices))
+
+
+def publish_polls(poll_ids=None, now=None, batch_size=EXPIRY_BATCH_SIZE):
+    """
+    Publish one batch of drafts whose ``publish_at`` has passed,
+    optionally restricted to ``poll_ids``. Drafts without enough active
+    choices stay drafts. Returns the ids published.
+    """
+    now = now or timezone.now()
+    queryset = publishable(Poll.objects.filter(status='draft', publish_at__lte=now))
+    if poll_ids is not None:
+        queryset = queryset.filter(id__in=poll_ids)
+    return _flip(
+        queryset.order_by('publish_at'), now, batch_size, 1,
+        status='active', is_active=True,
+    )
+
+
+def _sweep(flip, now, batch_size):
+    now = now or timezone.now()
+    total = 0
+    while True:
+        count = len(flip(now=now, batch_size=batch_size))
+        total += count
+        if count < batch_size:
+            return total
+
+
+def expire_due_polls(now=None, batch_size=EXPIRY_BATCH_SIZE):
+    """Expire every active poll whose ``expires_at`` has passed"""
+    return _sweep(expire_polls, now, batch_size)
+
+
+def publish_due_polls(now=None, batch_size=EXPIRY_BATCH_SIZE):
+    """Publish every draft whose ``publish_at`` has passed"""
+    return _sweep(publish_polls, now, batch_size)
+
+
+def next_expiry():
+    """When the next active poll is due to expire, or None"""
+    return (
+        Poll.objects
+        .filter(status='active', expires_at__isnull=False)
+        .order_by('expires_at')
+        .values_list('expires_at', flat=True)
+        .first()
+    )
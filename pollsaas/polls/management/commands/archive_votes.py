@@ -0,0 +1,59 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.archive import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_DELETE_BATCH, ARCHIVE_PAUSE, ArchiveMismatch,
+    archivable_polls, archive_poll,
+)
+from polls.models import Poll
+
+
+class Command(BaseCommand):
+    help = "Move votes of long-finished polls into compressed archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS,
+            help="Only archive polls finished at least this many days ago"
+        )
+        parser.add_argument(
+            '--poll', dest='slug',
+            help="Archive a single poll by slug regardless of age"
+        )
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help="Maximum number of polls to archive in this run"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_DELETE_BATCH,
+            help="Archived rows deleted per statement"
+        )
+        parser.add_argument(
+            '--pause', type=float, default=ARCHIVE_PAUSE,
+            help="Seconds to wait between delete batches"
+        )
+
+    def handle(self, *args, **options):
+        if options['slug']:
+            polls = Poll.objects.filter(slug=options['slug'], status__in=['closed', 'expired'])
+            if not polls:
+                raise CommandError(f"No closed or expired poll with slug '{options['slug']}'")
+        else:
+            polls = archivable_polls(timedelta(days=options['older_than_days']))[:options['limit']]
+
+        for poll in polls:
+            started = time.perf_counter()
+            try:
+                archive = archive_poll(
+                    poll, batch_size=options['batch_size'], pause=options['pause']
+                )
+            except ArchiveMismatch as e:
+                self.stderr.write(self.style.ERROR(str(e)))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {archive.row_count} votes of '{poll.slug}' "
+                f"into {archive.size_bytes / 1024:.1f} KiB "
+                f"in {time.perf_counter() - started:.1f}s"
+            ))
@@ -0,0 +1,99 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from polls.models import Poll
+from polls.search import search_polls
+
+User = get_user_model()
+
+BENCHMARK_EMAIL = 'search-benchmark@example.com'
+
+WORDS = (
+    'team lunch venue budget meeting friday weekend trip football match '
+    'church choir rehearsal school parents committee election chairperson '
+    'family reunion date holiday destination project deadline launch '
+    'community clean-up savings group contribution wedding colour theme '
+    'menu dinner movie night book club reading pick neighbourhood security '
+    'fundraiser prize charity hike route office party dress code training '
+    'schedule volunteer shift market stall sports day captain vote best'
+).split()
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic polls and compare icontains with ranked search"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polls', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument(
+            '--skip-seed', action='store_true',
+            help="Reuse polls seeded by a previous run"
+        )
+        parser.add_argument(
+            '--cleanup', action='store_true',
+            help="Delete the benchmark user and its polls afterwards"
+        )
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(
+            email=BENCHMARK_EMAIL, defaults={'username': 'search-benchmark'}
+        )
+        if not options['skip_seed']:
+            self._seed(user, options['polls'], options['batch_size'])
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE polls_poll')
+
+        for term in ('lunch venue', 'footbal', 'wedding colour theme'):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Query: {term!r}"))
+            self._time("icontains", options['runs'], lambda: list(
+                Poll.objects.filter(title__icontains=term)
+                .order_by('-created_at').values_list('id', flat=True)[:20]
+            ))
+            self._time("ranked search", options['runs'], lambda: list(
+                search_polls(Poll.objects.all(), term).values_list('id', flat=True)[:20]
+            ))
+            plan = search_polls(Poll.objects.all(), term)[:20].explain()
+            self.stdout.write(plan)
+
+        if options['cleanup']:
+            Poll.objects.filter(creator=user).delete()
+            user.delete()
+
+    def _seed(self, user, count, batch_size):
+        rng = random.Random(42)
+        offset = Poll.objects.filter(creator=user).count()
+        created = 0
+        start = time.perf_counter()
+        while created < count:
+            size = min(batch_size, count - created)
+            Poll.objects.bulk_create([
+                Poll(
+                    title=' '.join(rng.choices(WORDS, k=rng.randint(3, 8))).capitalize(),
+                    description=' '.join(rng.choices(WORDS, k=rng.randint(0, 20))),
+                    creator=user,
+                    status='active',
+                    slug=f"bench{offset + created + i:010d}",
+                )
+                for i in range(size)
+            ])
+            created += size
+            self.stdout.write(f"Seeded {created}/{count} polls", ending='\r')
+        self.stdout.write(f"\nSeeded {count} polls in {time.perf_counter() - start:.1f}s")
+
+    def _time(self, label, runs, query):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f"  {label:<14} median {timings[len(timings) // 2]:8.2f} ms"
+            f"   best {timings[0]:8.2f} ms"
+        )
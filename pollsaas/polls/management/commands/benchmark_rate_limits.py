@@ -0,0 +1,53 @@
+import random
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from polls.ratelimit import RATE_LIMITS, CacheBuckets, LocalBuckets, check_rate_limit
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead of the rate limiter for each bucket store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50_000)
+        parser.add_argument(
+            '--clients', type=int, default=2000,
+            help="Distinct IPs and sessions the requests are spread over"
+        )
+        parser.add_argument('--polls', type=int, default=50)
+        parser.add_argument('--scope', default='vote', choices=sorted(RATE_LIMITS))
+
+    def handle(self, *args, **options):
+        rng = random.Random(48)
+        factory = RequestFactory()
+        requests = []
+        for _ in range(options['requests']):
+            client = rng.randrange(options['clients'])
+            request = factory.post(
+                '/polls/api/poll/x/vote/',
+                REMOTE_ADDR=f"10.{client // 65536}.{client // 256 % 256}.{client % 256}",
+            )
+            request.session = SimpleNamespace(session_key=f"{client:032x}")
+            requests.append((request, f"bench{rng.randrange(options['polls'])}"))
+
+        cache_backend = settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]
+        if cache_backend == 'LocMemCache':
+            self.stdout.write(self.style.WARNING(
+                "LocMemCache culls past 300 keys by default, so with many clients "
+                "cache buckets are evicted and restart full; set REDIS_URL to measure Redis."
+            ))
+        for label, store in (('local', LocalBuckets()), (f"cache ({cache_backend})", CacheBuckets())):
+            refused = 0
+            started = time.perf_counter()
+            for request, slug in requests:
+                if check_rate_limit(options['scope'], request, slug, store=store):
+                    refused += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:<24} {elapsed / len(requests) * 1_000_000:8.1f} us/request  "
+                f"{len(requests) - refused} allowed, {refused} refused"
+            )
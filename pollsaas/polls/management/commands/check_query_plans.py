@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from polls.models import Poll
+from polls.queryplans import (
+    PLAN_CHECK_EMAIL, analyze, check_plans, plan_check_user, remove_plan_check_data, seed,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed realistic polls and votes and check the hot queries use their indexes. "
+        "Writes hundreds of thousands of rows: run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polls', type=int, default=2000)
+        parser.add_argument('--votes', type=int, default=200_000)
+        parser.add_argument('--voters', type=int, default=200)
+        parser.add_argument(
+            '--skip-seed', action='store_true',
+            help="Reuse data seeded by a previous run"
+        )
+        parser.add_argument(
+            '--cleanup', action='store_true',
+            help="Delete the seeded user, voters, polls and votes afterwards"
+        )
+        parser.add_argument(
+            '--show-plans', action='store_true',
+            help="Print the full plan of every query"
+        )
+        parser.add_argument(
+            '--allow-existing-data', action='store_true',
+            help="Run even though the database holds polls that were not seeded by this command"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Query plans are only checked on PostgreSQL.")
+        # Seeding into a live database would skew its statistics and its
+        # users' dashboards; the only polls expected are our own
+        if (
+            not options['allow_existing_data']
+            and Poll.all_objects.exclude(creator__email=PLAN_CHECK_EMAIL).exists()
+        ):
+            raise CommandError(
+                f"{connection.settings_dict['NAME']} holds real polls; run this against a "
+                f"scratch database (or pass --allow-existing-data)."
+            )
+
+        user = plan_check_user()
+        if not options['skip_seed']:
+            start = time.perf_counter()
+            seed(user, options['polls'], options['votes'], options['voters'])
+            self.stdout.write(
+                f"Seeded {options['polls']} polls and {options['votes']} votes "
+                f"in {time.perf_counter() - start:.1f}s"
+            )
+
+        analyze()
+
+        failures = []
+        try:
+            for label, expected, ok, plan, queryset in check_plans(user):
+                style = self.style.SUCCESS if ok else self.style.ERROR
+                self.stdout.write(style(
+                    f"{'ok  ' if ok else 'FAIL'} {label:<28} {expected:<24} "
+                    f"{plan['Execution Time']:8.2f} ms"
+                ))
+                if options['show_plans'] or not ok:
+                    self.stdout.write(queryset.explain())
+                if not ok:
+                    failures.append(label)
+        except ValueError as e:
+            raise CommandError(f"{e} (run without --skip-seed)")
+
+        if options['cleanup']:
+            remove_plan_check_data(user)
+
+        if failures:
+            raise CommandError(f"Unexpected plans for: {', '.join(failures)}")
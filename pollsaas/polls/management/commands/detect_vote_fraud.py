@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.fraud import FRAUD_BATCH_SIZE, VoteScanner, benchmark
+
+
+class Command(BaseCommand):
+    help = "Flag vote bursts and ballot stuffing in new votes and recount the affected polls"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--name', default='default',
+            help="Checkpoint to resume from"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=FRAUD_BATCH_SIZE,
+            help="Votes read (and flags written) per batch"
+        )
+        parser.add_argument(
+            '--follow', action='store_true',
+            help="Keep polling for new votes instead of stopping when caught up"
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="Seconds to wait between polls for new votes with --follow"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report what would be flagged without changing votes or the checkpoint"
+        )
+        parser.add_argument(
+            '--benchmark', type=int, metavar='VOTES',
+            help="Run the detector over this many synthetic votes and report throughput"
+        )
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self._benchmark(options['benchmark'])
+            return
+
+        scanner = VoteScanner(name=options['name'])
+        started = time.perf_counter()
+        replayed = scanner.warm_up(options['batch_size'])
+        if replayed:
+            self.stdout.write(f"Rebuilt windows from {replayed} recent votes")
+
+        checked = flagged = 0
+        while True:
+            count, flags = scanner.scan(options['batch_size'], dry_run=options['dry_run'])
+            checked += count
+            flagged += len(flags)
+            for vote_id, voted_at, reason in flags if options['dry_run'] else ():
+                self.stdout.write(f"Vote {vote_id} ({voted_at:%Y-%m-%d %H:%M:%S}): {reason}")
+            if count < options['batch_size']:
+                if not options['follow']:
+                    break
+                time.sleep(options['interval'])
+
+        elapsed = time.perf_counter() - started
+        verb = "would flag" if options['dry_run'] else "flagged"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} votes up to id {scanner.last_vote_id} in {elapsed:.1f}s, "
+            f"{verb} {flagged}."
+        ))
+
+    def _benchmark(self, vote_count):
+        result = benchmark(vote_count)
+        reasons = ', '.join(f"{reason} {count}" for reason, count in sorted(result['flagged'].items()))
+        self.stdout.write(
+            f"{result['votes']} votes in {result['seconds']:.2f}s "
+            f"({result['votes_per_second']:,.0f} votes/s)\n"
+            f"Flagged: {reasons or 'none'}\n"
+            f"Attack votes {result['attack_votes']}, missed {result['missed']}, "
+            f"false positives {result['false_positives']}\n"
+            f"State: {result['polls_held']} polls, {result['windows']} windows, "
+            f"{result['timestamps']} timestamps"
+        )
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from polls.degradation import buffer_backlog, drain_vote_buffer
+
+
+class Command(BaseCommand):
+    help = "Record the votes the vote API queued in the cache while the database was saturated"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Queued ballots read from the cache at a time"
+        )
+        parser.add_argument(
+            '--follow', action='store_true',
+            help="Keep draining new ballots instead of stopping when the buffer is empty"
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help="Seconds to wait between passes with --follow"
+        )
+
+    def handle(self, *args, **options):
+        if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            self.stdout.write(self.style.WARNING(
+                "The local-memory cache is per process, so this command cannot see "
+                "ballots queued by the web server; set REDIS_URL."
+            ))
+
+        totals = [0, 0, 0]
+        while True:
+            counts = drain_vote_buffer(options['batch_size'])
+            totals = [total + count for total, count in zip(totals, counts)]
+            if any(counts):
+                recorded, rejected, lost = counts
+                self.stdout.write(f"Recorded {recorded}, rejected {rejected}, lost {lost}")
+            if not options['follow']:
+                break
+            time.sleep(options['interval'])
+
+        tail, head = buffer_backlog()
+        recorded, rejected, lost = totals
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded {recorded} queued ballots, rejected {rejected}, lost {lost}; "
+            f"{head - tail} still queued."
+        ))
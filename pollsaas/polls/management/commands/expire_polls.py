@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.lifecycle import EXPIRY_BATCH_SIZE, expire_due_polls, next_expiry
+
+
+class Command(BaseCommand):
+    help = "Mark active polls past their expiry time as expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=EXPIRY_BATCH_SIZE,
+            help="Polls flipped per UPDATE"
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep sweeping instead of exiting after one pass"
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=30.0,
+            help="Longest wait between sweeps (with --loop)"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_due_polls(batch_size=options['batch_size'])
+            if expired:
+                self.stdout.write(self.style.SUCCESS(f"Expired {expired} polls"))
+            if not options['loop']:
+                break
+
+            # Wake up early if a poll is due before the next regular sweep
+            wait = options['sleep']
+            due = next_expiry()
+            if due is not None:
+                wait = min(wait, max((due - timezone.now()).total_seconds(), 0.5))
+            time.sleep(wait)
@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.bulk import import_polls, parse_definitions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Create polls in bulk from a JSON or CSV file of definitions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON or CSV file (CSV choices are pipe-separated)")
+        parser.add_argument('--user', required=True, help="Email of the poll creator")
+        parser.add_argument(
+            '--ignore-quota', action='store_true',
+            help="Create the polls even if they exceed the user's poll limit"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+
+        path = options['path']
+        with open(path, encoding='utf-8') as fh:
+            content = fh.read()
+
+        try:
+            definitions = parse_definitions(content, 'text/csv' if path.endswith('.csv') else 'application/json')
+        except ValueError as e:
+            raise CommandError(f"Could not parse {path}: {e}")
+
+        start = time.perf_counter()
+        report = import_polls(user, definitions, enforce_quota=not options['ignore_quota'])
+        elapsed = time.perf_counter() - start
+
+        for error in report['errors']:
+            row = f"Row {error['row']}" if error['row'] else "Import"
+            for field, messages in error['errors'].items():
+                for message in messages:
+                    text = message['message'] if isinstance(message, dict) else message
+                    self.stderr.write(f"{row} {field}: {text}")
+
+        timings = ', '.join(f"{phase} {ms} ms" for phase, ms in report['timings'].items())
+        if report['errors']:
+            raise CommandError(f"No polls created ({len(report['errors'])} errors). {timings}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(report['created'])} polls in {elapsed:.2f}s ({timings})"
+        ))
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+from django.utils import timezone
+
+from polls.partitioning import (
+    DEFAULT_PARTITION, DETACH_LOCK_TIMEOUT, PARTITION_MONTHS_AHEAD, create_partitions,
+    default_partition_rows, detach_partitions, is_partitioned, list_partitions, month_start,
+)
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly vote partitions and detach old ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=PARTITION_MONTHS_AHEAD,
+            help="Months of partitions to keep ready beyond the current one"
+        )
+        parser.add_argument(
+            '--detach-before', metavar='YYYY-MM',
+            help="Detach partitions for months before this one (for archival)"
+        )
+        parser.add_argument(
+            '--list', action='store_true',
+            help="List attached partitions"
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError("polls_vote is not partitioned; run migrations first.")
+
+        current = month_start(timezone.now())
+        start = current
+        _, oldest_stranded = default_partition_rows()
+        if oldest_stranded and oldest_stranded < current:
+            # Months that were missed: create them so their votes leave the DEFAULT partition
+            start = month_start(oldest_stranded)
+        months = (current.year - start.year) * 12 + current.month - start.month
+        created = create_partitions(start, months + options['ahead'] + 1)
+        for name in created:
+            self.stdout.write(self.style.SUCCESS(f"Created {name}"))
+        stranded, _ = default_partition_rows()
+        if stranded:
+            self.stdout.write(self.style.WARNING(
+                f"{stranded} votes are still in {DEFAULT_PARTITION}, beyond the months "
+                f"created; run again with a larger --ahead."
+            ))
+
+        if options['detach_before']:
+            try:
+                before = datetime.strptime(options['detach_before'], '%Y-%m')
+            except ValueError:
+                raise CommandError("--detach-before must look like YYYY-MM.")
+            before = before.replace(tzinfo=dt_timezone.utc)
+            if before > month_start(timezone.now()):
+                raise CommandError("Refusing to detach the current or future months.")
+            try:
+                for name in detach_partitions(before):
+                    self.stdout.write(self.style.SUCCESS(f"Detached {name}"))
+            except OperationalError:
+                raise CommandError(
+                    f"Could not lock polls_vote within {DETACH_LOCK_TIMEOUT}; "
+                    f"run again when traffic is lower."
+                )
+
+        if options['list']:
+            for name, lower in list_partitions():
+                self.stdout.write(f"{name}  from {lower:%Y-%m-%d}")
@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from polls.exports import EXPORT_CHUNK_SIZE, claim_next_job, run_export_job
+
+
+class Command(BaseCommand):
+    help = "Process queued poll export jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help="Votes written per checkpoint"
+        )
+        parser.add_argument(
+            '--stale-minutes', type=int, default=10,
+            help="Reclaim running jobs with no progress for this long"
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new jobs instead of exiting when idle"
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help="Seconds to wait between polls when idle (with --loop)"
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_minutes'])
+
+        while True:
+            job = claim_next_job(stale_after=stale_after)
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f"Exporting poll {job.poll_id} (job {job.pk}) from vote {job.last_vote_id}")
+            try:
+                run_export_job(job, chunk_size=options['chunk_size'])
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"Job {job.pk} failed: {e}"))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"Job {job.pk} completed: {job.rows_written} rows"
+            ))
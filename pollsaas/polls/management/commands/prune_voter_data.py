@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from polls.partitioning import VOTE_TABLE
+from polls.retention import (
+    PRUNE_BATCH_SIZE, PRUNE_PAUSE, VOTE_PII_PRUNE_MODE, archives_due_for_pruning,
+    polls_due_for_pruning, prune_archive_pii, prune_poll_pii, vote_storage_sizes,
+)
+
+
+def _mib(value):
+    return f"{value / 1024 / 1024:.1f} MiB"
+
+
+class Command(BaseCommand):
+    help = "Clear voter IP, session and user agent once a poll's retention window has passed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=PRUNE_BATCH_SIZE,
+            help="Votes updated per transaction"
+        )
+        parser.add_argument(
+            '--pause', type=float, default=PRUNE_PAUSE,
+            help="Seconds to wait between batches"
+        )
+        parser.add_argument(
+            '--limit', type=int, default=100,
+            help="Maximum number of polls to prune in this run"
+        )
+        parser.add_argument(
+            '--mode', choices=['hash', 'null'], default=VOTE_PII_PRUNE_MODE,
+            help="Replace the session key with a keyed hash, or clear it"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only list the polls that are due"
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help="VACUUM the vote table afterwards so freed space is reused"
+        )
+
+    def handle(self, *args, **options):
+        polls = list(polls_due_for_pruning()[:options['limit']])
+        if options['dry_run']:
+            for poll in polls:
+                self.stdout.write(f"{poll.slug}  closed {poll.closed_at:%Y-%m-%d}  {poll.total_votes} votes")
+            archives = archives_due_for_pruning().count()
+            self.stdout.write(f"{len(polls)} polls due, plus {archives} archives written before pruning")
+            return
+
+        table_before, indexes_before = vote_storage_sizes()
+        total = 0
+        for poll in polls:
+            started = time.perf_counter()
+            pruned = prune_poll_pii(
+                poll, batch_size=options['batch_size'], pause=options['pause'], mode=options['mode']
+            )
+            total += pruned
+            self.stdout.write(self.style.SUCCESS(
+                f"Pruned {pruned} votes of '{poll.slug}' in {time.perf_counter() - started:.1f}s"
+            ))
+
+        # Archives written before polls had to be pruned first
+        for archive in archives_due_for_pruning()[:options['limit']]:
+            pruned = prune_archive_pii(archive, mode=options['mode'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Pruned {pruned} archived votes of '{archive.poll.slug}'"
+            ))
+
+        if options['vacuum'] and total:
+            with connection.cursor() as cursor:
+                cursor.execute(f'VACUUM (ANALYZE) "{VOTE_TABLE}"')
+
+        table_after, indexes_after = vote_storage_sizes()
+        self.stdout.write(
+            f"Pruned {total} votes across {len(polls)} polls\n"
+            f"Vote table:   {_mib(table_before)} -> {_mib(table_after)}\n"
+            f"Vote indexes: {_mib(indexes_before)} -> {_mib(indexes_after)}"
+        )
+        if total:
+            # Updated rows get new versions; the old ones become free space
+            self.stdout.write(
+                "Space freed by pruning is reused by new votes once vacuumed "
+                "(--vacuum); files only shrink when a partition is rewritten."
+            )
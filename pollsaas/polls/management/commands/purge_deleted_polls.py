@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.purge import PURGE_BATCH_SIZE, PURGE_PAUSE, pending_purges, purge_poll
+
+
+class Command(BaseCommand):
+    help = "Remove deleted polls and their votes in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=PURGE_BATCH_SIZE,
+            help="Rows deleted per statement"
+        )
+        parser.add_argument(
+            '--pause', type=float, default=PURGE_PAUSE,
+            help="Seconds to wait between batches"
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep waiting for new deletions instead of exiting when idle"
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=10.0,
+            help="Seconds to wait when idle (with --loop)"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            poll_ids = list(pending_purges()[:100])
+            if not poll_ids:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            for poll_id in poll_ids:
+                started = time.perf_counter()
+                counts = purge_poll(
+                    poll_id, batch_size=options['batch_size'], pause=options['pause']
+                )
+                self.stdout.write(self.style.SUCCESS(
+                    f"Purged poll {poll_id}: {counts['votes']} votes, "
+                    f"{counts['choices']} choices, {counts['export_jobs']} exports "
+                    f"in {time.perf_counter() - started:.1f}s"
+                ))
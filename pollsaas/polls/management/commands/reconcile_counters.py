@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.reconcile import RECONCILE_BATCH_SIZE, RECONCILE_PAUSE, reconcile_counters
+
+LABELS = {'choice': 'Choice', 'poll': 'Poll', 'user': 'User'}
+
+
+class Command(BaseCommand):
+    help = "Recount vote and poll-quota counters from the source rows and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=RECONCILE_BATCH_SIZE,
+            help="Polls (and users) recounted per query"
+        )
+        parser.add_argument(
+            '--pause', type=float, default=RECONCILE_PAUSE,
+            help="Seconds to wait between batches"
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help="Only check polls with votes since the last run (a full run if there is none)"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report drift without repairing it"
+        )
+        parser.add_argument(
+            '--quiet', action='store_true',
+            help="Only print the summary"
+        )
+
+    def handle(self, *args, **options):
+        def report(entry):
+            self.stdout.write(
+                f"{LABELS[entry['kind']]} {entry['id']}: "
+                f"{entry['field']} {entry['stored']} -> {entry['actual']}"
+            )
+
+        started = time.perf_counter()
+        run = reconcile_counters(
+            incremental=options['incremental'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+            report=None if options['quiet'] else report,
+        )
+
+        verb = "found drifted" if run.dry_run else "repaired"
+        self.stdout.write(self.style.SUCCESS(
+            f"{run.get_mode_display()} run {run.pk}: checked {run.polls_checked} polls and "
+            f"{run.users_checked} users in {time.perf_counter() - started:.1f}s; {verb} "
+            f"{run.polls_repaired} polls, {run.choices_repaired} choices, {run.users_repaired} users."
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from polls.lifecycle import EXPIRY_BATCH_SIZE, expire_due_polls, publish_due_polls
+from polls.scheduler import PollScheduler
+
+
+class Command(BaseCommand):
+    help = "Publish scheduled polls and expire due polls on time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon', type=float, default=60.0,
+            help="Seconds of upcoming events to keep in memory"
+        )
+        parser.add_argument(
+            '--refresh', type=float, default=1.0,
+            help="Seconds between checks for newly scheduled polls"
+        )
+        parser.add_argument(
+            '--prewarm', type=float, default=2.0,
+            help="Seconds before publishing to pre-warm a poll's caches"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=EXPIRY_BATCH_SIZE,
+            help="Polls flipped per UPDATE"
+        )
+
+    def handle(self, *args, **options):
+        # Catch up on anything that fell due while the scheduler was down
+        published = publish_due_polls(batch_size=options['batch_size'])
+        expired = expire_due_polls(batch_size=options['batch_size'])
+        self.stdout.write(f"Caught up: {published} published, {expired} expired")
+
+        scheduler = PollScheduler(
+            horizon=options['horizon'],
+            refresh=options['refresh'],
+            prewarm=options['prewarm'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        scheduler.run_forever()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from polls.useragents import storage_report
+
+
+def _mib(value):
+    return f"{value / 1024 / 1024:.1f} MiB"
+
+
+class Command(BaseCommand):
+    help = "Report storage saved by interning vote user agents"
+
+    def handle(self, *args, **options):
+        report = storage_report()
+        self.stdout.write(
+            f"{report['agents']} distinct user agents referenced by {report['votes']} votes"
+        )
+        self.stdout.write(f"Inline text would take:  {_mib(report['inline_bytes'])}")
+        self.stdout.write(f"References + lookup:     {_mib(report['reference_bytes'])}")
+        self.stdout.write(self.style.SUCCESS(f"Saved:                   {_mib(report['saved_bytes'])}"))
+        for device_class, count in report['devices'].items():
+            self.stdout.write(f"  {device_class:<8} {count}")
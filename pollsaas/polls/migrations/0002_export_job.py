@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('results_version', models.CharField(help_text='Snapshot of the poll counters the artifact was built from', max_length=64, verbose_name='Results Version')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Status')),
+                ('last_vote_id', models.BigIntegerField(default=0)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('bytes_written', models.PositiveBigIntegerField(default=0)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('artifact', models.FileField(blank=True, upload_to='exports/', verbose_name='Export File')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('poll', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='polls.poll', verbose_name='Poll')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Requested By')),
+            ],
+            options={
+                'verbose_name': 'Export Job',
+                'verbose_name_plural': 'Export Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['poll', 'results_version'], name='polls_expor_poll_id_4f5536_idx'), models.Index(fields=['status', 'created_at'], name='polls_expor_status_063069_idx')],
+            },
+        ),
+    ]
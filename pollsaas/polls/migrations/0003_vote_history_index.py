@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_export_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vote',
+            name='polls_vote_poll_id_d3abaf_idx',
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['poll', '-voted_at', '-id'], name='polls_vote_poll_id_02be78_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:23
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_vote_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='poll',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='poll_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='poll_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_poll_search'),
+    ]
+
+    operations = [
+        # Feeds polls.slugs.allocate_slugs; each value reserves one block
+        # of slug numbers, which are permuted before being encoded.
+        migrations.RunSQL(
+            'CREATE SEQUENCE IF NOT EXISTS polls_poll_slug_seq AS bigint START 1',
+            'DROP SEQUENCE IF EXISTS polls_poll_slug_seq',
+        ),
+    ]
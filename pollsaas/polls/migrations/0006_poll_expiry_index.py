@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0005_poll_slug_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['status', 'expires_at'], name='polls_poll_status_a925b5_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_poll_expiry_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='publish_at',
+            field=models.DateTimeField(blank=True, help_text='Optional: Keep as a draft and go live automatically at this time', null=True, verbose_name='Publish At'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['status', 'publish_at'], name='polls_poll_status_a0aacb_idx'),
+        ),
+    ]
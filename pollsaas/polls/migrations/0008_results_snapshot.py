@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_poll_publish_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultsSnapshot',
+            fields=[
+                ('poll', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='results_snapshot', serialize=False, to='polls.poll', verbose_name='Poll')),
+                ('document', models.JSONField(help_text='Counts, percentages and analytics summary at close', verbose_name='Results Document')),
+                ('etag', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Results Snapshot',
+                'verbose_name_plural': 'Results Snapshots',
+            },
+        ),
+    ]
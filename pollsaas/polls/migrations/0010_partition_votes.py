@@ -0,0 +1,198 @@
+"""
+Convert polls_vote into a table range-partitioned by month on voted_at.
+
+The conversion runs online:
+
+1. A partitioned shadow table is created with monthly partitions
+   covering existing votes plus a few months ahead, and a trigger
+   mirrors every write on polls_vote into it from then on.
+2. Existing rows are copied in id batches, each committed separately
+   (the migration is non-atomic), so writers are never blocked for
+   long.
+3. Under a brief exclusive lock the remaining rows are copied, the
+   trigger dropped and the tables swapped. The old table is dropped once
+   the row counts match: left in place, its foreign keys would block
+   deleting any poll, choice or user with votes, and it would keep voter
+   data past the retention window.
+
+Votes for a month without a partition go to polls_vote_default rather
+than failing.
+
+The global unique index on (poll, voter) cannot exist on a partitioned
+table (unique indexes must include voted_at); the vote paths serialize
+per voter with an advisory lock instead (polls.partitioning.lock_voter).
+"""
+import re
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations, transaction
+
+COPY_BATCH_SIZE = 50_000
+MONTHS_AHEAD = 3
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(value):
+    return _month_start(value + timedelta(days=32))
+
+
+def _prepare(cursor):
+    cursor.execute("SELECT min(voted_at), max(id) FROM polls_vote")
+    oldest, _ = cursor.fetchone()
+    now = datetime.now(timezone.utc)
+
+    cursor.execute("CREATE SEQUENCE polls_vote_part_id_seq AS bigint")
+    cursor.execute(
+        "CREATE TABLE polls_vote_new (LIKE polls_vote INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (voted_at)"
+    )
+    cursor.execute(
+        "ALTER TABLE polls_vote_new ALTER COLUMN id SET DEFAULT nextval('polls_vote_part_id_seq')"
+    )
+    cursor.execute(
+        "ALTER TABLE polls_vote_new ADD CONSTRAINT polls_vote_new_pkey PRIMARY KEY (id, voted_at)"
+    )
+
+    # Same foreign keys as the original table
+    cursor.execute(
+        """
+        SELECT pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'polls_vote'::regclass AND contype = 'f'
+        """
+    )
+    for (definition,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE polls_vote_new ADD {definition}")
+
+    # Same secondary indexes, under temporary names until the swap
+    cursor.execute(
+        """
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE tablename = 'polls_vote' AND indexdef NOT LIKE 'CREATE UNIQUE%'
+        """
+    )
+    for name, definition in cursor.fetchall():
+        definition = definition.replace(f"INDEX {name} ", f"INDEX {name}_p ", 1)
+        definition = re.sub(r" ON (public\.)?polls_vote ", " ON polls_vote_new ", definition, count=1)
+        cursor.execute(definition)
+
+    cursor.execute("CREATE TABLE polls_vote_default PARTITION OF polls_vote_new DEFAULT")
+    month = _month_start(oldest or now)
+    last = _month_start(now + timedelta(days=31 * MONTHS_AHEAD))
+    while month <= last:
+        upper = _next_month(month)
+        cursor.execute(
+            f"CREATE TABLE polls_vote_p{month:%Y%m} PARTITION OF polls_vote_new "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [month, upper],
+        )
+        month = upper
+
+    cursor.execute(
+        """
+        CREATE FUNCTION polls_vote_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM polls_vote_new WHERE id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO polls_vote_new SELECT NEW.* ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    cursor.execute(
+        "CREATE TRIGGER polls_vote_mirror AFTER INSERT OR UPDATE OR DELETE ON polls_vote "
+        "FOR EACH ROW EXECUTE FUNCTION polls_vote_mirror()"
+    )
+
+
+def _copy_range(cursor, after, upto):
+    cursor.execute(
+        "INSERT INTO polls_vote_new SELECT * FROM polls_vote "
+        "WHERE id > %s AND id <= %s ON CONFLICT DO NOTHING",
+        [after, upto],
+    )
+
+
+def _swap(cursor, copied_upto):
+    cursor.execute("LOCK TABLE polls_vote IN ACCESS EXCLUSIVE MODE")
+    cursor.execute("SELECT coalesce(max(id), 0) FROM polls_vote")
+    (max_id,) = cursor.fetchone()
+    _copy_range(cursor, copied_upto, max_id)
+
+    cursor.execute("DROP TRIGGER polls_vote_mirror ON polls_vote")
+    cursor.execute("DROP FUNCTION polls_vote_mirror()")
+
+    cursor.execute("SELECT (SELECT count(*) FROM polls_vote), (SELECT count(*) FROM polls_vote_new)")
+    old_count, new_count = cursor.fetchone()
+    if old_count != new_count:
+        raise RuntimeError(
+            f"polls_vote has {old_count} rows but the partitioned copy has {new_count}"
+        )
+
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'polls_vote'")
+    old_indexes = [name for (name,) in cursor.fetchall()]
+    cursor.execute("DROP TABLE polls_vote")
+
+    cursor.execute("ALTER TABLE polls_vote_new RENAME TO polls_vote")
+    cursor.execute("ALTER INDEX polls_vote_new_pkey RENAME TO polls_vote_pkey")
+    for name in old_indexes:
+        cursor.execute("SELECT to_regclass(%s)", [f"{name}_p"])
+        if cursor.fetchone()[0] is not None:
+            cursor.execute(f'ALTER INDEX "{name}_p" RENAME TO "{name}"')
+
+    cursor.execute("SELECT setval('polls_vote_part_id_seq', greatest(%s, 1))", [max_id])
+    cursor.execute("ALTER SEQUENCE polls_vote_part_id_seq OWNED BY polls_vote.id")
+
+
+def partition_votes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'polls_vote'")
+        if cursor.fetchone()[0] == 'p':
+            return
+
+        with transaction.atomic(using=connection.alias):
+            _prepare(cursor)
+
+        # Everything written from here on is mirrored by the trigger
+        cursor.execute("SELECT coalesce(max(id), 0) FROM polls_vote")
+        (copy_until,) = cursor.fetchone()
+        copied = 0
+        while copied < copy_until:
+            upto = min(copied + COPY_BATCH_SIZE, copy_until)
+            with transaction.atomic(using=connection.alias):
+                _copy_range(cursor, copied, upto)
+            copied = upto
+
+        with transaction.atomic(using=connection.alias):
+            _swap(cursor, copied)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('polls', '0009_poll_soft_delete'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='vote',
+                    name='unique_registered_user_vote',
+                ),
+            ],
+        ),
+        migrations.RunPython(partition_votes, elidable=False),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_partition_votes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteArchive',
+            fields=[
+                ('poll', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vote_archive', serialize=False, to='polls.poll', verbose_name='Poll')),
+                ('file', models.FileField(upload_to='archives/votes/', verbose_name='Archive File')),
+                ('format_version', models.PositiveSmallIntegerField(default=1)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('max_vote_id', models.BigIntegerField(default=0, help_text='Votes up to this id are in the archive')),
+                ('checksum', models.CharField(help_text='SHA-256 over the archived rows', max_length=64)),
+                ('size_bytes', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('verified_at', models.DateTimeField(blank=True, null=True)),
+                ('purged_at', models.DateTimeField(blank=True, help_text='When the archived rows were removed from the vote table', null=True)),
+            ],
+            options={
+                'verbose_name': 'Vote Archive',
+                'verbose_name_plural': 'Vote Archives',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_vote_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ua_hash', models.CharField(help_text='SHA-256 of the user-agent string', max_length=64, unique=True, verbose_name='Hash')),
+                ('text', models.TextField(verbose_name='User Agent')),
+                ('device_class', models.CharField(choices=[('desktop', 'Desktop'), ('mobile', 'Mobile'), ('tablet', 'Tablet'), ('bot', 'Bot'), ('other', 'Other')], default='other', max_length=10, verbose_name='Device Class')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'User Agent',
+                'verbose_name_plural': 'User Agents',
+            },
+        ),
+        # Filled in by 0013 and renamed to user_agent once the text
+        # column is gone
+        migrations.AddField(
+            model_name='vote',
+            name='user_agent_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='polls.useragent', verbose_name='User Agent', help_text='Browser information'),
+        ),
+    ]
@@ -0,0 +1,102 @@
+"""
+Point every vote at an interned UserAgent row and drop the text column.
+
+Votes are processed in id ranges, each committed on its own: the
+distinct strings of a range are interned first, then the range is
+updated with a join on the text. ``user_agent_report`` shows the
+savings afterwards.
+
+The device classifier and the length limit are copies of those in
+``polls.useragents`` as they stood when this migration was written.
+"""
+import hashlib
+import re
+
+from django.db import migrations
+
+BACKFILL_BATCH_SIZE = 50_000
+USER_AGENT_MAX_LENGTH = 500
+
+_BOT = re.compile(r'bot|crawl|spider|slurp|preview|facebookexternalhit|curl|wget|python-requests', re.I)
+_TABLET = re.compile(r'ipad|tablet|kindle|silk|playbook', re.I)
+_MOBILE = re.compile(r'mobi|iphone|ipod|android|windows phone|opera mini', re.I)
+
+
+def classify_device(text):
+    if not text:
+        return 'other'
+    if _BOT.search(text):
+        return 'bot'
+    if _TABLET.search(text) or ('android' in text.lower() and 'mobile' not in text.lower()):
+        return 'tablet'
+    if _MOBILE.search(text):
+        return 'mobile'
+    if re.search(r'windows|macintosh|x11|linux|cros', text, re.I):
+        return 'desktop'
+    return 'other'
+
+
+def intern_user_agents(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    UserAgent = apps.get_model('polls', 'UserAgent')
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT coalesce(max(id), 0) FROM polls_vote")
+        (max_id,) = cursor.fetchone()
+
+        after = 0
+        while after < max_id:
+            upto = after + BACKFILL_BATCH_SIZE
+            cursor.execute(
+                "SELECT DISTINCT user_agent FROM polls_vote "
+                "WHERE id > %s AND id <= %s AND user_agent <> ''",
+                [after, upto],
+            )
+            texts = {text[:USER_AGENT_MAX_LENGTH] for (text,) in cursor.fetchall()}
+            UserAgent.objects.bulk_create(
+                [
+                    UserAgent(
+                        ua_hash=hashlib.sha256(text.encode('utf-8')).hexdigest(),
+                        text=text,
+                        device_class=classify_device(text),
+                    )
+                    for text in texts
+                ],
+                ignore_conflicts=True,
+            )
+            cursor.execute(
+                """
+                UPDATE polls_vote SET user_agent_ref_id = ua.id
+                FROM polls_useragent ua
+                WHERE polls_vote.id > %s AND polls_vote.id <= %s
+                  AND polls_vote.user_agent <> ''
+                  AND ua.text = left(polls_vote.user_agent, %s)
+                  AND polls_vote.user_agent_ref_id IS NULL
+                """,
+                [after, upto, USER_AGENT_MAX_LENGTH],
+            )
+            after = upto
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('polls', '0012_user_agent'),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_user_agents, migrations.RunPython.noop, elidable=False),
+        migrations.RemoveField(
+            model_name='vote',
+            name='user_agent',
+        ),
+        migrations.RenameField(
+            model_name='vote',
+            old_name='user_agent_ref',
+            new_name='user_agent',
+        ),
+    ]
@@ -0,0 +1,175 @@
+"""
+Replace generic indexes with partial and covering ones shaped after the
+queries that actually run (see the check_query_plans command).
+
+Poll and choice indexes are built CONCURRENTLY. PostgreSQL cannot do
+that for an index on a partitioned table, so vote indexes are created
+ON ONLY the parent (an invalid, empty shell), built CONCURRENTLY on
+every partition and then attached, which makes the parent index valid
+without ever blocking writes.
+"""
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+import django.db.models.deletion
+from django.db import migrations, models
+
+VOTE_INDEXES = [
+    models.Index(
+        fields=['poll', '-voted_at', '-id'], include=['choice', 'voter', 'is_valid'],
+        name='vote_history_covering',
+    ),
+    models.Index(
+        fields=['poll', 'voter_ip', 'voter_session'], include=['voted_at'],
+        name='vote_dup_anonymous',
+    ),
+    models.Index(
+        fields=['voter', 'poll'], condition=models.Q(voter__isnull=False),
+        name='vote_dup_registered',
+    ),
+    models.Index(
+        fields=['-voted_at', '-id'], condition=models.Q(is_valid=False),
+        name='vote_invalid_recent',
+    ),
+    models.Index(
+        fields=['flagged_reason', '-voted_at', '-id'], condition=~models.Q(flagged_reason=''),
+        name='vote_flagged_recent',
+    ),
+]
+
+OLD_VOTE_INDEXES = [
+    ('polls_vote_poll_id_02be78_idx', models.Index(fields=['poll', '-voted_at', '-id'], name='polls_vote_poll_id_02be78_idx')),
+    ('polls_vote_voter_i_066d04_idx', models.Index(fields=['voter_ip', 'poll'], name='polls_vote_voter_i_066d04_idx')),
+    ('polls_vote_voter_i_f88305_idx', models.Index(fields=['voter', 'poll'], name='polls_vote_voter_i_f88305_idx')),
+]
+
+
+def _partitions(cursor):
+    cursor.execute(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'polls_vote'::regclass
+        ORDER BY child.relname
+        """
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def create_vote_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    Vote = apps.get_model('polls', 'Vote')
+    if connection.vendor != 'postgresql':
+        for index in VOTE_INDEXES:
+            schema_editor.add_index(Vote, index)
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'polls_vote'")
+        partitioned = cursor.fetchone()[0] == 'p'
+        partitions = _partitions(cursor) if partitioned else []
+
+        for index in VOTE_INDEXES:
+            sql = str(index.create_sql(Vote, schema_editor))
+            cursor.execute("SELECT to_regclass(%s)", [index.name])
+            exists = cursor.fetchone()[0] is not None
+            if not partitioned:
+                if not exists:
+                    cursor.execute(sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1))
+                continue
+
+            if not exists:
+                cursor.execute(sql.replace(' ON "polls_vote" ', ' ON ONLY "polls_vote" ', 1))
+            # Safe to repeat after an interrupted run: attaching an index
+            # that is already attached is a no-op
+            for partition in partitions:
+                child = f"{partition}_{index.name}"[:63]
+                cursor.execute(
+                    sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1)
+                    .replace(f'"{index.name}"', f'"{child}"', 1)
+                    .replace(' ON "polls_vote" ', f' ON "{partition}" ', 1)
+                )
+                cursor.execute(f'ALTER INDEX "{index.name}" ATTACH PARTITION "{child}"')
+
+
+def drop_vote_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for index in VOTE_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS "{index.name}"')
+
+
+def drop_old_vote_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for name, _ in OLD_VOTE_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def restore_old_vote_indexes(apps, schema_editor):
+    Vote = apps.get_model('polls', 'Vote')
+    for _, index in OLD_VOTE_INDEXES:
+        schema_editor.add_index(Vote, index)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('polls', '0013_intern_user_agents'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='choice',
+            index=models.Index(fields=['poll', 'order', 'created_at'], name='choice_poll_order'),
+        ),
+        AddIndexConcurrently(
+            model_name='poll',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['expires_at'], name='poll_active_expiry'),
+        ),
+        AddIndexConcurrently(
+            model_name='poll',
+            index=models.Index(condition=models.Q(('status', 'draft')), fields=['publish_at'], name='poll_draft_publish'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='choice',
+            name='polls_choic_poll_id_cdd564_idx',
+        ),
+        migrations.AlterField(
+            model_name='choice',
+            name='poll',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='choices', to='polls.poll', verbose_name='Poll'),
+        ),
+        # Redundant with the unique constraint on slug
+        RemoveIndexConcurrently(
+            model_name='poll',
+            name='polls_poll_slug_3e2bd9_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='poll',
+            name='polls_poll_status_a925b5_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='poll',
+            name='polls_poll_status_a0aacb_idx',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='vote', index=index) for index in VOTE_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_vote_indexes, drop_vote_indexes),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name='vote', name=name) for name, _ in OLD_VOTE_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(drop_old_vote_indexes, restore_old_vote_indexes),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='poll',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='polls.poll', verbose_name='Poll'),
+        ),
+    ]
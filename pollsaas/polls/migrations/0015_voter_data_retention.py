@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:59
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def backfill_closed_at(apps, schema_editor):
+    # Polls closed before closed_at existed count from their last update
+    Poll = apps.get_model('polls', 'Poll')
+    Poll.objects.filter(
+        Q(status__in=['closed', 'expired']) | Q(status='active', is_active=False)
+    ).update(closed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0014_tune_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_closed_at, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='poll',
+            name='pii_pruned_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='poll',
+            name='pii_retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Days after closing to keep voter IP, session and browser; blank uses the site default', null=True, verbose_name='Voter Data Retention (days)'),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='voter_ip',
+            field=models.GenericIPAddressField(blank=True, help_text='IP address of the voter (cleared after the retention window)', null=True, verbose_name='Voter IP'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(condition=models.Q(('closed_at__isnull', False), ('pii_pruned_at__isnull', True)), fields=['closed_at'], name='poll_pending_pii_prune'),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Wider than vote_history_covering so the reconciliation aggregates can
+# identify voters without visiting the heap
+POLL_COVERING = models.Index(
+    fields=['poll', '-voted_at', '-id'],
+    include=['choice', 'voter', 'is_valid', 'voter_ip', 'voter_session'],
+    name='vote_poll_covering',
+)
+HISTORY_COVERING = models.Index(
+    fields=['poll', '-voted_at', '-id'], include=['choice', 'voter', 'is_valid'],
+    name='vote_history_covering',
+)
+
+
+def _partitions(cursor):
+    cursor.execute(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'polls_vote'::regclass
+        ORDER BY child.relname
+        """
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def _create_vote_index(schema_editor, Vote, index):
+    """
+    Build ``index`` without blocking writes, as 0014 does: ON ONLY the
+    parent, CONCURRENTLY on each partition, then attached. Safe to run
+    again after an interruption.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        schema_editor.add_index(Vote, index)
+        return
+
+    sql = str(index.create_sql(Vote, schema_editor))
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'polls_vote'")
+        if cursor.fetchone()[0] != 'p':
+            cursor.execute(
+                sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1)
+            )
+            return
+        cursor.execute(
+            sql.replace('CREATE INDEX', 'CREATE INDEX IF NOT EXISTS', 1)
+            .replace(' ON "polls_vote" ', ' ON ONLY "polls_vote" ', 1)
+        )
+        for partition in _partitions(cursor):
+            child = f"{partition}_{index.name}"[:63]
+            cursor.execute(
+                sql.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS', 1)
+                .replace(f'"{index.name}"', f'"{child}"', 1)
+                .replace(' ON "polls_vote" ', f' ON "{partition}" ', 1)
+            )
+            # Attaching an index that is already attached is a no-op
+            cursor.execute(f'ALTER INDEX "{index.name}" ATTACH PARTITION "{child}"')
+
+
+def _creator(index):
+    def create(apps, schema_editor):
+        _create_vote_index(schema_editor, apps.get_model('polls', 'Vote'), index)
+    return create
+
+
+def _dropper(index):
+    def drop(apps, schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS "{index.name}"')
+    return drop
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('polls', '0015_voter_data_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('full', 'Full'), ('incremental', 'Incremental')], default='full', max_length=20)),
+                ('dry_run', models.BooleanField(default=False)),
+                ('vote_high_water', models.BigIntegerField(default=0, help_text='Votes up to this id were settled when the run started')),
+                ('polls_checked', models.PositiveIntegerField(default=0)),
+                ('polls_repaired', models.PositiveIntegerField(default=0)),
+                ('choices_repaired', models.PositiveIntegerField(default=0)),
+                ('users_checked', models.PositiveIntegerField(default=0)),
+                ('users_repaired', models.PositiveIntegerField(default=0)),
+                ('drift', models.JSONField(blank=True, default=list, help_text='Counters found out of step (first entries only)')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Reconciliation Run',
+                'verbose_name_plural': 'Reconciliation Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='vote', index=POLL_COVERING)],
+            database_operations=[
+                migrations.RunPython(_creator(POLL_COVERING), _dropper(POLL_COVERING)),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.RemoveIndex(model_name='vote', name='vote_history_covering')],
+            database_operations=[
+                migrations.RunPython(_dropper(HISTORY_COVERING), _creator(HISTORY_COVERING)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0016_reconcile_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FraudCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='default', max_length=50, unique=True)),
+                ('last_vote_id', models.BigIntegerField(default=0, help_text='Votes up to this id have been checked')),
+                ('last_voted_at', models.DateTimeField(blank=True, null=True)),
+                ('window_vote_id', models.BigIntegerField(default=0, help_text='Votes after this id are replayed to rebuild the windows on restart')),
+                ('votes_checked', models.PositiveBigIntegerField(default=0)),
+                ('votes_flagged', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Fraud Checkpoint',
+                'verbose_name_plural': 'Fraud Checkpoints',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:37
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_pii_pruned_at(apps, schema_editor):
+    # Archives written after their poll was pruned never held voter data;
+    # older ones are left for prune_voter_data to rewrite
+    Poll = apps.get_model('polls', 'Poll')
+    VoteArchive = apps.get_model('polls', 'VoteArchive')
+    VoteArchive.objects.filter(poll__pii_pruned_at__lte=F('created_at')).update(
+        pii_pruned_at=Subquery(Poll.objects.filter(pk=OuterRef('poll_id')).values('pii_pruned_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0017_fraud_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='votearchive',
+            name='pii_pruned_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When voter IP, session and browser were cleared from the file', null=True),
+        ),
+        migrations.RunPython(backfill_pii_pruned_at, migrations.RunPython.noop),
+    ]
@@ -2,14 +2,23 @@ from django.db import models
 
 # Create your models here.
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.utils import timezone
 from django.urls import reverse
 import urllib.parse
-import secrets
-import string
+
+from .slugs import allocate_slugs
 
 User = get_user_model()
 
+
+class PollManager(models.Manager):
+    """Default manager: hides polls that are deleted and awaiting purge"""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Poll(models.Model):
     """
     Main Poll model for creating polls
@@ -91,6 +100,12 @@ class Poll(models.Model):
         verbose_name="Expires At",
         help_text="Optional: Set when poll should automatically close"
     )
+    publish_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Publish At",
+        help_text="Optional: Keep as a draft and go live automatically at this time"
+    )
     
     # Unique identifier for sharing
     slug = models.SlugField(
@@ -104,14 +119,63 @@ class Poll(models.Model):
     total_votes = models.IntegerField(default=0)
     unique_voters = models.IntegerField(default=0)
     
+    # Set when the creator deletes the poll; rows are purged in the background
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    # Voter IP, session and user agent are pruned some days after closing
+    closed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    pii_retention_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Voter Data Retention (days)",
+        help_text="Days after closing to keep voter IP, session and browser; blank uses the site default"
+    )
+    pii_pruned_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    # Full-text search document, maintained by PostgreSQL
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', weight='A', config='english')
+            + SearchVector('description', weight='B', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    
+    objects = PollManager()
+    all_objects = models.Manager()
+    
     class Meta:
         verbose_name = "Poll"
         verbose_name_plural = "Polls"
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['creator', '-created_at']),
-            models.Index(fields=['slug']),
             models.Index(fields=['status', 'is_active']),
+            # The expiry sweep and the publish scheduler only look at
+            # active polls and drafts respectively
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(status='active'),
+                name='poll_active_expiry',
+            ),
+            models.Index(
+                fields=['publish_at'],
+                condition=models.Q(status='draft'),
+                name='poll_draft_publish',
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(deleted_at__isnull=False),
+                name='poll_pending_purge',
+            ),
+            models.Index(
+                fields=['closed_at'],
+                condition=models.Q(closed_at__isnull=False, pii_pruned_at__isnull=True),
+                name='poll_pending_pii_prune',
+            ),
+            GinIndex(fields=['search_vector'], name='poll_search_vector_gin'),
+            GinIndex(fields=['title'], name='poll_title_trgm', opclasses=['gin_trgm_ops']),
         ]
     
     def save(self, *args, **kwargs):
@@ -127,11 +191,13 @@ class Poll(models.Model):
         super().save(*args, **kwargs)
     
     def generate_unique_slug(self):
-        """Generate a unique random slug"""
-        while True:
-            slug = ''.join(secrets.choice(string.ascii_lowercase + string.digits) for _ in range(8))
-            if not Poll.objects.filter(slug=slug).exists():
-                return slug
+        """Allocate a unique slug (no existence check needed)"""
+        return allocate_slugs(1)[0]
+    
+    @classmethod
+    def generate_unique_slugs(cls, count):
+        """Allocate ``count`` unique slugs"""
+        return allocate_slugs(count)
     
     @property
     def is_expired(self):
@@ -172,14 +238,14 @@ class Poll(models.Model):
         return f"https://wa.me/?text={urllib.parse.quote(message)}"
     
     def increment_vote_count(self):
-        """Increment total vote count"""
+        """Increment total vote count (in the database, so a concurrent recount is not undone)"""
+        Poll.all_objects.filter(pk=self.pk).update(total_votes=models.F('total_votes') + 1)
         self.total_votes += 1
-        self.save(update_fields=['total_votes'])
     
     def increment_voter_count(self):
-        """Increment unique voter count"""
+        """Increment unique voter count (in the database, so a concurrent recount is not undone)"""
+        Poll.all_objects.filter(pk=self.pk).update(unique_voters=models.F('unique_voters') + 1)
         self.unique_voters += 1
-        self.save(update_fields=['unique_voters'])
     
     def __str__(self):
         return f"{self.title} ({self.get_poll_type_display()})"
@@ -193,7 +259,8 @@ class Choice(models.Model):
         Poll,
         on_delete=models.CASCADE,
         related_name='choices',
-        verbose_name="Poll"
+        verbose_name="Poll",
+        db_index=False  # covered by choice_poll_order
     )
     text = models.CharField(
         max_length=200,
@@ -230,7 +297,9 @@ class Choice(models.Model):
         verbose_name_plural = "Choices"
         ordering = ['order', 'created_at']
         indexes = [
-            models.Index(fields=['poll', 'order']),
+            # A poll has a handful of choices, so one index in display
+            # order serves both the foreign key and the ordered listings
+            models.Index(fields=['poll', 'order', 'created_at'], name='choice_poll_order'),
         ]
     
     @property
@@ -241,14 +310,49 @@ class Choice(models.Model):
         return round((self.votes / self.poll.total_votes) * 100, 1)
     
     def increment_votes(self):
-        """Increment vote count for this choice"""
+        """Increment vote count for this choice (in the database, so a concurrent recount is not undone)"""
+        Choice.objects.filter(pk=self.pk).update(votes=models.F('votes') + 1)
         self.votes += 1
-        self.save(update_fields=['votes'])
     
     def __str__(self):
         return f"{self.text} ({self.votes} votes)"
 
 
+class UserAgent(models.Model):
+    """
+    Distinct browser user-agent string, shared by all votes sent with it
+    """
+    DEVICE_CLASSES = [
+        ('desktop', 'Desktop'),
+        ('mobile', 'Mobile'),
+        ('tablet', 'Tablet'),
+        ('bot', 'Bot'),
+        ('other', 'Other'),
+    ]
+
+    ua_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="Hash",
+        help_text="SHA-256 of the user-agent string"
+    )
+    text = models.TextField(verbose_name="User Agent")
+    device_class = models.CharField(
+        max_length=10,
+        choices=DEVICE_CLASSES,
+        default='other',
+        verbose_name="Device Class"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "User Agent"
+        verbose_name_plural = "User Agents"
+
+    def __str__(self):
+        return self.text[:80]
+
+
 class Vote(models.Model):
     """
     Individual vote record for tracking and preventing duplicates
@@ -257,7 +361,8 @@ class Vote(models.Model):
         Poll,
         on_delete=models.CASCADE,
         related_name='votes',
-        verbose_name="Poll"
+        verbose_name="Poll",
+        db_index=False  # covered by vote_poll_covering
     )
     choice = models.ForeignKey(
         Choice,
@@ -275,8 +380,10 @@ class Vote(models.Model):
         help_text="Registered user who voted (if logged in)"
     )
     voter_ip = models.GenericIPAddressField(
+        null=True,
+        blank=True,
         verbose_name="Voter IP",
-        help_text="IP address of the voter"
+        help_text="IP address of the voter (cleared after the retention window)"
     )
     voter_session = models.CharField(
         max_length=40,
@@ -284,8 +391,12 @@ class Vote(models.Model):
         verbose_name="Session Key",
         help_text="Session key for anonymous voters"
     )
-    user_agent = models.TextField(
+    user_agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.PROTECT,
+        null=True,
         blank=True,
+        related_name='+',
         verbose_name="User Agent",
         help_text="Browser information"
     )
@@ -309,19 +420,39 @@ class Vote(models.Model):
         verbose_name_plural = "Votes"
         ordering = ['-voted_at']
         indexes = [
-            models.Index(fields=['poll', '-voted_at']),
-            models.Index(fields=['voter_ip', 'poll']),
-            models.Index(fields=['voter', 'poll']),
-        ]
-        
-        # Constraints to prevent duplicate voting
-        constraints = [
-            models.UniqueConstraint(
-                fields=['poll', 'voter'],
+            # Vote history pages and counter reconciliation read these
+            # columns straight from the index
+            models.Index(
+                fields=['poll', '-voted_at', '-id'],
+                include=['choice', 'voter', 'is_valid', 'voter_ip', 'voter_session'],
+                name='vote_poll_covering',
+            ),
+            # Duplicate checks for anonymous and registered voters
+            models.Index(
+                fields=['poll', 'voter_ip', 'voter_session'],
+                include=['voted_at'],
+                name='vote_dup_anonymous',
+            ),
+            models.Index(
+                fields=['voter', 'poll'],
                 condition=models.Q(voter__isnull=False),
-                name='unique_registered_user_vote'
+                name='vote_dup_registered',
+            ),
+            # Moderation views only ever list the few flagged votes
+            models.Index(
+                fields=['-voted_at', '-id'],
+                condition=models.Q(is_valid=False),
+                name='vote_invalid_recent',
+            ),
+            models.Index(
+                fields=['flagged_reason', '-voted_at', '-id'],
+                condition=~models.Q(flagged_reason=''),
+                name='vote_flagged_recent',
             ),
         ]
+        # The table is range-partitioned by voted_at (see polls.partitioning),
+        # so duplicate votes are prevented with polls.partitioning.lock_voter
+        # rather than a unique constraint on (poll, voter).
     
     def __str__(self):
         voter_info = self.voter.email if self.voter else f"Anonymous ({self.voter_ip})"
@@ -386,4 +517,218 @@ class PollAnalytics(models.Model):
         verbose_name_plural = "Poll Analytics"
     
     def __str__(self):
-        return f"Analytics for '{self.poll.title}'"
\ No newline at end of file
+        return f"Analytics for '{self.poll.title}'"
+
+class ExportJob(models.Model):
+    """
+    Background CSV export of a poll's votes (Premium feature)
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    poll = models.ForeignKey(
+        Poll,
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name="Poll"
+    )
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='export_jobs',
+        verbose_name="Requested By"
+    )
+    results_version = models.CharField(
+        max_length=64,
+        verbose_name="Results Version",
+        help_text="Snapshot of the poll counters the artifact was built from"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Status"
+    )
+
+    # Resume state, persisted after every chunk
+    last_vote_id = models.BigIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    bytes_written = models.PositiveBigIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(default=0)
+
+    artifact = models.FileField(
+        upload_to='exports/',
+        blank=True,
+        verbose_name="Export File"
+    )
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['poll', 'results_version']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    @property
+    def progress(self):
+        """Percentage of rows written so far"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.rows_written * 100 / self.total_rows))
+
+    def __str__(self):
+        return f"Export of '{self.poll.title}' ({self.get_status_display()})"
+
+
+class ResultsSnapshot(models.Model):
+    """
+    Frozen final results of a poll that no longer accepts votes
+    """
+    poll = models.OneToOneField(
+        Poll,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='results_snapshot',
+        verbose_name="Poll"
+    )
+    document = models.JSONField(
+        verbose_name="Results Document",
+        help_text="Counts, percentages and analytics summary at close"
+    )
+    etag = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Results Snapshot"
+        verbose_name_plural = "Results Snapshots"
+
+    def __str__(self):
+        return f"Final results of '{self.poll.title}'"
+
+
+class VoteArchive(models.Model):
+    """
+    Compressed columnar copy of a finished poll's votes in cold storage
+    """
+    poll = models.OneToOneField(
+        Poll,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='vote_archive',
+        verbose_name="Poll"
+    )
+    file = models.FileField(
+        upload_to='archives/votes/',
+        verbose_name="Archive File"
+    )
+    format_version = models.PositiveSmallIntegerField(default=1)
+    row_count = models.PositiveIntegerField(default=0)
+    max_vote_id = models.BigIntegerField(
+        default=0,
+        help_text="Votes up to this id are in the archive"
+    )
+    checksum = models.CharField(
+        max_length=64,
+        help_text="SHA-256 over the archived rows"
+    )
+    size_bytes = models.PositiveBigIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    verified_at = models.DateTimeField(null=True, blank=True)
+    purged_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the archived rows were removed from the vote table"
+    )
+    pii_pruned_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When voter IP, session and browser were cleared from the file"
+    )
+
+    class Meta:
+        verbose_name = "Vote Archive"
+        verbose_name_plural = "Vote Archives"
+
+    def __str__(self):
+        return f"Archive of '{self.poll.title}' ({self.row_count} votes)"
+
+
+class ReconciliationRun(models.Model):
+    """
+    One pass of the counter reconciliation job
+    """
+    MODE_CHOICES = [
+        ('full', 'Full'),
+        ('incremental', 'Incremental'),
+    ]
+
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='full')
+    dry_run = models.BooleanField(default=False)
+    vote_high_water = models.BigIntegerField(
+        default=0,
+        help_text="Votes up to this id were settled when the run started"
+    )
+    polls_checked = models.PositiveIntegerField(default=0)
+    polls_repaired = models.PositiveIntegerField(default=0)
+    choices_repaired = models.PositiveIntegerField(default=0)
+    users_checked = models.PositiveIntegerField(default=0)
+    users_repaired = models.PositiveIntegerField(default=0)
+    drift = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Counters found out of step (first entries only)"
+    )
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Reconciliation Run"
+        verbose_name_plural = "Reconciliation Runs"
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.get_mode_display()} reconciliation at {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class FraudCheckpoint(models.Model):
+    """
+    How far the vote-fraud detector has read the vote table
+    """
+    name = models.CharField(max_length=50, unique=True, default='default')
+    last_vote_id = models.BigIntegerField(
+        default=0,
+        help_text="Votes up to this id have been checked"
+    )
+    last_voted_at = models.DateTimeField(null=True, blank=True)
+    window_vote_id = models.BigIntegerField(
+        default=0,
+        help_text="Votes after this id are replayed to rebuild the windows on restart"
+    )
+    votes_checked = models.PositiveBigIntegerField(default=0)
+    votes_flagged = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Fraud Checkpoint"
+        verbose_name_plural = "Fraud Checkpoints"
+
+    def __str__(self):
+        return f"Fraud detector '{self.name}' at vote {self.last_vote_id}"
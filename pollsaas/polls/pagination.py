@@ -0,0 +1,154 @@
+"""
+Keyset (cursor) pagination.
+
+Unlike ``Paginator`` this never issues OFFSET or COUNT queries: each page
+is fetched by filtering on the ordering key of the last row seen, so it
+is a single index range scan no matter how deep the page is. Cursors are
+opaque URL-safe strings that encode that key and the direction.
+"""
+import base64
+import datetime
+import json
+
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded"""
+
+
+class KeysetPage:
+    """A page of results with cursors to its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on a unique ordering such as ``('-voted_at', '-id')``.
+
+    The ordering must end in a unique field and should match an index,
+    otherwise every page is a sort of the filtered rows.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def get_page(self, cursor=None):
+        if not cursor:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor(rows[-1], 'n') if has_more else None,
+            )
+
+        values, direction = self.decode_cursor(cursor)
+
+        if direction == 'n':
+            rows = list(
+                self.queryset
+                .filter(self._after(values, self.ordering))
+                .order_by(*self.ordering)[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor(rows[-1], 'n') if has_more else None,
+                previous_cursor=self._cursor(rows[0], 'p') if rows else None,
+            )
+
+        reversed_ordering = [self._reverse(name) for name in self.ordering]
+        rows = list(
+            self.queryset
+            .filter(self._after(values, reversed_ordering))
+            .order_by(*reversed_ordering)[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor(rows[-1], 'n') if rows else None,
+            previous_cursor=self._cursor(rows[0], 'p') if has_more else None,
+        )
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            values, direction = payload['k'], payload['d']
+        except (ValueError, KeyError, TypeError) as e:
+            raise InvalidCursor(str(e))
+
+        if direction not in ('n', 'p') or len(values) != len(self.fields):
+            raise InvalidCursor("Cursor does not match this ordering")
+
+        model = self.queryset.model
+        parsed = []
+        for name, value in zip(self.fields, values):
+            field = model._meta.get_field(name)
+            if isinstance(field, models.DateTimeField) and value is not None:
+                value = parse_datetime(value)
+                if value is None:
+                    raise InvalidCursor(f"Invalid datetime for {name}")
+            parsed.append(value)
+        return parsed, direction
+
+    def _cursor(self, obj, direction):
+        values = [
+            obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            for name in self.fields
+        ]
+        # isoformat() keeps microseconds, which DjangoJSONEncoder would drop
+        values = [
+            value.isoformat() if isinstance(value, datetime.datetime) else value
+            for value in values
+        ]
+        payload = json.dumps({'k': values, 'd': direction})
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def _after(self, values, ordering):
+        """
+        Rows strictly after ``values`` in ``ordering``, expanded to
+        ``a < x OR (a = x AND b < y) ...`` with a leading range bound
+        on the first column so the index scan starts at the cursor.
+        """
+        condition = Q()
+        for i, name in enumerate(ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            term = Q(**{f'{self.fields[i]}__{lookup}': values[i]})
+            for j in range(i):
+                term &= Q(**{self.fields[j]: values[j]})
+            condition |= term
+
+        first_lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{self.fields[0]}__{first_lookup}': values[0]}) & condition
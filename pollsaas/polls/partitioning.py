@@ -0,0 +1,178 @@
+"""
+Monthly range partitions of the vote table.
+
+``polls_vote`` is partitioned by ``voted_at`` (migration
+``0010_partition_votes`` converts an existing table online). Partitions
+are named ``polls_vote_pYYYYMM`` and ``manage_vote_partitions`` creates
+them ahead of time; votes for a month without one land in the DEFAULT
+partition ``polls_vote_default`` and are moved out when its partition is
+created. The same command detaches old months so they can be archived without
+touching the live table.
+
+PostgreSQL only prunes partitions when a query constrains ``voted_at``.
+Votes can never predate their poll, so per-poll queries go through
+``poll_votes``, which adds that lower bound. A unique index on the
+partitioned table must include ``voted_at``, so "one vote per registered
+user" is guarded with ``lock_voter`` instead of a global unique index.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+VOTE_TABLE = 'polls_vote'
+DEFAULT_PARTITION = f"{VOTE_TABLE}_default"
+PARTITION_MONTHS_AHEAD = 3
+DETACH_LOCK_TIMEOUT = '5s'
+
+# Slack for clock differences between the app servers that created the
+# poll and recorded the vote
+PRUNE_MARGIN = timedelta(hours=1)
+
+
+def poll_votes(poll):
+    """``poll.votes`` bounded by the poll's creation time so old partitions are skipped"""
+    return poll.votes.filter(voted_at__gte=poll.created_at - PRUNE_MARGIN)
+
+
+def lock_voter(poll_id, voter):
+    """
+    Serialize concurrent votes by one voter on one poll until the current
+    transaction ends, so a duplicate check followed by an insert is safe.
+    """
+    digest = hashlib.blake2b(f"{poll_id}:{voter}".encode(), digest_size=8).digest()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s)", [int.from_bytes(digest, 'big', signed=True)]
+        )
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(value):
+    return month_start(value + timedelta(days=32))
+
+
+def partition_name(month):
+    return f"{VOTE_TABLE}_p{month:%Y%m}"
+
+
+def is_partitioned():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [VOTE_TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions():
+    """``[(name, lower bound)]`` of attached partitions, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [VOTE_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f"{VOTE_TABLE}_p"
+    return [
+        (name, datetime.strptime(name[len(prefix):], '%Y%m').replace(tzinfo=dt_timezone.utc))
+        for name in names
+        if name.startswith(prefix)
+    ]
+
+
+def has_default_partition():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [DEFAULT_PARTITION])
+        return cursor.fetchone()[0] is not None
+
+
+def default_partition_rows():
+    """``(count, oldest voted_at)`` of votes in the DEFAULT partition for want of a monthly one"""
+    if not has_default_partition():
+        return 0, None
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*), min(voted_at) FROM "{DEFAULT_PARTITION}"')
+        return cursor.fetchone()
+
+
+def _create_partition(cursor, name, month, upper, stranded):
+    create = (
+        f'CREATE TABLE "{name}" PARTITION OF "{VOTE_TABLE}" FOR VALUES FROM (%s) TO (%s)'
+    )
+    if not stranded:
+        cursor.execute(create, [month, upper])
+        return
+    # The new range would overlap rows in the DEFAULT partition: take it
+    # off while they move across
+    with transaction.atomic():
+        cursor.execute(f'ALTER TABLE "{VOTE_TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"')
+        cursor.execute(create, [month, upper])
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM "{DEFAULT_PARTITION}" WHERE voted_at >= %s AND voted_at < %s
+                RETURNING *
+            )
+            INSERT INTO "{name}" SELECT * FROM moved
+            """,
+            [month, upper],
+        )
+        cursor.execute(f'ALTER TABLE "{VOTE_TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT')
+
+
+def create_partitions(start, months):
+    """
+    Create monthly partitions from ``start`` for ``months`` months, moving
+    in any of their votes from the DEFAULT partition; returns names created
+    """
+    created = []
+    month = month_start(start)
+    has_default = has_default_partition()
+    with connection.cursor() as cursor:
+        for _ in range(months):
+            upper = next_month(month)
+            name = partition_name(month)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                stranded = False
+                if has_default:
+                    cursor.execute(
+                        f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" '
+                        f"WHERE voted_at >= %s AND voted_at < %s)",
+                        [month, upper],
+                    )
+                    stranded = cursor.fetchone()[0]
+                _create_partition(cursor, name, month, upper, stranded)
+                created.append(name)
+            month = upper
+    return created
+
+
+def detach_partitions(before):
+    """
+    Detach partitions whose whole month is before ``before``, yielding
+    each name once it is detached; the tables stay in place for archival.
+
+    PostgreSQL refuses ``DETACH ... CONCURRENTLY`` while a DEFAULT
+    partition exists, so each detach takes an ACCESS EXCLUSIVE lock on
+    the vote table. The detach itself only changes the catalog, but while
+    it waits for running queries every new one queues behind it, so the
+    wait is capped at ``DETACH_LOCK_TIMEOUT`` (raising ``OperationalError``).
+    """
+    with connection.cursor() as cursor:
+        for name, lower in list_partitions():
+            if next_month(lower) > before:
+                continue
+            with transaction.atomic():
+                cursor.execute(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'")
+                cursor.execute(f'ALTER TABLE "{VOTE_TABLE}" DETACH PARTITION "{name}"')
+            yield name
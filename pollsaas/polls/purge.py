@@ -0,0 +1,94 @@
+"""
+Background removal of deleted polls.
+
+Deleting a poll only stamps ``deleted_at``, which hides it from
+``Poll.objects`` at once. ``purge_poll`` then removes its votes, choices
+and other rows in bounded batches of primary keys, each in its own short
+transaction, pausing between batches so the database can keep up with
+live traffic. Every batch is a plain ``DELETE ... WHERE id IN (...)``
+(the cascade collector only ever sees empty relations), and the poll row
+goes last, so a purge interrupted at any point is simply run again.
+"""
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.stats import bump_creator_stats
+
+from .activity import clear_activity
+from .exports import delete_export_files
+from .models import Choice, ExportJob, Poll, PollAnalytics, Vote, VoteArchive
+from .snapshots import discard_results
+
+PURGE_BATCH_SIZE = 5000
+PURGE_PAUSE = 0.1
+
+
+def delete_poll(poll):
+    """
+    Hide ``poll`` immediately and queue it for purging.
+    Returns False if it was already deleted.
+    """
+    with transaction.atomic():
+        deleted = Poll.objects.filter(pk=poll.pk).update(
+            deleted_at=timezone.now(), is_active=False
+        )
+        if not deleted:
+            return False
+        bump_creator_stats(
+            poll.creator_id,
+            polls=-1,
+            active=-1 if poll.status == 'active' else 0,
+            votes=-poll.total_votes,
+            voters=-poll.unique_voters,
+        )
+    clear_activity(poll.pk)
+    return True
+
+
+def delete_in_batches(queryset, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE):
+    """Delete the rows of ``queryset`` by primary-key batches; returns the count"""
+    deleted = 0
+    model = queryset.model
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            model.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def purge_poll(poll_id, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE):
+    """Remove a deleted poll and everything attached to it; returns row counts"""
+    counts = {
+        'votes': delete_in_batches(Vote.objects.filter(poll_id=poll_id), batch_size, pause),
+        'choices': delete_in_batches(Choice.objects.filter(poll_id=poll_id), batch_size, pause),
+    }
+
+    jobs = list(ExportJob.objects.filter(poll_id=poll_id))
+    for job in jobs:
+        delete_export_files(job)
+    ExportJob.objects.filter(poll_id=poll_id).delete()
+    counts['export_jobs'] = len(jobs)
+
+    for archive in VoteArchive.objects.filter(poll_id=poll_id):
+        archive.file.delete(save=False)
+    PollAnalytics.objects.filter(poll_id=poll_id).delete()
+    discard_results([poll_id])
+    Poll.all_objects.filter(pk=poll_id, deleted_at__isnull=False).delete()
+    return counts
+
+
+def pending_purges():
+    """Ids of deleted polls not purged yet, oldest deletion first"""
+    return (
+        Poll.all_objects
+        .filter(deleted_at__isnull=False)
+        .order_by('deleted_at')
+        .values_list('id', flat=True)
+    )
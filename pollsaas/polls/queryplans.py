@@ -0,0 +1,199 @@
+"""
+Checks that the hot queries use the indexes shaped for them.
+
+``seed`` gives a user realistic polls and votes (skewed vote counts,
+registered and flagged votes, mixed poll statuses) and ``check_plans``
+runs EXPLAIN ANALYZE on each query from ``hot_queries`` against them,
+reporting whether the intended index was used. The
+``check_query_plans`` command runs it at production-like scale on a
+scratch database; the test suite runs it on a smaller seed. PostgreSQL
+only.
+"""
+import json
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Choice, Poll, Vote
+from .partitioning import PRUNE_MARGIN, create_partitions, poll_votes
+from .reconcile import RECONCILE_BATCH_SIZE
+
+User = get_user_model()
+
+PLAN_CHECK_EMAIL = 'plan-check@example.com'
+
+FLAG_REASONS = ('duplicate_ip', 'rapid_voting', 'bot_user_agent')
+
+
+def index_names(plan):
+    """Every index a JSON plan node (or its children) scans"""
+    names = []
+    if 'Index Name' in plan:
+        names.append(plan['Index Name'])
+    for child in plan.get('Plans', ()):
+        names.extend(index_names(child))
+    return names
+
+
+def plan_check_user():
+    user, _ = User.objects.get_or_create(
+        email=PLAN_CHECK_EMAIL, defaults={'username': 'plan-check'}
+    )
+    return user
+
+
+def hot_queries(user):
+    """``[(label, queryset, expected index)]`` for the plan-check data of ``user``"""
+    now = timezone.now()
+    polls = Poll.objects.filter(creator=user)
+    busiest = polls.order_by('-total_votes').first()
+    vote = poll_votes(busiest).filter(voter__isnull=True).order_by('-id').first()
+    registered = poll_votes(busiest).filter(voter__isnull=False).order_by('-id').first()
+    if vote is None or registered is None:
+        raise ValueError("No plan-check votes found; seed them first")
+
+    # A full reconciliation batch would cover a third of the seeded
+    # votes; scale it to the share it takes of a production table
+    batch = list(polls.order_by('id').values_list('id', flat=True)[:RECONCILE_BATCH_SIZE // 20])
+    since = polls.order_by('id').first().created_at - PRUNE_MARGIN
+
+    return [
+        ("anonymous duplicate check",
+         poll_votes(busiest).filter(
+             voter_ip=vote.voter_ip, voter_session=vote.voter_session
+         ).values_list('voted_at')[:1],
+         'vote_dup_anonymous'),
+        ("registered duplicate check",
+         poll_votes(busiest).filter(voter_id=registered.voter_id).values_list('voted_at')[:1],
+         'vote_dup_registered'),
+        ("vote history page",
+         poll_votes(busiest).order_by('-voted_at', '-id').values(
+             'id', 'voted_at', 'choice_id', 'voter_id', 'is_valid'
+         )[:50],
+         'vote_poll_covering'),
+        ("reconcile: choice counts",
+         Vote.objects.filter(poll_id__in=batch, voted_at__gte=since, is_valid=True)
+         .order_by().values('choice_id').annotate(votes=Count('id')),
+         'vote_poll_covering'),
+        ("admin: invalid votes",
+         Vote.objects.filter(is_valid=False).order_by('-voted_at', '-id')[:100],
+         'vote_invalid_recent'),
+        ("admin: flagged reason",
+         Vote.objects.filter(flagged_reason=FLAG_REASONS[0]).order_by('-voted_at', '-id')[:100],
+         'vote_flagged_recent'),
+        ("active choices in order",
+         busiest.choices.filter(is_active=True).order_by('order'),
+         'choice_poll_order'),
+        ("expiry sweep",
+         Poll.objects.filter(status='active', expires_at__lte=now).order_by('expires_at')[:500],
+         'poll_active_expiry'),
+        ("publish sweep",
+         Poll.objects.filter(status='draft', publish_at__lte=now).order_by('publish_at')[:500],
+         'poll_draft_publish'),
+    ]
+
+
+
+def seed(user, poll_count, vote_count, voter_count):
+    """
+    Give ``user`` polls with mixed statuses, a few viral ones taking most
+    of the votes, and registered, anonymous and flagged votes spread over
+    the last 90 days
+    """
+    rng = random.Random(43)
+    now = timezone.now()
+    create_partitions(now - timedelta(days=120), 6)
+
+    voters = list(User.objects.filter(username__startswith='plan-check-voter'))
+    if len(voters) < voter_count:
+        User.objects.bulk_create([
+            User(username=f"plan-check-voter-{i}", email=f"plan-check-voter-{i}@example.com")
+            for i in range(len(voters), voter_count)
+        ])
+        voters = list(User.objects.filter(username__startswith='plan-check-voter'))
+
+    # Mostly finished polls, some live ones, a few scheduled drafts
+    offset = Poll.all_objects.filter(creator=user).count()
+    statuses = rng.choices(('closed', 'expired', 'active', 'draft'), (45, 35, 17, 3), k=poll_count)
+    polls = Poll.objects.bulk_create([
+        Poll(
+            title=f"Plan check poll {offset + i}",
+            creator=user,
+            status=status,
+            is_active=status == 'active',
+            slug=f"plancheck{offset + i:08d}",
+            expires_at=now + timedelta(days=rng.randint(-60, 30)) if status != 'draft' else None,
+            publish_at=now + timedelta(hours=rng.randint(-2, 72)) if status == 'draft' else None,
+        )
+        for i, status in enumerate(statuses)
+    ], batch_size=1000)
+    Poll.all_objects.filter(pk__in=[poll.pk for poll in polls]).update(
+        created_at=now - timedelta(days=100)
+    )
+
+    choices = Choice.objects.bulk_create([
+        Choice(poll=poll, text=f"Option {n}", order=n, is_active=n < 4)
+        for poll in polls for n in range(5)
+    ], batch_size=5000)
+    active = {}
+    for choice in choices:
+        if choice.is_active:
+            active.setdefault(choice.poll_id, []).append(choice)
+
+    # A handful of viral polls take most of the votes
+    weights = [rng.paretovariate(1.2) for _ in polls]
+    totals = {}
+    batch = []
+    for picked in rng.choices(polls, weights, k=vote_count):
+        registered = rng.random() < 0.1
+        flagged = rng.random() < 0.01
+        batch.append(Vote(
+            poll=picked,
+            choice=rng.choice(active[picked.pk]),
+            voter=rng.choice(voters) if registered else None,
+            voter_ip=f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            voter_session='' if registered else f"{rng.getrandbits(128):032x}",
+            is_valid=not flagged,
+            flagged_reason=rng.choice(FLAG_REASONS) if flagged else '',
+        ))
+        totals[picked.pk] = totals.get(picked.pk, 0) + 1
+        if len(batch) == 10_000:
+            Vote.objects.bulk_create(batch)
+            batch = []
+    Vote.objects.bulk_create(batch)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE polls_vote SET voted_at = now() - (random() * interval '90 days') "
+            "WHERE poll_id IN (SELECT id FROM polls_poll WHERE creator_id = %s)",
+            [user.pk],
+        )
+    for poll_id, total in totals.items():
+        Poll.all_objects.filter(pk=poll_id).update(total_votes=total, unique_voters=total)
+
+
+def analyze(vacuum=True):
+    """Refresh planner statistics; VACUUM (for index-only scans) needs autocommit"""
+    command = 'VACUUM ANALYZE' if vacuum else 'ANALYZE'
+    with connection.cursor() as cursor:
+        for table in ('polls_poll', 'polls_choice', 'polls_vote'):
+            cursor.execute(f'{command} {table}')
+
+
+def check_plans(user):
+    """Yield ``(label, expected index, used as planned, plan, queryset)`` per hot query"""
+    for label, queryset, expected in hot_queries(user):
+        plan = json.loads(queryset.explain(format='json', analyze=True))[0]
+        used = index_names(plan['Plan'])
+        ok = any(name == expected or name.endswith(f"_{expected}") for name in used)
+        yield label, expected, ok, plan, queryset
+
+
+def remove_plan_check_data(user):
+    Vote.objects.filter(poll__creator=user).delete()
+    Poll.all_objects.filter(creator=user).delete()
+    User.objects.filter(username__startswith='plan-check').delete()
@@ -0,0 +1,163 @@
+"""
+Token-bucket rate limiting for the public vote and results endpoints.
+
+``rate_limit(scope)`` wraps a view with the buckets configured for
+``scope`` in ``RATE_LIMITS``: one per client IP, one per session and one
+per poll, each a ``(burst, tokens per second)`` pair. A request takes a
+token from each bucket in that order; the first empty one answers 429
+with ``Retry-After`` without touching the rest, so one noisy client
+cannot drain the poll-wide bucket for everyone else.
+
+The IP bucket is keyed on the address that connected to us, or with
+``RATE_LIMIT_TRUSTED_PROXIES`` set, on the ``X-Forwarded-For`` hop the
+outermost trusted proxy saw; entries a client wrote itself are never
+used, so rotating the header does not buy fresh buckets.
+
+Buckets live in the shared cache by default, which keeps the limits
+global across workers. Each bucket is a single counter of tokens spent
+since the start of an hourly epoch, advanced with an atomic ``incr``;
+tokens earned since then are derived from the clock, so no
+read-modify-write is needed. ``RATE_LIMIT_STORE = 'local'`` keeps exact
+buckets in process memory instead, for single-node deployments.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+RATE_LIMIT_STORE = getattr(settings, 'RATE_LIMIT_STORE', 'cache')
+# Reverse proxies in front of the app that append to X-Forwarded-For
+RATE_LIMIT_TRUSTED_PROXIES = getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', 0)
+RATE_LIMITS = getattr(settings, 'RATE_LIMITS', {
+    'vote': {'ip': (20, 0.5), 'session': (5, 0.1), 'poll': (2000, 500)},
+    'results': {'ip': (120, 2), 'session': (60, 1), 'poll': (20000, 5000)},
+})
+# Cache buckets restart full at each epoch boundary
+RATE_LIMIT_EPOCH = 3600
+LOCAL_MAX_BUCKETS = 100_000
+
+
+class CacheBuckets:
+    """Buckets shared through the cache, spent with atomic increments"""
+
+    def take(self, key, burst, rate, now):
+        """Spend a token; returns 0 or the seconds until one is available"""
+        epoch, offset = divmod(now, RATE_LIMIT_EPOCH)
+        counter = f"ratelimit:{key}:{int(epoch)}"
+        try:
+            spent = cache.incr(counter)
+        except ValueError:
+            cache.add(counter, 0, RATE_LIMIT_EPOCH + 60)
+            spent = cache.incr(counter)
+
+        left = burst + offset * rate - spent
+        if left < 0:
+            # Refused requests do not spend tokens
+            cache.decr(counter)
+            return -left / rate
+        if left >= burst:
+            # Idle time only refills up to the burst
+            cache.incr(counter, int(left - burst + 1))
+        return 0
+
+
+class LocalBuckets:
+    """Exact buckets in process memory, least recently used evicted first"""
+
+    def __init__(self, max_buckets=LOCAL_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, rate, now):
+        """Spend a token; returns 0 or the seconds until one is available"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = burst
+                if len(self._buckets) >= self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_local = LocalBuckets()
+
+
+def get_store(name=None):
+    return _local if (name or RATE_LIMIT_STORE) == 'local' else CacheBuckets()
+
+
+def client_address(request, trusted_proxies=None):
+    """The client address as seen by the outermost proxy we trust"""
+    if trusted_proxies is None:
+        trusted_proxies = RATE_LIMIT_TRUSTED_PROXIES
+    if trusted_proxies:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if len(hops) >= trusted_proxies:
+            return hops[-trusted_proxies]
+    return request.META.get('REMOTE_ADDR')
+
+
+def check_rate_limit(scope, request, poll_key=None, store=None):
+    """Take a token from each of the scope's buckets; returns 0 or seconds to wait"""
+    limits = RATE_LIMITS.get(scope)
+    if not limits:
+        return 0
+    store = store or get_store()
+    now = time.time()
+    session_key = request.session.session_key if hasattr(request, 'session') else None
+    identities = (
+        ('ip', client_address(request)),
+        ('session', session_key),
+        ('poll', poll_key),
+    )
+    for kind, identity in identities:
+        limit = limits.get(kind)
+        if limit and identity:
+            wait = store.take(f"{scope}:{kind}:{identity}", limit[0], limit[1], now)
+            if wait:
+                return wait
+    return 0
+
+
+def too_many_requests(wait, json=True):
+    message = 'Too many requests. Please slow down and try again shortly.'
+    if json:
+        response = JsonResponse({'success': False, 'error': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def rate_limit(scope, json=True):
+    """
+    Decorator applying the ``scope`` buckets to a view; the poll bucket is
+    keyed by the view's ``slug`` argument.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            wait = check_rate_limit(scope, request, kwargs.get('slug'))
+            if wait:
+                return too_many_requests(wait, json)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,297 @@
+"""
+Reconciliation of denormalized counters against the vote table.
+
+``Choice.votes``, ``Poll.total_votes``, ``Poll.unique_voters`` and
+``CustomUser.polls_created`` are maintained incrementally and can drift
+(lost updates between concurrent votes, failed deletes, manual edits).
+``reconcile_counters`` walks polls in id order, ``batch_size`` at a time,
+and recounts each batch with one grouped aggregate per counter; the
+``vote_poll_covering`` index carries every column the counts need, so
+they are answered from index-only scans. The stored value is read in the
+same statement as the count and a repair only applies while the counter
+still holds that value, so votes landing mid-run are never overwritten;
+anything they leave behind is caught by the next run.
+
+Counts follow ``polls.tally``. Polls whose votes are archived and purged
+keep their counters. An incremental run only rechecks polls that got
+votes after the previous run's high-water mark, and creators whose polls
+were created or deleted since then.
+"""
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.stats import rebuild_creator_stats
+
+from .models import Poll, ReconciliationRun
+from .partitioning import PRUNE_MARGIN, VOTE_TABLE
+from .snapshots import freeze_results
+from .tally import _BALLOT, _VOTER
+
+User = get_user_model()
+
+RECONCILE_BATCH_SIZE = 500
+RECONCILE_PAUSE = 0.0
+# Votes newer than this may belong to transactions still in flight
+VOTE_SETTLE_TIME = timedelta(minutes=1)
+DRIFT_REPORT_LIMIT = 200
+
+
+def _values(rows, types):
+    placeholders = '(' + ', '.join(f'%s::{name}' for name in types) + ')'
+    return ', '.join([placeholders] * len(rows)), [value for row in rows for value in row]
+
+
+def vote_high_water(now=None):
+    """Newest vote id whose transaction has certainly committed"""
+    settled = (now or timezone.now()) - VOTE_SETTLE_TIME
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT coalesce(max(id), 0) FROM "{VOTE_TABLE}" WHERE voted_at <= %s',
+            [settled],
+        )
+        return cursor.fetchone()[0]
+
+
+def choice_drift(cursor, poll_ids, since):
+    """``[(choice id, poll id, stored, actual)]`` for choices of ``poll_ids`` that drifted"""
+    cursor.execute(
+        f"""
+        SELECT choice.id, choice.poll_id, choice.votes, coalesce(counts.votes, 0)
+        FROM polls_choice AS choice
+        LEFT JOIN (
+            SELECT choice_id, count(*) AS votes
+            FROM "{VOTE_TABLE}"
+            WHERE poll_id = ANY(%s) AND voted_at >= %s AND is_valid
+            GROUP BY choice_id
+        ) AS counts ON counts.choice_id = choice.id
+        WHERE choice.poll_id = ANY(%s) AND choice.votes <> coalesce(counts.votes, 0)
+        ORDER BY choice.id
+        """,
+        [poll_ids, since, poll_ids],
+    )
+    return cursor.fetchall()
+
+
+def poll_drift(cursor, poll_ids, multiple_ids, since):
+    """
+    ``[(poll id, creator id, stored ballots, stored voters, ballots, voters)]``
+    for polls in ``poll_ids`` whose totals drifted
+    """
+    cursor.execute(
+        f"""
+        SELECT poll.id, poll.creator_id, poll.total_votes, poll.unique_voters,
+               coalesce(counts.ballots, 0), coalesce(counts.voters, 0)
+        FROM polls_poll AS poll
+        LEFT JOIN (
+            SELECT poll_id,
+                   count(DISTINCT CASE WHEN poll_id = ANY(%s) THEN {_BALLOT} ELSE id::text END) AS ballots,
+                   count(DISTINCT {_VOTER}) AS voters
+            FROM "{VOTE_TABLE}"
+            WHERE poll_id = ANY(%s) AND voted_at >= %s AND is_valid
+            GROUP BY poll_id
+        ) AS counts ON counts.poll_id = poll.id
+        WHERE poll.id = ANY(%s)
+          AND (poll.total_votes <> coalesce(counts.ballots, 0)
+               OR poll.unique_voters <> coalesce(counts.voters, 0))
+        ORDER BY poll.id
+        """,
+        [multiple_ids, poll_ids, since, poll_ids],
+    )
+    return cursor.fetchall()
+
+
+def quota_drift(cursor, user_ids):
+    """``[(user id, stored, actual)]`` where ``polls_created`` differs from the live polls held"""
+    cursor.execute(
+        f"""
+        SELECT account.id, account.polls_created, count(poll.id)
+        FROM "{User._meta.db_table}" AS account
+        LEFT JOIN polls_poll AS poll
+          ON poll.creator_id = account.id AND poll.deleted_at IS NULL
+        WHERE account.id = ANY(%s)
+        GROUP BY account.id
+        HAVING account.polls_created <> count(poll.id)
+        ORDER BY account.id
+        """,
+        [user_ids],
+    )
+    return cursor.fetchall()
+
+
+def _repair_choices(cursor, drift):
+    values, params = _values(
+        [(choice_id, stored, actual) for choice_id, _, stored, actual in drift],
+        ('bigint', 'integer', 'integer'),
+    )
+    cursor.execute(
+        f"""
+        UPDATE polls_choice AS choice SET votes = fix.actual
+        FROM (VALUES {values}) AS fix (id, stored, actual)
+        WHERE choice.id = fix.id AND choice.votes = fix.stored
+        """,
+        params,
+    )
+    return cursor.rowcount
+
+
+def _repair_polls(cursor, drift):
+    """Returns the rows actually repaired, as reported by ``poll_drift``"""
+    values, params = _values(
+        [(poll_id, *counts) for poll_id, _, *counts in drift],
+        ('bigint', 'integer', 'integer', 'integer', 'integer'),
+    )
+    cursor.execute(
+        f"""
+        UPDATE polls_poll AS poll SET total_votes = fix.ballots, unique_voters = fix.voters
+        FROM (VALUES {values}) AS fix (id, stored_ballots, stored_voters, ballots, voters)
+        WHERE poll.id = fix.id
+          AND poll.total_votes = fix.stored_ballots AND poll.unique_voters = fix.stored_voters
+        RETURNING poll.id
+        """,
+        params,
+    )
+    repaired = {poll_id for (poll_id,) in cursor.fetchall()}
+    return [row for row in drift if row[0] in repaired]
+
+
+def _repair_quotas(cursor, drift):
+    values, params = _values(drift, ('bigint', 'integer', 'integer'))
+    cursor.execute(
+        f"""
+        UPDATE "{User._meta.db_table}" AS account SET polls_created = fix.actual
+        FROM (VALUES {values}) AS fix (id, stored, actual)
+        WHERE account.id = fix.id AND account.polls_created = fix.stored
+        """,
+        params,
+    )
+    return cursor.rowcount
+
+
+def _record(run, report, kind, object_id, field, stored, actual):
+    entry = {'kind': kind, 'id': object_id, 'field': field, 'stored': stored, 'actual': actual}
+    if len(run.drift) < DRIFT_REPORT_LIMIT:
+        run.drift.append(entry)
+    if report:
+        report(entry)
+
+
+def _reconcile_polls(run, polls, dry_run, report):
+    poll_ids = [poll_id for poll_id, _, _ in polls]
+    multiple_ids = [poll_id for poll_id, poll_type, _ in polls if poll_type == 'multiple']
+    since = min(created_at for _, _, created_at in polls) - PRUNE_MARGIN
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        choices = choice_drift(cursor, poll_ids, since)
+        totals = poll_drift(cursor, poll_ids, multiple_ids, since)
+        for choice_id, _, stored, actual in choices:
+            _record(run, report, 'choice', choice_id, 'votes', stored, actual)
+        for poll_id, _, stored_ballots, stored_voters, ballots, voters in totals:
+            if stored_ballots != ballots:
+                _record(run, report, 'poll', poll_id, 'total_votes', stored_ballots, ballots)
+            if stored_voters != voters:
+                _record(run, report, 'poll', poll_id, 'unique_voters', stored_voters, voters)
+        if dry_run:
+            run.choices_repaired += len(choices)
+            run.polls_repaired += len(totals)
+            return
+
+        # Poll rows before choice rows, the order the vote paths lock them in
+        if totals:
+            repaired = _repair_polls(cursor, totals)
+            run.polls_repaired += len(repaired)
+            # Creator stats are bumped atomically by the vote paths and may
+            # well be right where a poll lost an increment, so they are
+            # recomputed from the repaired polls rather than shifted
+            if repaired:
+                rebuild_creator_stats({row[1] for row in repaired})
+        if choices:
+            run.choices_repaired += _repair_choices(cursor, choices)
+
+        changed = sorted({row[1] for row in choices} | {row[0] for row in totals})
+        if changed:
+            transaction.on_commit(lambda: freeze_results(changed))
+
+
+def _reconcile_quotas(run, user_ids, dry_run, report):
+    with transaction.atomic(), connection.cursor() as cursor:
+        drift = quota_drift(cursor, user_ids)
+        for user_id, stored, actual in drift:
+            _record(run, report, 'user', user_id, 'polls_created', stored, actual)
+        if drift:
+            run.users_repaired += len(drift) if dry_run else _repair_quotas(cursor, drift)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def last_run():
+    """The most recent completed run that repaired counters, if any"""
+    return (
+        ReconciliationRun.objects
+        .filter(finished_at__isnull=False, dry_run=False)
+        .order_by('-started_at')
+        .first()
+    )
+
+
+def reconcile_counters(incremental=False, batch_size=RECONCILE_BATCH_SIZE,
+                       pause=RECONCILE_PAUSE, dry_run=False, report=None):
+    """
+    Check (and unless ``dry_run``, repair) the vote and quota counters.
+    ``report`` is called with each drift entry found. Returns the
+    ``ReconciliationRun``.
+    """
+    previous = last_run() if incremental else None
+    run = ReconciliationRun.objects.create(
+        mode='incremental' if previous else 'full',
+        dry_run=dry_run,
+        vote_high_water=vote_high_water(),
+    )
+
+    # Once an archive is verified its rows are being deleted: the counters
+    # it was checked against are the ones to keep
+    polls = Poll.objects.exclude(vote_archive__verified_at__isnull=False).order_by('id')
+    users = User.objects.order_by('id')
+    if previous:
+        since = previous.started_at - PRUNE_MARGIN
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT DISTINCT poll_id FROM "{VOTE_TABLE}" WHERE id > %s AND voted_at >= %s',
+                [previous.vote_high_water, since],
+            )
+            touched = [poll_id for (poll_id,) in cursor.fetchall()]
+        polls = polls.filter(id__in=touched)
+        users = users.filter(id__in=Poll.all_objects.filter(
+            Q(created_at__gte=since) | Q(deleted_at__gte=since)
+        ).values('creator_id'))
+
+    last_id = 0
+    while True:
+        batch = list(polls.filter(id__gt=last_id).values_list('id', 'poll_type', 'created_at')[:batch_size])
+        if not batch:
+            break
+        _reconcile_polls(run, batch, dry_run, report)
+        run.polls_checked += len(batch)
+        last_id = batch[-1][0]
+        if pause:
+            time.sleep(pause)
+
+    last_id = 0
+    while True:
+        user_ids = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not user_ids:
+            break
+        _reconcile_quotas(run, user_ids, dry_run, report)
+        run.users_checked += len(user_ids)
+        last_id = user_ids[-1]
+
+    run.finished_at = timezone.now()
+    run.save()
+    return run
@@ -0,0 +1,179 @@
+"""
+Retention of voter personal data.
+
+Voter IP, session key and user agent only matter for duplicate and fraud
+checks while a poll is open. ``VOTE_PII_RETENTION_DAYS`` after a poll
+closes (or the poll's own ``pii_retention_days``) ``prune_poll_pii``
+clears them, walking the poll's votes with a keyset on
+``(voted_at, id)`` and updating small batches, each in its own short
+transaction, so no long row locks are held on the live vote table.
+
+With ``VOTE_PII_PRUNE_MODE = 'hash'`` (the default) the session column
+keeps a keyed hash of IP and session, so votes from the same anonymous
+voter can still be told apart afterwards; ``'null'`` clears it too.
+
+Polls are only archived once pruned, but archives written before that
+rule still carry voter data: ``prune_archive_pii`` rewrites them the
+same way, for ``archives_due_for_pruning``.
+"""
+import hashlib
+import hmac
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .archive import ARCHIVE_COLUMNS, rewrite_archive
+from .models import Poll, VoteArchive
+from .partitioning import VOTE_TABLE, poll_votes
+
+VOTE_PII_RETENTION_DAYS = getattr(settings, 'VOTE_PII_RETENTION_DAYS', 30)
+VOTE_PII_PRUNE_MODE = getattr(settings, 'VOTE_PII_PRUNE_MODE', 'hash')
+PRUNE_BATCH_SIZE = 1000
+PRUNE_PAUSE = 0.05
+
+
+def _key():
+    secret = getattr(settings, 'VOTE_PII_SECRET_KEY', settings.SECRET_KEY)
+    return hashlib.sha256(f"voter-pii:{secret}".encode()).digest()
+
+
+def voter_fingerprint(key, poll_id, voter_ip, voter_session):
+    """Keyed hash standing in for an anonymous voter once their data is pruned"""
+    message = f"{poll_id}:{voter_ip or ''}:{voter_session}".encode()
+    return hmac.new(key, message, hashlib.sha256).hexdigest()[:32]
+
+
+def _retention_passed(now=None):
+    """Closed polls whose retention window has passed"""
+    now = now or timezone.now()
+    expires = ExpressionWrapper(
+        F('closed_at') + Value(timedelta(days=1)) * Coalesce(
+            'pii_retention_days', Value(VOTE_PII_RETENTION_DAYS)
+        ),
+        output_field=DateTimeField(),
+    )
+    return (
+        Poll.objects
+        .filter(closed_at__isnull=False)
+        .alias(pii_expires_at=expires)
+        .filter(pii_expires_at__lte=now)
+    )
+
+
+def polls_due_for_pruning(now=None):
+    """Closed polls whose retention window has passed, oldest closure first"""
+    return _retention_passed(now).filter(pii_pruned_at__isnull=True).order_by('closed_at')
+
+
+def archives_due_for_pruning(now=None):
+    """Archives still holding voter data whose poll's retention window has passed"""
+    return (
+        VoteArchive.objects
+        .filter(pii_pruned_at__isnull=True, verified_at__isnull=False)
+        .filter(poll__in=_retention_passed(now))
+        .select_related('poll')
+        .order_by('created_at')
+    )
+
+
+def _clear(changed, first, last):
+    """One UPDATE for a batch, matched on the full (id, voted_at) key so partitions are pruned"""
+    values = ', '.join(['(%s::bigint, %s::timestamptz, %s)'] * len(changed))
+    params = [value for row in changed for value in row]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE "{VOTE_TABLE}" AS vote
+            SET voter_ip = NULL, user_agent_id = NULL, voter_session = batch.session
+            FROM (VALUES {values}) AS batch (id, voted_at, session)
+            WHERE vote.id = batch.id AND vote.voted_at = batch.voted_at
+              AND vote.voted_at BETWEEN %s AND %s
+            """,
+            params + [first, last],
+        )
+
+
+def prune_poll_pii(poll, batch_size=PRUNE_BATCH_SIZE, pause=PRUNE_PAUSE, mode=VOTE_PII_PRUNE_MODE):
+    """Clear voter IP, session and user agent on every vote of ``poll``; returns rows changed"""
+    key = _key()
+    pruned = 0
+    last = None
+    votes = poll_votes(poll).order_by('voted_at', 'id')
+    while True:
+        page = votes
+        if last is not None:
+            voted_at, vote_id = last
+            page = page.filter(Q(voted_at__gt=voted_at) | Q(voted_at=voted_at, id__gt=vote_id))
+        rows = list(page.values_list('voted_at', 'id', 'voter_ip', 'voter_session', 'user_agent_id')[:batch_size])
+        if not rows:
+            break
+        last = rows[-1][:2]
+
+        changed = [
+            (vote_id, voted_at,
+             voter_fingerprint(key, poll.id, voter_ip, session) if mode == 'hash' else '')
+            for voted_at, vote_id, voter_ip, session, user_agent_id in rows
+            if voter_ip is not None or user_agent_id is not None
+        ]
+        if changed:
+            with transaction.atomic():
+                _clear(changed, rows[0][0], rows[-1][0])
+            pruned += len(changed)
+            time.sleep(pause)
+
+    Poll.objects.filter(pk=poll.pk).update(pii_pruned_at=timezone.now())
+    archive = VoteArchive.objects.filter(
+        poll=poll, pii_pruned_at__isnull=True, verified_at__isnull=False
+    ).first()
+    if archive is not None:
+        pruned += prune_archive_pii(archive, mode=mode)
+    return pruned
+
+
+_IP, _SESSION, _AGENT = (
+    ARCHIVE_COLUMNS.index(name) for name in ('voter_ip', 'voter_session', 'user_agent')
+)
+
+
+def prune_archive_pii(archive, mode=VOTE_PII_PRUNE_MODE):
+    """Rewrite ``archive`` without voter IP, session and user agent; returns rows changed"""
+    key = _key()
+    changed = 0
+
+    def scrub(row):
+        nonlocal changed
+        if row[_IP] is None and not row[_AGENT]:
+            return row
+        changed += 1
+        row = list(row)
+        row[_SESSION] = (
+            voter_fingerprint(key, archive.poll_id, row[_IP], row[_SESSION]) if mode == 'hash' else ''
+        )
+        row[_IP] = None
+        row[_AGENT] = ''
+        return row
+
+    rewrite_archive(archive, scrub, pii_pruned_at=timezone.now())
+    return changed
+
+
+def vote_storage_sizes():
+    """``(table bytes, index bytes)`` of the vote table, across all partitions"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT coalesce(sum(pg_table_size(rel)), 0), coalesce(sum(pg_indexes_size(rel)), 0)
+            FROM (
+                SELECT %s::regclass AS rel
+                UNION ALL
+                SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass
+            ) relations
+            """,
+            [VOTE_TABLE, VOTE_TABLE],
+        )
+        return cursor.fetchone()
@@ -0,0 +1,120 @@
+"""
+In-process scheduler for poll publish and expiry times.
+
+Upcoming events are loaded from the database a window at a time (the
+next ``horizon`` seconds, via the status/time indexes) into a min-heap
+keyed by due time. The run loop sleeps until exactly the next event,
+then flips every poll due at that moment with one batched UPDATE per
+kind, so many polls scheduled for the same instant go live together.
+Publish events get a companion pre-warm event ``prewarm`` seconds
+earlier that fills the poll's caches ahead of its first visitors.
+
+The database stays the source of truth: flips re-check status and due
+time, so polls that were rescheduled, published by hand or deleted
+after being loaded simply become no-ops.
+"""
+import heapq
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import lifecycle
+from .models import Poll
+
+PREWARM = 'prewarm'
+PUBLISH = 'publish'
+EXPIRE = 'expire'
+
+
+class PollScheduler:
+    def __init__(self, horizon=60.0, refresh=1.0, prewarm=2.0,
+                 batch_size=lifecycle.EXPIRY_BATCH_SIZE, log=None):
+        self.horizon = horizon
+        self.refresh = refresh
+        self.prewarm = prewarm
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self._heap = []
+        self._queued = set()
+        self._next_refresh = 0.0
+        self.lag = 0.0
+
+    def _push(self, when, kind, poll_id):
+        event = (when, kind, poll_id)
+        if event not in self._queued:
+            self._queued.add(event)
+            heapq.heappush(self._heap, event)
+
+    def load(self):
+        """Queue events due within the horizon that aren't queued yet"""
+        now = timezone.now()
+        until = now + timedelta(seconds=self.horizon)
+        publishing = (
+            lifecycle.publishable(Poll.objects.filter(status='draft', publish_at__lte=until))
+            .values_list('id', 'publish_at')
+        )
+        for poll_id, publish_at in publishing:
+            when = publish_at.timestamp()
+            if when - self.prewarm > now.timestamp():
+                self._push(when - self.prewarm, PREWARM, poll_id)
+            self._push(when, PUBLISH, poll_id)
+
+        expiring = (
+            Poll.objects
+            .filter(status='active', expires_at__lte=until)
+            .values_list('id', 'expires_at')
+        )
+        for poll_id, expires_at in expiring:
+            self._push(expires_at.timestamp(), EXPIRE, poll_id)
+
+        self._next_refresh = time.time() + self.refresh
+
+    def _pop_due(self, now):
+        due = defaultdict(list)
+        earliest = now
+        while self._heap and self._heap[0][0] <= now:
+            event = heapq.heappop(self._heap)
+            self._queued.discard(event)
+            due[event[1]].append(event[2])
+            earliest = min(earliest, event[0])
+        # How late the oldest event in this tick is running
+        self.lag = now - earliest
+        return due
+
+    def tick(self):
+        """Run every event that is due; returns ``{kind: count}``"""
+        due = self._pop_due(time.time())
+        done = {}
+        if due[PREWARM]:
+            lifecycle.prewarm_polls(due[PREWARM])
+            done[PREWARM] = len(due[PREWARM])
+        for kind, flip in ((PUBLISH, lifecycle.publish_polls), (EXPIRE, lifecycle.expire_polls)):
+            poll_ids = due[kind]
+            for start in range(0, len(poll_ids), self.batch_size):
+                batch = poll_ids[start:start + self.batch_size]
+                done[kind] = done.get(kind, 0) + len(flip(batch, batch_size=len(batch)))
+        return done
+
+    def seconds_until_next(self):
+        now = time.time()
+        wake = self._next_refresh
+        if self._heap:
+            wake = min(wake, self._heap[0][0])
+        return max(wake - now, 0)
+
+    def run_forever(self):
+        while True:
+            if time.time() >= self._next_refresh:
+                close_old_connections()
+                self.load()
+            started = time.time()
+            done = self.tick()
+            for kind, count in done.items():
+                self.log(
+                    f"{kind}: {count} polls in {(time.time() - started) * 1000:.1f} ms"
+                    f" (lag {self.lag * 1000:.1f} ms)"
+                )
+            time.sleep(self.seconds_until_next())
@@ -0,0 +1,36 @@
+"""
+Ranked poll search backed by PostgreSQL full-text and trigram indexes.
+
+``Poll.search_vector`` is a generated tsvector column (title weighted
+above description) with a GIN index, so whole-word matches are an index
+lookup. Typos and partial words fall back to trigram word similarity on
+the title, which has its own ``gin_trgm_ops`` index. Both predicates are
+index-backed, so PostgreSQL can combine them with a BitmapOr instead of
+scanning the table the way ``icontains`` does.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q
+
+SEARCH_CONFIG = 'english'
+
+
+def search_polls(queryset, query):
+    """
+    Filter ``queryset`` to polls matching ``query``, ordered by relevance.
+
+    Adds ``search_rank`` and ``search_similarity`` annotations.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return (
+        queryset
+        .filter(Q(search_vector=search_query) | Q(title__trigram_word_similar=query))
+        .annotate(
+            search_rank=SearchRank(F('search_vector'), search_query),
+            search_similarity=TrigramWordSimilarity(query, 'title'),
+        )
+        .order_by('-search_rank', '-search_similarity', '-created_at')
+    )
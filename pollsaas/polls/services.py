@@ -0,0 +1,137 @@
+"""
+Poll creation and vote recording.
+
+All entry points that create polls (the full form, quick polls and the
+class-based create view) go through ``create_poll_with_choices`` so a
+poll and its choices are written in one transaction with one INSERT per
+table, and the creator's quota is claimed atomically alongside.
+
+``cast_vote`` records one ballot for the vote API and for votes buffered
+while the site is degraded (see ``polls.degradation``).
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from accounts.stats import bump_creator_stats
+
+from .activity import record_activity
+from .models import Choice, Vote
+from .partitioning import lock_voter, poll_votes
+from .useragents import intern_user_agent
+
+
+class VoteRejected(Exception):
+    """A ballot that cannot be recorded; ``duplicate`` if the voter already voted"""
+
+    def __init__(self, message, duplicate=False):
+        super().__init__(message)
+        self.duplicate = duplicate
+
+
+def poll_limit_error(user):
+    """Validation error for a user who has used up their poll quota"""
+    return ValidationError(
+        f"You have reached your poll limit ({user.poll_limit} polls). "
+        f"{'Delete some polls to create new ones.' if user.is_premium else 'Upgrade to premium for unlimited polls.'}"
+    )
+
+
+@transaction.atomic
+def create_poll_with_choices(poll, choice_texts):
+    """
+    Save an unsaved ``poll`` and its choices.
+
+    Raises ``ValidationError`` (rolling everything back) if the creator
+    has no quota left.
+    """
+    creator = poll.creator
+    if not creator.reserve_poll_slots():
+        raise poll_limit_error(creator)
+
+    poll.save()
+    Choice.objects.bulk_create([
+        Choice(poll=poll, text=text, order=order)
+        for order, text in enumerate(choice_texts)
+    ])
+
+    bump_creator_stats(
+        creator.pk,
+        polls=1,
+        active=1 if poll.status == 'active' else 0,
+    )
+    return poll
+
+
+def parse_choice_ids(values):
+    """Submitted choice ids as integers; raises ``VoteRejected`` if any is not one"""
+    if not isinstance(values, (list, tuple)):
+        raise VoteRejected('Invalid choice selected.')
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise VoteRejected('Invalid choice selected.') from None
+
+
+def voter_key(voter, client_ip, session_key):
+    """Identify a voter for duplicate-vote checks"""
+    if voter is not None:
+        return f"user:{voter.pk}"
+    return f"anon:{client_ip}:{session_key}"
+
+
+@transaction.atomic
+def cast_vote(poll, choice_ids, voter, client_ip, session_key, user_agent):
+    """
+    Record one ballot for ``choice_ids`` by ``voter`` (None when
+    anonymous) and update the counters. Returns the chosen choices;
+    raises ``VoteRejected`` for invalid choices or a repeat vote.
+    """
+    valid_choices = list(Choice.objects.filter(id__in=choice_ids, poll=poll, is_active=True))
+    if len(valid_choices) != len(choice_ids):
+        raise VoteRejected('Invalid choice selected.')
+
+    # Check for duplicate voting
+    if not poll.allow_multiple_votes:
+        lock_voter(poll.id, voter_key(voter, client_ip, session_key))
+        if voter is not None:
+            existing_votes = poll_votes(poll).filter(voter=voter)
+        else:
+            existing_votes = poll_votes(poll).filter(
+                voter_ip=client_ip,
+                voter_session=session_key
+            )
+        if existing_votes.exists():
+            raise VoteRejected('You have already voted on this poll.', duplicate=True)
+
+    # Create votes
+    votes_created = []
+    user_agent_id = intern_user_agent(user_agent)
+    for choice in valid_choices:
+        vote = Vote.objects.create(
+            poll=poll,
+            choice=choice,
+            voter=voter,
+            voter_ip=client_ip,
+            voter_session=session_key,
+            user_agent_id=user_agent_id,
+            is_valid=True
+        )
+        votes_created.append(vote)
+
+    # Poll row before choice rows, the order retally_polls locks them in
+    poll.increment_vote_count()
+    for choice in valid_choices:
+        choice.increment_votes()
+    transaction.on_commit(lambda: record_activity(poll, votes_created))
+
+    # Update unique voter count if needed
+    if voter is not None:
+        earlier = poll_votes(poll).filter(voter=voter)
+    else:
+        earlier = poll_votes(poll).filter(voter_ip=client_ip, voter_session=session_key)
+    new_voter = not earlier.exclude(id__in=[v.id for v in votes_created]).exists()
+    if new_voter:
+        poll.increment_voter_count()
+
+    bump_creator_stats(poll.creator_id, votes=1, voters=int(new_voter))
+    return valid_choices
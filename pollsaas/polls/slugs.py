@@ -0,0 +1,104 @@
+"""
+Collision-free poll slug allocation.
+
+Slugs are 8 characters of ``[a-z0-9]``, i.e. numbers below 36**8. Each
+number comes from a PostgreSQL sequence and is passed through a keyed
+Feistel permutation of that range before being encoded, so consecutive
+sequence values map to unrelated-looking slugs while distinct values
+can never collide. No existence checks are needed.
+
+To keep allocation off the database for most polls, each ``nextval``
+reserves a block of ``SLUG_BLOCK_SIZE`` numbers that the process hands
+out from memory. Unused numbers in a block are simply skipped when the
+process exits.
+"""
+import hashlib
+import hmac
+import string
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+SLUG_ALPHABET = string.ascii_lowercase + string.digits
+SLUG_LENGTH = 8
+SLUG_BLOCK_SIZE = 64
+SLUG_SEQUENCE = 'polls_poll_slug_seq'
+
+# The slug space is split into two halves of 36**4 values each; a
+# Feistel network with modular addition over the halves permutes
+# [0, 36**8) exactly, with no cycle walking.
+_HALF = len(SLUG_ALPHABET) ** (SLUG_LENGTH // 2)
+_ROUNDS = 8
+
+_lock = threading.Lock()
+_block = iter(())
+
+
+def _key():
+    secret = getattr(settings, 'SLUG_SECRET_KEY', settings.SECRET_KEY)
+    return hashlib.sha256(f"poll-slugs:{secret}".encode()).digest()
+
+
+def _round(key, round_number, value):
+    digest = hmac.new(key, f"{round_number}:{value}".encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big') % _HALF
+
+
+def permute(number, key=None):
+    """Map ``number`` in [0, 36**8) to another number in that range"""
+    key = key or _key()
+    left, right = divmod(number, _HALF)
+    for round_number in range(_ROUNDS):
+        left, right = right, (left + _round(key, round_number, right)) % _HALF
+    return left * _HALF + right
+
+
+def unpermute(number, key=None):
+    """Inverse of ``permute``"""
+    key = key or _key()
+    left, right = divmod(number, _HALF)
+    for round_number in reversed(range(_ROUNDS)):
+        left, right = (right - _round(key, round_number, left)) % _HALF, left
+    return left * _HALF + right
+
+
+def encode(number):
+    chars = []
+    for _ in range(SLUG_LENGTH):
+        number, index = divmod(number, len(SLUG_ALPHABET))
+        chars.append(SLUG_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def _reserve_blocks(count):
+    """Reserve ``count`` blocks of numbers with one sequence query"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT nextval('{SLUG_SEQUENCE}') FROM generate_series(1, %s)", [count]
+        )
+        values = [row[0] for row in cursor.fetchall()]
+    return [
+        number
+        for value in values
+        for number in range(value * SLUG_BLOCK_SIZE, (value + 1) * SLUG_BLOCK_SIZE)
+    ]
+
+
+def allocate_slugs(count):
+    """Return ``count`` new, unique slugs"""
+    global _block
+    key = _key()
+    numbers = []
+    with _lock:
+        for number in _block:
+            numbers.append(number)
+            if len(numbers) == count:
+                break
+        missing = count - len(numbers)
+        if missing:
+            blocks = -(-missing // SLUG_BLOCK_SIZE)
+            fresh = _reserve_blocks(blocks)
+            numbers.extend(fresh[:missing])
+            _block = iter(fresh[missing:])
+    return [encode(permute(number, key)) for number in numbers]
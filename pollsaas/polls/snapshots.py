@@ -0,0 +1,157 @@
+"""
+Immutable final results for polls that stopped accepting votes.
+
+Closing a poll (admin close, expiry, deactivation) freezes its counts,
+percentages and analytics summary into a ``ResultsSnapshot``. Read paths
+call ``get_results_snapshot`` and, when it returns a document, serve it
+as-is with a long ``Cache-Control`` and an ETag instead of touching live
+counters. Snapshots are cached indefinitely: the document for a closure
+never changes, and reopening a poll drops both the row and the cache
+entry. Polls that were closed by a path that skips the lifecycle hooks
+are frozen lazily on first read.
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import Poll, PollAnalytics, ResultsSnapshot
+
+SNAPSHOT_MAX_AGE = 60 * 60 * 24
+
+
+def _cache_key(poll_id):
+    return f"poll:{poll_id}:results-snapshot"
+
+
+def is_final(poll):
+    """Whether the poll's results can no longer change"""
+    return poll.status != 'draft' and not poll.can_vote
+
+
+def build_results(poll, analytics=None):
+    """Results document for ``poll`` (choices should be prefetched)"""
+    total = poll.total_votes
+    choices = sorted(
+        (choice for choice in poll.choices.all() if choice.is_active),
+        key=lambda choice: (choice.order, choice.created_at),
+    )
+    document = {
+        'poll_id': poll.id,
+        'title': poll.title,
+        'status': poll.status,
+        'total_votes': total,
+        'unique_voters': poll.unique_voters,
+        'choices': [
+            {
+                'id': choice.id,
+                'text': choice.text,
+                'votes': choice.votes,
+                'percentage': round(choice.votes / total * 100, 1) if total else 0,
+            }
+            for choice in choices
+        ],
+        'created_at': poll.created_at,
+        'expires_at': poll.expires_at,
+        'closed_at': timezone.now(),
+        'analytics': None,
+    }
+    if analytics is not None:
+        document['analytics'] = {
+            'votes_by_day': analytics.votes_by_day,
+            'votes_by_hour': analytics.votes_by_hour,
+            'votes_by_device': analytics.votes_by_device,
+            'votes_by_country': analytics.votes_by_country,
+            'votes_by_referrer': analytics.votes_by_referrer,
+            'peak_voting_time': analytics.peak_voting_time,
+        }
+    # Round-trip through JSON so cached and stored copies are identical
+    return json.loads(json.dumps(document, cls=DjangoJSONEncoder))
+
+
+def _snapshot(poll, analytics):
+    document = build_results(poll, analytics)
+    etag = hashlib.sha256(json.dumps(document, sort_keys=True).encode()).hexdigest()
+    return ResultsSnapshot(poll=poll, document=document, etag=f'"{etag[:32]}"')
+
+
+def freeze_results(poll_ids):
+    """Snapshot the final results of the given polls (replacing old ones)"""
+    polls = list(Poll.objects.filter(id__in=poll_ids).prefetch_related('choices'))
+    analytics = {a.poll_id: a for a in PollAnalytics.objects.filter(poll_id__in=poll_ids)}
+    snapshots = [_snapshot(poll, analytics.get(poll.id)) for poll in polls if is_final(poll)]
+    ResultsSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['poll'],
+        update_fields=['document', 'etag', 'created_at'],
+    )
+    cache.set_many(
+        {_cache_key(s.poll_id): (s.document, s.etag) for s in snapshots}, None
+    )
+    return len(snapshots)
+
+
+def discard_results(poll_ids):
+    """Drop snapshots of polls that accept votes again"""
+    ResultsSnapshot.objects.filter(poll_id__in=poll_ids).delete()
+    cache.delete_many([_cache_key(poll_id) for poll_id in poll_ids])
+
+
+def _load(poll, refreeze=False):
+    snapshot = None if refreeze else ResultsSnapshot.objects.filter(poll=poll).first()
+    if snapshot is None:
+        freeze_results([poll.id])
+        snapshot = ResultsSnapshot.objects.filter(poll=poll).first()
+        if snapshot is None:
+            return None
+    cached = (snapshot.document, snapshot.etag)
+    cache.set(_cache_key(poll.id), cached, None)
+    return cached
+
+
+def get_results_snapshot(poll):
+    """
+    ``(document, etag)`` for a closed poll, freezing it on first use;
+    None while the poll still accepts votes.
+    """
+    if not is_final(poll):
+        return None
+
+    cached = cache.get(_cache_key(poll.id)) or _load(poll)
+    if cached is not None and cached[0]['total_votes'] != poll.total_votes:
+        # Reopened and closed again without passing through the hooks
+        cached = _load(poll, refreeze=True)
+    return cached
+
+
+def results_payload(poll, document):
+    """Snapshot data in the shape of the live results/stats APIs"""
+    return {
+        'poll_id': document['poll_id'],
+        'title': document['title'],
+        'total_votes': document['total_votes'],
+        'unique_voters': document['unique_voters'],
+        'choices': document['choices'],
+        'is_active': poll.is_active,
+        'can_vote': False,
+        'expires_at': document['expires_at'],
+        'last_updated': document['closed_at'],
+    }
+
+
+def snapshot_response(request, poll, data, etag):
+    """JSON response for snapshot data with long-lived HTTP caching"""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(data)
+    response['ETag'] = etag
+    if poll.show_results:
+        patch_cache_control(response, public=True, max_age=SNAPSHOT_MAX_AGE)
+    else:
+        patch_cache_control(response, private=True, max_age=SNAPSHOT_MAX_AGE)
+    return response
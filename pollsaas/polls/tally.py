@@ -0,0 +1,134 @@
+"""
+Recounting poll results from the vote table.
+
+``Choice.votes``, ``Poll.total_votes`` and ``Poll.unique_voters`` are
+incremented as votes arrive, so anything that changes votes after the
+fact (invalidating, flagging, restoring) must recount them.
+``retally_polls`` does that with one grouped aggregate UPDATE for a
+poll's choices and one for the poll itself, however many votes changed,
+then adjusts creator stats by the difference and refreshes frozen
+results. It locks the poll row before its choices, as the vote paths
+do, so it can run alongside voting.
+
+The counts follow the vote paths: only valid votes count; a ballot is
+one submission, so for multiple-choice polls the rows a voter submitted
+within the same second are one vote; a voter is a registered user or
+an anonymous (IP, session) pair. Once voter data has been cleared
+without a fingerprint (``VOTE_PII_PRUNE_MODE = 'null'``) every such vote
+counts as its own voter.
+"""
+from django.db import connection, transaction
+
+from accounts.stats import bump_creator_stats
+
+from .models import Poll, VoteArchive
+from .partitioning import PRUNE_MARGIN, VOTE_TABLE
+from .snapshots import freeze_results
+
+_VOTER = """
+    CASE
+        WHEN voter_id IS NOT NULL THEN 'u' || voter_id
+        WHEN voter_ip IS NULL AND voter_session = '' THEN 'v' || id
+        ELSE 'a' || coalesce(host(voter_ip), '') || '/' || voter_session
+    END
+"""
+
+# Rows a voter submitted to a multiple-choice poll within the same second
+_BALLOT = f"({_VOTER}) || '@' || date_trunc('second', voted_at)"
+
+
+def _retally(cursor, poll):
+    """
+    Bring the poll's counters in line with its votes; returns how far
+    ``(total_votes, unique_voters)`` moved. Each statement reads the
+    stored counter and the vote count from one snapshot and applies only
+    the difference, so votes counted by concurrent ``F()`` increments are
+    kept.
+
+    The poll row is updated (and so locked) before the choice rows, the
+    order the vote paths take them in, so a recount running alongside
+    voting cannot deadlock with it; votes on the poll wait for it instead.
+    """
+    since = poll.created_at - PRUNE_MARGIN
+    ballot = _BALLOT if poll.poll_type == 'multiple' else "id::text"
+    # Unconditional, so the row lock is taken even when nothing moved
+    cursor.execute(
+        f"""
+        UPDATE polls_poll AS poll
+        SET total_votes = poll.total_votes + counts.ballots - counts.stored_ballots,
+            unique_voters = poll.unique_voters + counts.voters - counts.stored_voters
+        FROM (
+            SELECT stored.total_votes AS stored_ballots, stored.unique_voters AS stored_voters,
+                   actual.ballots, actual.voters
+            FROM polls_poll AS stored, (
+                SELECT count(DISTINCT {ballot}) AS ballots, count(DISTINCT {_VOTER}) AS voters
+                FROM "{VOTE_TABLE}"
+                WHERE poll_id = %s AND voted_at >= %s AND is_valid
+            ) AS actual
+            WHERE stored.id = %s
+        ) AS counts
+        WHERE poll.id = %s
+        RETURNING counts.ballots - counts.stored_ballots, counts.voters - counts.stored_voters
+        """,
+        [poll.id, since, poll.id, poll.id],
+    )
+    moved = cursor.fetchone() or (0, 0)
+    cursor.execute(
+        f"""
+        UPDATE polls_choice AS choice SET votes = choice.votes + counts.votes - counts.stored
+        FROM (
+            SELECT choice.id, choice.votes AS stored, count(vote.id) AS votes
+            FROM polls_choice AS choice
+            LEFT JOIN "{VOTE_TABLE}" AS vote
+              ON vote.choice_id = choice.id AND vote.is_valid
+             AND vote.poll_id = %s AND vote.voted_at >= %s
+            WHERE choice.poll_id = %s
+            GROUP BY choice.id
+        ) AS counts
+        WHERE choice.id = counts.id AND counts.votes <> counts.stored
+        """,
+        [poll.id, since, poll.id],
+    )
+    return moved
+
+
+def retally_polls(poll_ids):
+    """
+    Recount the given polls from their valid votes. Returns the ids whose
+    totals changed. Polls with a verified archive keep their counters:
+    their votes are being, or have been, deleted.
+    """
+    archived = set(
+        VoteArchive.objects.filter(poll_id__in=poll_ids, verified_at__isnull=False)
+        .values_list('poll_id', flat=True)
+    )
+    changed = []
+    for poll_id in sorted(set(poll_ids) - archived):
+        poll = Poll.objects.filter(pk=poll_id).first()
+        if poll is None:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            ballots, voters = _retally(cursor, poll)
+            if ballots or voters:
+                bump_creator_stats(poll.creator_id, votes=ballots, voters=voters)
+                changed.append(poll_id)
+
+    # Choice counts may have moved even when the totals did not
+    transaction.on_commit(lambda: freeze_results(sorted(set(poll_ids) - archived)))
+    return changed
+
+
+def set_vote_validity(queryset, is_valid, flagged_reason=None):
+    """
+    Mark the votes in ``queryset`` valid or invalid (setting
+    ``flagged_reason`` unless it is None) and recount the polls they
+    belong to. Returns ``(votes updated, poll ids recounted)``.
+    """
+    # Collected first: the queryset may itself filter on is_valid
+    poll_ids = list(queryset.order_by().values_list('poll_id', flat=True).distinct())
+    updates = {'is_valid': is_valid}
+    if flagged_reason is not None:
+        updates['flagged_reason'] = flagged_reason
+    updated = queryset.update(**updates)
+    retally_polls(poll_ids)
+    return updated, poll_ids
@@ -1,3 +1,1190 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection
+from django.http import JsonResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CreatorStats
+from accounts.stats import get_creator_stats
+
+from .activity import recent_activity
+from .archive import (
+    ArchiveMismatch, archivable_polls, archive_poll, iter_poll_votes, read_archive, verify_archive,
+)
+from .bulk import import_polls, parse_definitions
+from .degradation import (
+    CRITICAL, DEGRADED, NORMAL, DegradationController, buffer_backlog, buffer_vote,
+    drain_vote_buffer,
+)
+from .exports import claim_next_job, enqueue_export, run_export_job
+from .fraud import BOT_REASON, FraudDetector, VoteScanner, subnet
+from .idempotency import IDEMPOTENCY_KEY_MAX_LENGTH, idempotent
+from .lifecycle import expire_due_polls, next_expiry, publish_polls
+from .models import (
+    Choice, FraudCheckpoint, Poll, ResultsSnapshot, UserAgent, Vote, VoteArchive,
+)
+from .pagination import InvalidCursor, KeysetPaginator
+from .partitioning import DEFAULT_PARTITION, create_partitions, detach_partitions, list_partitions
+from .purge import delete_poll, pending_purges, purge_poll
+from .queryplans import analyze, check_plans, plan_check_user, seed
+from .ratelimit import RATE_LIMIT_EPOCH, CacheBuckets, LocalBuckets, client_address
+from .reconcile import reconcile_counters
+from .retention import polls_due_for_pruning, prune_poll_pii
+from .search import search_polls
+from .services import cast_vote, create_poll_with_choices
+from .snapshots import discard_results, freeze_results, get_results_snapshot
+from .slugs import SLUG_ALPHABET, SLUG_BLOCK_SIZE, SLUG_LENGTH, allocate_slugs, permute, unpermute
+from .tally import retally_polls, set_vote_validity
+from .useragents import USER_AGENT_MAX_LENGTH, classify_device, clear_cache, intern_user_agent
+
+User = get_user_model()
+
+
+class FraudDetectorTests(SimpleTestCase):
+    def detector(self, **limits):
+        return FraudDetector(window=60, limits=limits)
+
+    def test_subnet(self):
+        self.assertEqual(subnet('10.1.2.3'), '10.1.2')
+        self.assertEqual(subnet('2001:db8:1:2:3:4:5:6'), '2001:db8:1:2::')
+
+    def test_flags_votes_past_the_ip_limit(self):
+        detector = self.detector(ip=3)
+        verdicts = [
+            detector.observe(1, 100 + i, ip='10.0.0.1', session=f"s{i}") for i in range(4)
+        ]
+        self.assertEqual(verdicts, [None, None, None, 'burst_ip'])
+
+    def test_window_slides(self):
+        detector = self.detector(ip=2)
+        detector.observe(1, 100, ip='10.0.0.1', session='a')
+        detector.observe(1, 101, ip='10.0.0.1', session='b')
+        self.assertIsNone(detector.observe(1, 161, ip='10.0.0.1', session='c'))
+
+    def test_polls_are_counted_separately(self):
+        detector = self.detector(ip=1)
+        self.assertIsNone(detector.observe(1, 100, ip='10.0.0.1'))
+        self.assertIsNone(detector.observe(2, 101, ip='10.0.0.1'))
+        self.assertEqual(detector.observe(1, 102, ip='10.0.0.1'), 'burst_ip')
+
+    def test_subnet_and_choice(self):
+        detector = self.detector(subnet_choice=2)
+        detector.observe(1, 100, ip='10.0.0.1', choice_id=7)
+        detector.observe(1, 101, ip='10.0.0.2', choice_id=7)
+        self.assertIsNone(detector.observe(1, 102, ip='10.0.0.3', choice_id=8))
+        self.assertEqual(
+            detector.observe(1, 103, ip='10.0.0.4', choice_id=7), 'ballot_stuffing'
+        )
+
+    def test_bots_are_always_flagged(self):
+        detector = self.detector(ip=100)
+        self.assertEqual(detector.observe(1, 100, ip='10.0.0.1', bot=True), BOT_REASON)
+
+    def test_ballot_rows_share_a_verdict(self):
+        # A multiple-choice ballot arrives as one row per choice
+        detector = self.detector(ip=1)
+        self.assertIsNone(detector.observe(1, 100.1, ip='10.0.0.1', session='a', choice_id=1))
+        self.assertIsNone(detector.observe(1, 100.2, ip='10.0.0.1', session='a', choice_id=2))
+
+    def test_memory_is_bounded(self):
+        detector = FraudDetector(window=60, limits={'ip': 5}, max_polls=2, max_keys=3)
+        for poll_id in range(5):
+            for i in range(10):
+                detector.observe(poll_id, 100 + i, ip=f"10.0.{i}.1")
+        polls, windows, stamps = detector.size()
+        self.assertEqual(polls, 2)
+        self.assertLessEqual(windows, 6)
+        self.assertLessEqual(stamps, 30)
+
+    def test_quiet_windows_are_dropped(self):
+        detector = self.detector(ip=5)
+        detector.observe(1, 100, ip='10.0.0.1')
+        detector.observe(1, 200, ip='10.0.0.2')
+        self.assertEqual(detector.size(), (1, 1, 1))
+
+
+@skipUnless(connection.vendor == 'postgresql', "Query plans are checked on PostgreSQL")
+class QueryPlanTests(TransactionTestCase):
+    """
+    The hot queries use the indexes tuned for them (see polls.queryplans).
+    Not a TestCase: the seed has to be committed for VACUUM, which index-only
+    scans depend on.
+    """
+
+    def test_hot_queries_use_their_indexes(self):
+        user = plan_check_user()
+        seed(user, poll_count=2000, vote_count=60_000, voter_count=50)
+        analyze()
+        for label, expected, ok, plan, queryset in check_plans(user):
+            with self.subTest(label):
+                self.assertTrue(ok, f"{label} did not use {expected}:\n{queryset.explain()}")
+
+
+class LocalBucketsTests(SimpleTestCase):
+    def test_burst_then_refill(self):
+        buckets = LocalBuckets()
+        self.assertEqual(buckets.take('k', 2, 1, 0), 0)
+        self.assertEqual(buckets.take('k', 2, 1, 0), 0)
+        self.assertEqual(buckets.take('k', 2, 1, 0), 1.0)
+        self.assertEqual(buckets.take('k', 2, 1, 0.5), 0.5)
+        self.assertEqual(buckets.take('k', 2, 1, 1), 0)
+
+    def test_refill_stops_at_burst(self):
+        buckets = LocalBuckets()
+        buckets.take('k', 2, 1, 0)
+        self.assertEqual(buckets.take('k', 2, 1, 100), 0)
+        self.assertEqual(buckets.take('k', 2, 1, 100), 0)
+        self.assertGreater(buckets.take('k', 2, 1, 100), 0)
+
+    def test_least_recently_used_evicted(self):
+        buckets = LocalBuckets(max_buckets=2)
+        buckets.take('a', 1, 0.1, 0)
+        buckets.take('b', 1, 0.1, 0)
+        buckets.take('c', 1, 0.1, 0)
+        # 'a' was evicted and starts full again; 'b' and 'c' are still empty
+        self.assertEqual(buckets.take('a', 1, 0.1, 0), 0)
+        self.assertGreater(buckets.take('c', 1, 0.1, 0), 0)
+
+
+class CacheBucketsTests(SimpleTestCase):
+    start = RATE_LIMIT_EPOCH * 1000
+
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_refill(self):
+        buckets = CacheBuckets()
+        self.assertEqual(buckets.take('k', 2, 1, self.start), 0)
+        self.assertEqual(buckets.take('k', 2, 1, self.start), 0)
+        self.assertEqual(buckets.take('k', 2, 1, self.start), 1.0)
+        # Refused requests spend nothing, so one token is back a second later
+        self.assertEqual(buckets.take('k', 2, 1, self.start + 1), 0)
+        self.assertGreater(buckets.take('k', 2, 1, self.start + 1), 0)
+
+    def test_refill_stops_at_burst(self):
+        buckets = CacheBuckets()
+        buckets.take('k', 2, 1, self.start)
+        now = self.start + 100
+        self.assertEqual(buckets.take('k', 2, 1, now), 0)
+        self.assertEqual(buckets.take('k', 2, 1, now), 0)
+        self.assertGreater(buckets.take('k', 2, 1, now), 0)
+
+    def test_keys_are_separate(self):
+        buckets = CacheBuckets()
+        self.assertEqual(buckets.take('a', 1, 1, self.start), 0)
+        self.assertEqual(buckets.take('b', 1, 1, self.start), 0)
+        self.assertGreater(buckets.take('a', 1, 1, self.start), 0)
+
+
+class ClientAddressTests(SimpleTestCase):
+    def request(self, forwarded=None):
+        headers = {'REMOTE_ADDR': '192.0.2.1'}
+        if forwarded is not None:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded
+        return RequestFactory().get('/', **headers)
+
+    def test_forwarded_ignored_without_trusted_proxies(self):
+        self.assertEqual(client_address(self.request('198.51.100.7'), 0), '192.0.2.1')
+
+    def test_takes_the_hop_the_outermost_proxy_saw(self):
+        request = self.request('203.0.113.9, 198.51.100.7, 10.0.0.2')
+        self.assertEqual(client_address(request, 1), '10.0.0.2')
+        self.assertEqual(client_address(request, 2), '198.51.100.7')
+
+    def test_short_header_falls_back_to_peer(self):
+        self.assertEqual(client_address(self.request('198.51.100.7'), 2), '192.0.2.1')
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class DegradationControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.controller = DegradationController(
+            query_ms=(100, 400), wait_ms=(50, 200), weight=1,
+            half_life=5, recovery=10, clock=self.clock,
+        )
+
+    def test_levels_follow_query_time(self):
+        self.controller.record(query_ms=20)
+        self.assertEqual(self.controller.current_level(), NORMAL)
+        self.controller.record(query_ms=150)
+        self.assertEqual(self.controller.current_level(), DEGRADED)
+        self.controller.record(query_ms=500)
+        self.assertEqual(self.controller.current_level(), CRITICAL)
+
+    def test_levels_follow_connection_wait(self):
+        self.controller.record(wait_ms=250)
+        self.assertEqual(self.controller.current_level(), CRITICAL)
+
+    def test_recovers_one_step_at_a_time(self):
+        self.controller.record(query_ms=500)
+        self.controller.record(query_ms=10)
+        self.assertEqual(self.controller.level, CRITICAL)
+        self.clock.advance(4)
+        self.controller.record(query_ms=10)
+        self.assertEqual(self.controller.level, CRITICAL)
+        self.clock.advance(6)
+        self.controller.record(query_ms=10)
+        self.assertEqual(self.controller.level, DEGRADED)
+        self.clock.advance(10)
+        self.controller.record(query_ms=10)
+        self.assertEqual(self.controller.level, NORMAL)
+
+    def test_no_recovery_near_the_threshold(self):
+        self.controller.record(query_ms=150)
+        for _ in range(30):
+            self.clock.advance(1)
+            self.controller.record(query_ms=80)
+        self.assertEqual(self.controller.level, DEGRADED)
+
+    def test_quiet_periods_count_as_recovery(self):
+        self.controller.record(query_ms=500)
+        self.clock.advance(10)
+        self.assertEqual(self.controller.current_level(), CRITICAL)
+        self.clock.advance(10)
+        self.assertEqual(self.controller.current_level(), DEGRADED)
+        self.clock.advance(10)
+        self.assertEqual(self.controller.current_level(), NORMAL)
+
+
+class IdempotentTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.status = 201
+
+        @idempotent('test')
+        def view(request):
+            self.calls += 1
+            return JsonResponse({'call': self.calls}, status=self.status)
+
+        self.view = view
+
+    def request(self, key=None, body=None, ip='192.0.2.1', forwarded=None):
+        headers = {'REMOTE_ADDR': ip}
+        if forwarded is not None:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded
+        if key is not None:
+            headers['HTTP_IDEMPOTENCY_KEY'] = key
+        request = RequestFactory().post(
+            '/vote/', json.dumps(body or {'choice': 1}),
+            content_type='application/json', **headers,
+        )
+        request.user = AnonymousUser()
+        return request
+
+    def test_without_key_every_request_runs(self):
+        self.view(self.request())
+        self.view(self.request())
+        self.assertEqual(self.calls, 2)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.view(self.request('k1'))
+        retry = self.view(self.request('k1'))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first)
+
+    def test_key_reused_for_another_request(self):
+        self.view(self.request('k1'))
+        response = self.view(self.request('k1', body={'choice': 2}))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    def test_keys_are_scoped_to_the_caller(self):
+        self.view(self.request('k1'))
+        self.view(self.request('k1', ip='192.0.2.2'))
+        self.assertEqual(self.calls, 2)
+
+    def test_forwarded_header_does_not_change_the_caller(self):
+        self.view(self.request('k1', forwarded='198.51.100.7'))
+        retry = self.view(self.request('k1', forwarded='203.0.113.9'))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.calls, 1)
+
+    def test_concurrent_retry_is_refused(self):
+        responses = []
+
+        @idempotent('test')
+        def view(request):
+            responses.append(view(self.request('k1')))
+            return JsonResponse({}, status=201)
+
+        self.assertEqual(view(self.request('k1')).status_code, 201)
+        self.assertEqual(responses[0].status_code, 409)
+        self.assertEqual(responses[0]['Retry-After'], '1')
+
+    def test_server_errors_are_not_kept(self):
+        self.status = 503
+        self.view(self.request('k1'))
+        self.status = 201
+        response = self.view(self.request('k1'))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.calls, 2)
+
+    def test_exceptions_release_the_key(self):
+        @idempotent('test')
+        def view(request):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError
+            return JsonResponse({}, status=201)
+
+        with self.assertRaises(RuntimeError):
+            view(self.request('k1'))
+        self.assertEqual(view(self.request('k1')).status_code, 201)
+
+    def test_overlong_key(self):
+        response = self.view(self.request('k' * (IDEMPOTENCY_KEY_MAX_LENGTH + 1)))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.calls, 0)
+
+
+class PollTestCase(TestCase):
+    """An active poll with two choices"""
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='secret'
+        )
+        self.poll = Poll.objects.create(creator=self.creator, title='Lunch?', status='active')
+        self.choices = Choice.objects.bulk_create([
+            Choice(poll=self.poll, text='Yes', order=0),
+            Choice(poll=self.poll, text='No', order=1),
+        ])
+
+
+class PublishPollsTests(PollTestCase):
+    def draft(self, choices):
+        poll = Poll.objects.create(
+            creator=self.creator, title='Later?', status='draft',
+            publish_at=timezone.now() - timedelta(minutes=1),
+        )
+        Choice.objects.bulk_create([
+            Choice(poll=poll, text=text, order=order, is_active=is_active)
+            for order, (text, is_active) in enumerate(choices)
+        ])
+        return poll
+
+    def test_publishes_due_drafts(self):
+        poll = self.draft([('Yes', True), ('No', True)])
+        self.assertEqual(publish_polls(), [poll.id])
+        poll.refresh_from_db()
+        self.assertEqual((poll.status, poll.is_active), ('active', True))
+
+    def test_drafts_need_two_active_choices(self):
+        lonely = self.draft([('Yes', True)])
+        retired = self.draft([('Yes', True), ('No', False)])
+        self.assertEqual(publish_polls(), [])
+        self.assertEqual(
+            set(Poll.objects.filter(pk__in=[lonely.pk, retired.pk]).values_list('status', flat=True)),
+            {'draft'},
+        )
+
+
+class VoteBufferTests(PollTestCase):
+    def test_malformed_entry_does_not_block_the_buffer(self):
+        buffer_vote(self.poll, ['x'], None, '192.0.2.1', 'one', 'Mozilla/5.0')
+        buffer_vote(self.poll, [self.choices[0].id], None, '192.0.2.2', 'two', 'Mozilla/5.0')
+        with self.assertLogs('polls.degradation', 'ERROR'):
+            self.assertEqual(drain_vote_buffer(), (1, 1, 0))
+        self.assertEqual(buffer_backlog(), (2, 2))
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.total_votes, 1)
+
+    def test_vote_api_checks_choices_before_queueing(self):
+        url = reverse('polls:vote_api', kwargs={'slug': self.poll.slug})
+        with mock.patch('polls.views.is_critical', return_value=True):
+            response = self.client.post(url, {'choices': ['x']}, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(buffer_backlog(), (0, 0))
+
+            response = self.client.post(
+                url, {'choices': [self.choices[0].id]}, content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(buffer_backlog(), (0, 1))
+
+
+class RetallyTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, choice in enumerate([0, 0, 1]):
+            cast_vote(self.poll, [self.choices[choice].id], None, f"192.0.2.{i}", 'session', '')
+
+    def counts(self):
+        self.poll.refresh_from_db()
+        return (
+            self.poll.total_votes, self.poll.unique_voters,
+            [choice.votes for choice in self.poll.choices.order_by('order')],
+        )
+
+    def test_repairs_drifted_counters(self):
+        Poll.objects.filter(pk=self.poll.pk).update(total_votes=10, unique_voters=1)
+        Choice.objects.filter(pk=self.choices[1].pk).update(votes=7)
+        self.assertEqual(retally_polls([self.poll.id]), [self.poll.id])
+        self.assertEqual(self.counts(), (3, 3, [2, 1]))
+
+    def test_invalidated_votes_stop_counting(self):
+        set_vote_validity(Vote.objects.filter(voter_ip='192.0.2.2'), False, 'manual')
+        self.assertEqual(self.counts(), (2, 2, [2, 0]))
+        self.assertEqual(retally_polls([self.poll.id]), [])
+
+
+    def test_polls_being_archived_keep_their_counters(self):
+        # Verified and part-way through deleting its rows
+        VoteArchive.objects.create(poll=self.poll, row_count=3, verified_at=timezone.now())
+        Vote.objects.filter(voter_ip='192.0.2.0').delete()
+
+        self.assertEqual(retally_polls([self.poll.id]), [])
+        run = reconcile_counters()
+        self.assertEqual(run.polls_checked, 0)
+        self.assertEqual(self.counts(), (3, 3, [2, 1]))
+
+    def test_reconcile_repairs_drifted_counters(self):
+        Poll.objects.filter(pk=self.poll.pk).update(total_votes=10)
+        Choice.objects.filter(pk=self.choices[1].pk).update(votes=7)
+        run = reconcile_counters()
+        self.assertEqual((run.polls_repaired, run.choices_repaired), (1, 1))
+        self.assertEqual(self.counts(), (3, 3, [2, 1]))
+
+
+class VotePartitionTests(PollTestCase):
+    def partition_rows(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{name}"')
+            return cursor.fetchone()[0]
+
+    def test_votes_without_a_partition_are_moved_in_when_it_is_created(self):
+        vote = Vote.objects.create(poll=self.poll, choice=self.choices[0], voter_ip='192.0.2.1')
+        Vote.objects.filter(pk=vote.pk).update(voted_at=datetime(2024, 6, 15, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.partition_rows(DEFAULT_PARTITION), 1)
+
+        self.assertEqual(
+            create_partitions(datetime(2024, 6, 1, tzinfo=dt_timezone.utc), 1), ['polls_vote_p202406']
+        )
+        self.assertEqual(self.partition_rows(DEFAULT_PARTITION), 0)
+        self.assertEqual(self.partition_rows('polls_vote_p202406'), 1)
+
+    def test_detach_alongside_the_default_partition(self):
+        create_partitions(datetime(2024, 6, 1, tzinfo=dt_timezone.utc), 2)
+        detached = list(detach_partitions(datetime(2024, 7, 1, tzinfo=dt_timezone.utc)))
+        self.assertEqual(detached, ['polls_vote_p202406'])
+        names = [name for name, _ in list_partitions()]
+        self.assertNotIn('polls_vote_p202406', names)
+        self.assertIn('polls_vote_p202407', names)
+
+
+class PollAdminActionTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='secret'
+        )
+        self.client.force_login(admin)
+
+    def run_action(self, action, filters):
+        url = reverse('admin:polls_poll_changelist')
+        return self.client.post(f"{url}?{filters}", {
+            'action': action, '_selected_action': [self.poll.pk],
+        })
+
+    def test_actions_rebuild_stats_under_a_list_filter(self):
+        self.run_action('close_polls', 'status__exact=active')
+        self.assertEqual(CreatorStats.objects.get(user=self.creator).active_polls, 0)
+        self.run_action('activate_polls', 'status__exact=closed')
+        self.assertEqual(CreatorStats.objects.get(user=self.creator).active_polls, 1)
+
+    def test_closing_under_a_list_filter_freezes_results(self):
+        self.run_action('deactivate_polls', 'is_active__exact=1')
+        self.poll.refresh_from_db()
+        self.assertIsNotNone(self.poll.closed_at)
+        self.assertTrue(ResultsSnapshot.objects.filter(poll=self.poll).exists())
+
+        self.run_action('activate_polls', 'is_active__exact=0')
+        self.poll.refresh_from_db()
+        self.assertIsNone(self.poll.closed_at)
+        self.assertFalse(ResultsSnapshot.objects.filter(poll=self.poll).exists())
+
+
+class VoteScannerTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        start = timezone.now() - timedelta(minutes=5)
+        for i in range(6):
+            cast_vote(self.poll, [self.choices[0].id], None, '192.0.2.1', f"session-{i}", '')
+        for i, vote in enumerate(Vote.objects.order_by('id')):
+            Vote.objects.filter(pk=vote.pk).update(voted_at=start + timedelta(seconds=i))
+        FraudCheckpoint.objects.create(name='test', last_voted_at=start - timedelta(minutes=5))
+
+    def test_flags_bursts_and_recounts(self):
+        scanner = VoteScanner('test', FraudDetector(window=60, limits={'ip': 3}))
+        checked, flags = scanner.scan()
+        self.assertEqual(checked, 6)
+        self.assertEqual([reason for _, _, reason in flags], ['burst_ip'] * 3)
+        self.assertEqual(Vote.objects.filter(is_valid=False).count(), 3)
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.total_votes, 3)
+        self.assertEqual(scanner.scan(), (0, []))
+
+    def test_dry_run_changes_nothing(self):
+        scanner = VoteScanner('test', FraudDetector(window=60, limits={'ip': 3}))
+        checked, flags = scanner.scan(dry_run=True)
+        self.assertEqual((checked, len(flags)), (6, 3))
+        self.assertFalse(Vote.objects.filter(is_valid=False).exists())
+        self.assertEqual(FraudCheckpoint.objects.get(name='test').last_vote_id, 0)
+
+    def test_restart_rebuilds_windows_without_flagging_again(self):
+        VoteScanner('test', FraudDetector(window=60, limits={'ip': 3})).scan()
+        cast_vote(self.poll, [self.choices[1].id], None, '192.0.2.1', 'session-late', '')
+        Vote.objects.filter(voter_session='session-late').update(
+            voted_at=timezone.now() - timedelta(minutes=5) + timedelta(seconds=10)
+        )
+
+        scanner = VoteScanner('test', FraudDetector(window=60, limits={'ip': 3}))
+        self.assertEqual(scanner.warm_up(), 6)
+        self.assertEqual(Vote.objects.filter(is_valid=False).count(), 3)
+        checked, flags = scanner.scan()
+        self.assertEqual((checked, [reason for _, _, reason in flags]), (1, ['burst_ip']))
+
+
+class RateLimitTests(PollTestCase):
+    limits = {'ip': (2, 0.01)}
+
+    def test_results_api_answers_429_once_the_bucket_is_empty(self):
+        url = reverse('polls:poll_results_api', args=[self.poll.slug])
+        with mock.patch.dict('polls.ratelimit.RATE_LIMITS', {'results': self.limits}):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 200)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 429)
+            self.assertTrue(1 <= int(response['Retry-After']) <= 100)
+            self.assertEqual(
+                self.client.get(url, REMOTE_ADDR='192.0.2.9').status_code, 200
+            )
+
+    def test_scopes_without_limits_are_not_limited(self):
+        url = reverse('polls:poll_results_api', args=[self.poll.slug])
+        with mock.patch.dict('polls.ratelimit.RATE_LIMITS', {'results': {}}):
+            for _ in range(5):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class LoadSheddingTests(PollTestCase):
+    def test_shed_views_answer_503_when_critical(self):
+        self.client.force_login(self.creator)
+        url = reverse('polls:vote_history_api', args=[self.poll.slug])
+        with mock.patch('polls.degradation.is_critical', return_value=True):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_votes_are_queued_when_critical(self):
+        url = reverse('polls:vote_api', args=[self.poll.slug])
+        with mock.patch('polls.views.is_critical', return_value=True):
+            response = self.client.post(
+                url, {'choices': [self.choices[0].id]}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.json()['queued'])
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(buffer_backlog(), (0, 1))
+        self.assertEqual(drain_vote_buffer(), (1, 0, 0))
+        self.assertEqual(Vote.objects.count(), 1)
+
+
+class IdempotentVoteTests(PollTestCase):
+    def test_retried_vote_is_recorded_once(self):
+        url = reverse('polls:vote_api', args=[self.poll.slug])
+        body = {'choices': [self.choices[0].id]}
+        first = self.client.post(
+            url, body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='ballot-1'
+        )
+        retry = self.client.post(
+            url, body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='ballot-1'
+        )
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Vote.objects.count(), 1)
+
+
+class ExportTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_override = override_settings(MEDIA_ROOT=media)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        partial_dir = mock.patch('polls.exports.EXPORT_PARTIAL_DIR', os.path.join(media, 'partial'))
+        partial_dir.start()
+        self.addCleanup(partial_dir.stop)
+        for i, choice in enumerate([0, 0, 1]):
+            cast_vote(self.poll, [self.choices[choice].id], None, f"192.0.2.{i}", 'session', '')
+        self.poll.refresh_from_db()
+
+    def rows(self, job):
+        with job.artifact.open('rb') as fh:
+            return fh.read().decode('utf-8').splitlines()
+
+    def test_export_is_built_in_chunks_and_served_once_ready(self):
+        self.client.force_login(self.creator)
+        url = reverse('polls:poll_export', args=[self.poll.slug])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['total_rows'], 3)
+
+        job = run_export_job(claim_next_job(), chunk_size=2)
+        self.assertEqual((job.status, job.rows_written), ('completed', 3))
+        rows = self.rows(job)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual([row.split(',')[2] for row in rows[1:]], ['Yes', 'Yes', 'No'])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(enqueue_export(self.poll).pk, job.pk)
+
+    def test_new_votes_start_a_new_export(self):
+        job = enqueue_export(self.poll)
+        cast_vote(self.poll, [self.choices[1].id], None, '192.0.2.9', 'session', '')
+        self.poll.refresh_from_db()
+        self.assertNotEqual(enqueue_export(self.poll).pk, job.pk)
+
+    def test_failed_export_resumes_after_the_last_chunk(self):
+        def crash_after_first_chunk(poll, after_id, chunk_size):
+            chunks = iter_poll_votes(poll, after_id, chunk_size)
+            yield next(chunks)
+            raise RuntimeError('worker died')
+
+        job = enqueue_export(self.poll)
+        with mock.patch('polls.exports.iter_poll_votes', crash_after_first_chunk):
+            with self.assertRaises(RuntimeError):
+                run_export_job(job, chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_written), ('failed', 2))
+
+        job = run_export_job(job, chunk_size=2)
+        self.assertEqual(job.rows_written, 3)
+        ids = [row.split(',')[0] for row in self.rows(job)[1:]]
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(len(ids), 3)
+
+
+class RecentActivityTests(PollTestCase):
+    def vote(self, i, choice=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return cast_vote(self.poll, [self.choices[choice].id], None, f"192.0.2.{i}", 'session', '')
+
+    def test_feed_is_newest_first_without_reading_votes(self):
+        self.vote(0)
+        self.vote(1, choice=1)
+        with self.assertNumQueries(0):
+            activity = recent_activity(self.poll)
+        self.assertEqual([entry['choice']['text'] for entry in activity], ['No', 'Yes'])
+
+    def test_feed_is_rebuilt_after_a_cache_miss(self):
+        for i in range(3):
+            self.vote(i)
+        expected = [entry['id'] for entry in recent_activity(self.poll)]
+        cache.clear()
+        self.assertEqual([entry['id'] for entry in recent_activity(self.poll, limit=2)], expected[:2])
+        self.vote(3)
+        self.assertEqual(len(recent_activity(self.poll)), 4)
+
+    def test_cold_feed_is_empty_while_degraded(self):
+        self.vote(0)
+        cache.clear()
+        with mock.patch('polls.activity.is_degraded', return_value=True):
+            self.assertEqual(recent_activity(self.poll), [])
+
+
+class VoteHistoryTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            cast_vote(self.poll, [self.choices[0].id], None, f"192.0.2.{i}", 'session', '')
+        # Ties on voted_at are broken by id
+        Vote.objects.update(voted_at=timezone.now())
+        self.client.force_login(self.creator)
+        self.url = reverse('polls:vote_history_api', args=[self.poll.slug])
+
+    def test_pages_follow_the_cursor(self):
+        ids = []
+        cursor = ''
+        with mock.patch('polls.views.VOTE_HISTORY_PAGE_SIZE', 2):
+            while True:
+                data = self.client.get(self.url, {'cursor': cursor}).json()
+                ids += [vote['id'] for vote in data['votes']]
+                if not data['has_next']:
+                    break
+                cursor = data['next_cursor']
+        self.assertEqual(ids, list(Vote.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_previous_cursor_returns_the_page_before(self):
+        paginator = KeysetPaginator(Vote.objects.all(), ('-voted_at', '-id'), per_page=2)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual([vote.id for vote in back], [vote.id for vote in first])
+        self.assertFalse(back.has_previous)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        # A cursor from another ordering is refused too
+        cursor = KeysetPaginator(Vote.objects.all(), ('-voted_at', '-id'), 2).get_page().next_cursor
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(Vote.objects.all(), ('-id',), 2).get_page(cursor)
+
+    def test_only_the_creator_sees_the_history(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='secret')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Search uses PostgreSQL full-text and trigram indexes")
+class SearchPollsTests(PollTestCase):
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest("pg_trgm is not installed")
+        super().setUp()
+        Poll.objects.create(
+            creator=self.creator, title='Team offsite', description='Where should we have lunch?',
+            status='active',
+        )
+        Poll.objects.create(creator=self.creator, title='Favourite editor', status='active')
+
+    def titles(self, query):
+        return [poll.title for poll in search_polls(Poll.objects.all(), query)]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.titles('lunch'), ['Lunch?', 'Team offsite'])
+
+    def test_typos_fall_back_to_trigrams(self):
+        self.assertEqual(self.titles('editr'), ['Favourite editor'])
+
+    def test_blank_query_returns_everything(self):
+        self.assertEqual(len(self.titles('  ')), 3)
+
+
+class CreatePollTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='secret'
+        )
+
+    def create(self):
+        return create_poll_with_choices(
+            Poll(creator=self.creator, title='Lunch?', status='active'), ['Pizza', 'Soup', 'Salad']
+        )
+
+    def test_poll_and_choices_are_created_together(self):
+        poll = self.create()
+        self.assertEqual(
+            list(poll.choices.order_by('order').values_list('text', flat=True)),
+            ['Pizza', 'Soup', 'Salad'],
+        )
+        self.creator.refresh_from_db()
+        self.assertEqual(self.creator.polls_created, 1)
+        stats = CreatorStats.objects.get(user=self.creator)
+        self.assertEqual((stats.total_polls, stats.active_polls), (1, 1))
+
+    def test_over_quota_creates_nothing(self):
+        self.create()
+        with self.assertRaises(ValidationError):
+            self.create()
+        self.assertEqual(Poll.objects.count(), 1)
+
+    def test_failed_choice_insert_rolls_back_the_quota(self):
+        with mock.patch.object(Choice.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.create()
+        self.creator.refresh_from_db()
+        self.assertEqual(self.creator.polls_created, 0)
+        self.assertFalse(Poll.objects.exists())
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='secret', is_premium=True
+        )
+        self.client.force_login(self.creator)
+        self.url = reverse('polls:bulk_create_polls_api')
+
+    def definitions(self, count):
+        return [{'title': f"Poll {i}", 'choices': ['Yes', 'No']} for i in range(count)]
+
+    def test_json_import_creates_every_poll(self):
+        response = self.client.post(self.url, self.definitions(3), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        slugs = response.json()['created']
+        self.assertEqual(len(set(slugs)), 3)
+        self.assertEqual(Choice.objects.filter(poll__slug__in=slugs).count(), 6)
+        self.creator.refresh_from_db()
+        self.assertEqual(self.creator.polls_created, 3)
+
+    def test_one_invalid_row_creates_nothing(self):
+        definitions = self.definitions(3)
+        definitions[1]['choices'] = ['Only one']
+        response = self.client.post(self.url, definitions, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.json()['errors']], [2])
+        self.assertFalse(Poll.objects.exists())
+
+    def test_quota_is_checked_for_the_whole_batch(self):
+        self.creator.polls_created = 49
+        self.creator.save()
+        report = import_polls(self.creator, self.definitions(2))
+        self.assertTrue(report['errors'])
+        self.assertFalse(Poll.objects.exists())
+
+        report = import_polls(self.creator, self.definitions(2), enforce_quota=False)
+        self.assertEqual(len(report['created']), 2)
+        self.creator.refresh_from_db()
+        self.assertEqual(self.creator.polls_created, 51)
+
+    def test_csv_definitions(self):
+        rows = parse_definitions(
+            "title,choices,require_login\nLunch?,Pizza|Soup,yes\nDinner?,Pasta|Rice,\n", 'text/csv'
+        )
+        self.assertEqual(rows[0]['choices'], ['Pizza', 'Soup'])
+        self.assertIs(rows[0]['require_login'], True)
+        self.assertNotIn('require_login', rows[1])
+
+
+class SlugPermutationTests(SimpleTestCase):
+    def test_permutation_is_reversible(self):
+        key = b'k' * 32
+        for number in [0, 1, 2, 12345, len(SLUG_ALPHABET) ** SLUG_LENGTH - 1]:
+            permuted = permute(number, key)
+            self.assertLess(permuted, len(SLUG_ALPHABET) ** SLUG_LENGTH)
+            self.assertEqual(unpermute(permuted, key), number)
+
+    def test_consecutive_numbers_do_not_collide(self):
+        key = b'k' * 32
+        self.assertEqual(len({permute(number, key) for number in range(5000)}), 5000)
+
+
+class AllocateSlugsTests(TestCase):
+    def test_slugs_are_unique_across_blocks(self):
+        slugs = allocate_slugs(SLUG_BLOCK_SIZE * 2 + 5) + allocate_slugs(3)
+        self.assertEqual(len(set(slugs)), len(slugs))
+        for slug in slugs:
+            self.assertEqual(len(slug), SLUG_LENGTH)
+            self.assertTrue(set(slug) <= set(SLUG_ALPHABET))
+
+    def test_saved_polls_get_a_slug(self):
+        creator = User.objects.create_user(username='creator', email='c@example.com', password='x')
+        first = Poll.objects.create(creator=creator, title='Lunch?')
+        second = Poll.objects.create(creator=creator, title='Lunch?')
+        self.assertNotEqual(first.slug, second.slug)
+
+
+class ExpirePollsTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.later = Poll.objects.create(
+            creator=self.creator, title='Dinner?', status='active', expires_at=now + timedelta(hours=1),
+        )
+        self.stale = Poll.objects.create(creator=self.creator, title='Breakfast?', status='active')
+        # Saving a poll already past its expiry would expire it on the spot
+        Poll.objects.filter(pk=self.poll.pk).update(expires_at=now - timedelta(minutes=5))
+        Poll.objects.filter(pk=self.stale.pk).update(expires_at=now - timedelta(minutes=1))
+        get_creator_stats(self.creator)
+
+    def test_sweep_expires_every_due_poll_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_due_polls(batch_size=1), 2)
+        statuses = dict(Poll.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[self.poll.pk], statuses[self.stale.pk], statuses[self.later.pk]],
+            ['expired', 'expired', 'active'],
+        )
+        self.assertEqual(CreatorStats.objects.get(user=self.creator).active_polls, 1)
+        self.poll.refresh_from_db()
+        self.assertIsNotNone(self.poll.closed_at)
+        self.assertTrue(ResultsSnapshot.objects.filter(poll=self.poll).exists())
+
+    def test_next_expiry_is_the_soonest_active_poll(self):
+        expire_due_polls()
+        self.assertEqual(next_expiry(), self.later.expires_at)
+
+    def test_command_reports_expired_polls(self):
+        out = io.StringIO()
+        call_command('expire_polls', stdout=out)
+        self.assertIn('Expired 2 polls', out.getvalue())
+        self.assertEqual(expire_due_polls(), 0)
+
+
+class ResultsSnapshotTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(2):
+            cast_vote(self.poll, [self.choices[0].id], None, f"192.0.2.{i}", 'session', '')
+        self.url = reverse('polls:poll_results_api', args=[self.poll.slug])
+
+    def close(self):
+        Poll.objects.filter(pk=self.poll.pk).update(status='closed', is_active=False)
+        self.poll.refresh_from_db()
+        freeze_results([self.poll.pk])
+
+    def test_live_polls_are_not_cached(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('ETag', response)
+        self.assertIsNone(get_results_snapshot(self.poll))
+
+    def test_closed_polls_serve_frozen_results_with_an_etag(self):
+        self.close()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_votes'], 2)
+        self.assertIn('public', response['Cache-Control'])
+
+        etag = response['ETag']
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], etag)
+
+    def test_closed_poll_is_frozen_on_first_read(self):
+        Poll.objects.filter(pk=self.poll.pk).update(status='closed', is_active=False)
+        self.poll.refresh_from_db()
+        document, _ = get_results_snapshot(self.poll)
+        self.assertEqual(document['total_votes'], 2)
+        self.assertTrue(ResultsSnapshot.objects.filter(poll=self.poll).exists())
+
+    def test_snapshot_follows_votes_counted_after_closing(self):
+        self.close()
+        _, etag = get_results_snapshot(self.poll)
+        # Reopened and closed again behind the lifecycle hooks' back
+        Poll.objects.filter(pk=self.poll.pk).update(total_votes=3)
+        self.poll.refresh_from_db()
+        document, new_etag = get_results_snapshot(self.poll)
+        self.assertEqual(document['total_votes'], 3)
+        self.assertNotEqual(new_etag, etag)
+
+    def test_reopening_discards_the_snapshot(self):
+        self.close()
+        discard_results([self.poll.pk])
+        self.assertFalse(ResultsSnapshot.objects.filter(poll=self.poll).exists())
+
+
+class PurgePollTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            cast_vote(self.poll, [self.choices[i % 2].id], None, f"192.0.2.{i}", 'session', '')
+        self.poll.refresh_from_db()
+        get_creator_stats(self.creator)
+
+    def test_delete_hides_the_poll_at_once(self):
+        self.assertTrue(delete_poll(self.poll))
+        self.assertFalse(delete_poll(self.poll))
+        self.assertFalse(Poll.objects.filter(pk=self.poll.pk).exists())
+        self.assertEqual(list(pending_purges()), [self.poll.pk])
+        stats = CreatorStats.objects.get(user=self.creator)
+        self.assertEqual((stats.total_polls, stats.total_votes), (0, 0))
+
+    def test_purge_removes_everything_in_batches(self):
+        delete_poll(self.poll)
+        counts = purge_poll(self.poll.pk, batch_size=2, pause=0)
+        self.assertEqual((counts['votes'], counts['choices']), (5, 2))
+        self.assertFalse(Poll.all_objects.filter(pk=self.poll.pk).exists())
+        self.assertFalse(Vote.objects.filter(poll_id=self.poll.pk).exists())
+        self.assertEqual(list(pending_purges()), [])
+
+
+class ArchiveTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_override = override_settings(MEDIA_ROOT=media)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        for i in range(5):
+            cast_vote(self.poll, [self.choices[i % 2].id], None, f"192.0.2.{i}", 'session', 'Mozilla/5.0')
+        self.vote_ids = list(Vote.objects.order_by('id').values_list('id', flat=True))
+        Poll.objects.filter(pk=self.poll.pk).update(
+            status='closed', is_active=False, pii_pruned_at=timezone.now(),
+            updated_at=timezone.now() - timedelta(days=100),
+        )
+        self.poll.refresh_from_db()
+
+    def test_votes_move_to_a_verified_archive(self):
+        self.assertEqual(list(archivable_polls()), [self.poll])
+        archive = archive_poll(self.poll, row_group=2, batch_size=2, pause=0)
+        self.assertEqual((archive.row_count, archive.max_vote_id), (5, self.vote_ids[-1]))
+        self.assertIsNotNone(archive.verified_at)
+        self.assertIsNotNone(archive.purged_at)
+        self.assertFalse(Vote.objects.filter(poll=self.poll).exists())
+        self.assertEqual(list(archivable_polls()), [])
+
+        votes = list(read_archive(archive))
+        self.assertEqual([vote['id'] for vote in votes], self.vote_ids)
+        self.assertEqual(votes[0]['user_agent'], 'Mozilla/5.0')
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.total_votes, 5)
+
+    def test_readers_see_archived_then_live_votes(self):
+        archive_poll(self.poll, row_group=2, batch_size=2, pause=0)
+        Poll.objects.filter(pk=self.poll.pk).update(status='active', is_active=True)
+        self.poll.refresh_from_db()
+        cast_vote(self.poll, [self.choices[0].id], None, '192.0.2.9', 'session', '')
+        late = Vote.objects.get(poll=self.poll).id
+
+        chunks = list(iter_poll_votes(self.poll, after_id=self.vote_ids[1], chunk_size=2))
+        ids = [vote['id'] for chunk in chunks for vote in chunk]
+        self.assertEqual(ids, self.vote_ids[2:] + [late])
+
+    def test_tampered_archive_is_refused(self):
+        archive = archive_poll(self.poll, pause=0)
+        archive.checksum = '0' * 64
+        with self.assertRaises(ArchiveMismatch):
+            verify_archive(archive)
+
+    def test_run_interrupted_before_verification_starts_over(self):
+        with mock.patch('polls.archive.verify_archive', side_effect=ArchiveMismatch):
+            with self.assertRaises(ArchiveMismatch):
+                archive_poll(self.poll, pause=0)
+        self.assertIsNone(VoteArchive.objects.get(poll=self.poll).verified_at)
+        self.assertEqual(Vote.objects.filter(poll=self.poll).count(), 5)
+
+        archive = archive_poll(self.poll, pause=0)
+        self.assertEqual(archive.row_count, 5)
+        self.assertEqual(VoteArchive.objects.filter(poll=self.poll).count(), 1)
+
+
+IPHONE = 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148'
+
+
+class ClassifyDeviceTests(SimpleTestCase):
+    def test_device_classes(self):
+        cases = {
+            IPHONE: 'mobile',
+            'Mozilla/5.0 (Linux; Android 14; SM-X710) AppleWebKit/537.36 Safari/537.36': 'tablet',
+            'Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 Mobile Safari/537.36': 'mobile',
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/126.0': 'desktop',
+            'facebookexternalhit/1.1': 'bot',
+            'curl/8.4.0': 'bot',
+            '': 'other',
+        }
+        for text, device in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(classify_device(text), device)
+
+
+class InternUserAgentTests(TestCase):
+    def setUp(self):
+        clear_cache()
+        self.addCleanup(clear_cache)
+
+    def test_same_header_shares_one_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = intern_user_agent(IPHONE)
+        with self.assertNumQueries(0):
+            self.assertEqual(intern_user_agent(IPHONE), first)
+        agent = UserAgent.objects.get()
+        self.assertEqual((agent.text, agent.device_class), (IPHONE, 'mobile'))
+
+    def test_ids_are_cached_only_after_commit(self):
+        intern_user_agent(IPHONE)
+        # The commit never ran, so the id may not exist: ask the database again
+        with self.assertNumQueries(1):
+            intern_user_agent(IPHONE)
+
+    def test_headers_are_truncated_and_blank_ones_skipped(self):
+        self.assertIsNone(intern_user_agent(''))
+        self.assertIsNone(intern_user_agent(None))
+        pk = intern_user_agent('x' * (USER_AGENT_MAX_LENGTH + 50))
+        self.assertEqual(len(UserAgent.objects.get(pk=pk).text), USER_AGENT_MAX_LENGTH)
+        self.assertEqual(intern_user_agent('x' * USER_AGENT_MAX_LENGTH), pk)
+
+    def test_votes_reference_the_interned_agent(self):
+        creator = User.objects.create_user(username='creator', email='c@example.com', password='x')
+        poll = Poll.objects.create(creator=creator, title='Lunch?', status='active')
+        choice = Choice.objects.create(poll=poll, text='Yes')
+        cast_vote(poll, [choice.id], None, '192.0.2.1', 'session', IPHONE)
+        self.assertEqual(Vote.objects.get().user_agent.text, IPHONE)
+
+
+class VoterDataRetentionTests(PollTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            cast_vote(self.poll, [self.choices[0].id], None, f"192.0.2.{i}", f"session-{i}", IPHONE)
+        Poll.objects.filter(pk=self.poll.pk).update(
+            status='closed', is_active=False, closed_at=timezone.now() - timedelta(days=40),
+        )
+        self.poll.refresh_from_db()
+
+    def test_polls_are_due_once_their_retention_window_passes(self):
+        recent = Poll.objects.create(creator=self.creator, title='Dinner?', status='closed')
+        Poll.objects.filter(pk=recent.pk).update(closed_at=timezone.now() - timedelta(days=10))
+        self.assertEqual(list(polls_due_for_pruning()), [self.poll])
+
+        Poll.objects.filter(pk=recent.pk).update(pii_retention_days=5)
+        self.assertEqual(list(polls_due_for_pruning()), [self.poll, recent])
+
+    def test_hash_mode_keeps_voters_apart(self):
+        self.assertEqual(prune_poll_pii(self.poll, batch_size=2, pause=0, mode='hash'), 5)
+        votes = Vote.objects.filter(poll=self.poll)
+        self.assertEqual(set(votes.values_list('voter_ip', 'user_agent')), {(None, None)})
+        sessions = set(votes.values_list('voter_session', flat=True))
+        self.assertEqual(len(sessions), 5)
+        self.assertFalse(sessions & {f"session-{i}" for i in range(5)})
+
+        self.poll.refresh_from_db()
+        self.assertIsNotNone(self.poll.pii_pruned_at)
+        self.assertEqual(list(polls_due_for_pruning()), [])
+        self.assertEqual(prune_poll_pii(self.poll, pause=0), 0)
+
+    def test_null_mode_clears_sessions(self):
+        prune_poll_pii(self.poll, pause=0, mode='null')
+        self.assertEqual(set(Vote.objects.values_list('voter_session', flat=True)), {''})
+
+    def test_archives_written_before_pruning_are_scrubbed(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        with override_settings(MEDIA_ROOT=media):
+            archive_poll(self.poll, pause=0)
+            self.assertEqual(prune_poll_pii(self.poll, pause=0), 5)
+            archive = VoteArchive.objects.get(poll=self.poll)
+            self.assertIsNotNone(archive.pii_pruned_at)
+            votes = list(read_archive(archive))
+        self.assertEqual({(vote['voter_ip'], vote['user_agent']) for vote in votes}, {(None, '')})
@@ -12,6 +12,8 @@ urlpatterns = [
     # AJAX endpoints for real-time updates (Day 15-16)
     path('api/poll/<slug:slug>/results/', views.poll_results_api, name='poll_results_api'),
     path('api/poll/<slug:slug>/vote/', views.vote_api, name='vote_api'),
+    path('api/poll/<slug:slug>/votes/', views.vote_history_api, name='vote_history_api'),
+    path('api/polls/bulk/', views.bulk_create_polls_api, name='bulk_create_polls_api'),
     
     # Admin/management URLs
     path('poll/<slug:slug>/analytics/', views.poll_analytics, name='poll_analytics'),
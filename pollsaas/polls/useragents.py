@@ -0,0 +1,114 @@
+"""
+Interned user-agent strings.
+
+Votes reference a ``UserAgent`` row instead of carrying the full header;
+a few hundred distinct strings (mostly in-app browsers) cover nearly all
+traffic. ``intern_user_agent`` maps a header to its row id through a
+bounded in-process LRU and only touches the database on a miss. Ids are
+remembered once the surrounding transaction commits, so a rolled-back
+insert never leaves a dangling id in the cache.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import UserAgent
+
+USER_AGENT_MAX_LENGTH = 500
+USER_AGENT_CACHE_SIZE = getattr(settings, 'USER_AGENT_CACHE_SIZE', 2048)
+
+_BOT = re.compile(r'bot|crawl|spider|slurp|preview|facebookexternalhit|curl|wget|python-requests', re.I)
+_TABLET = re.compile(r'ipad|tablet|kindle|silk|playbook', re.I)
+_MOBILE = re.compile(r'mobi|iphone|ipod|android|windows phone|opera mini', re.I)
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def ua_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def classify_device(text):
+    """Coarse device class of a user-agent string"""
+    if not text:
+        return 'other'
+    if _BOT.search(text):
+        return 'bot'
+    if _TABLET.search(text) or ('android' in text.lower() and 'mobile' not in text.lower()):
+        return 'tablet'
+    if _MOBILE.search(text):
+        return 'mobile'
+    if re.search(r'windows|macintosh|x11|linux|cros', text, re.I):
+        return 'desktop'
+    return 'other'
+
+
+def _remember(key, pk):
+    with _lock:
+        _cache[key] = pk
+        _cache.move_to_end(key)
+        while len(_cache) > USER_AGENT_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def intern_user_agent(text):
+    """Return the ``UserAgent`` id for ``text`` (None for an empty header)"""
+    text = (text or '')[:USER_AGENT_MAX_LENGTH]
+    if not text:
+        return None
+
+    key = ua_hash(text)
+    with _lock:
+        pk = _cache.get(key)
+        if pk is not None:
+            _cache.move_to_end(key)
+            return pk
+
+    agent, _ = UserAgent.objects.get_or_create(
+        ua_hash=key, defaults={'text': text, 'device_class': classify_device(text)}
+    )
+    transaction.on_commit(lambda: _remember(key, agent.pk), using=connection.alias)
+    return agent.pk
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def storage_report():
+    """
+    Sizes behind the interning: distinct agents, votes referencing them,
+    the bytes their text would take inline and what the references cost.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT count(*), coalesce(sum(octet_length(ua.text)), 0)
+            FROM polls_vote v JOIN polls_useragent ua ON ua.id = v.user_agent_id
+            """
+        )
+        votes, inline_bytes = cursor.fetchone()
+        cursor.execute(
+            "SELECT count(*), pg_total_relation_size('polls_useragent') FROM polls_useragent"
+        )
+        agents, table_bytes = cursor.fetchone()
+        cursor.execute(
+            "SELECT device_class, count(*) FROM polls_useragent GROUP BY device_class ORDER BY 2 DESC"
+        )
+        devices = dict(cursor.fetchall())
+
+    reference_bytes = votes * 8 + table_bytes
+    return {
+        'agents': agents,
+        'votes': votes,
+        'inline_bytes': inline_bytes,
+        'reference_bytes': reference_bytes,
+        'saved_bytes': inline_bytes - reference_bytes,
+        'devices': devices,
+    }
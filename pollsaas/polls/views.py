@@ -1,22 +1,43 @@
+import json
+
 from django.shortcuts import render, redirect
 
 # Create your views here.
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.views.generic import CreateView, UpdateView, DetailView, ListView
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator
 from django.db.models import Q
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.urls import reverse
 from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import Poll, Choice, Vote
+from accounts.stats import bump_creator_stats
+
+from .models import Poll, Choice, Vote, VoteArchive
 from .forms import PollCreateForm, PollEditForm, QuickPollForm
+from .exports import enqueue_export
+from .idempotency import idempotent
+from .activity import recent_activity, record_activity
+from .bulk import import_polls, parse_definitions
+from .degradation import buffer_vote, is_critical, remember_results, stale_results
+from .pagination import InvalidCursor, KeysetPaginator
+from .lifecycle import MIN_PUBLISH_CHOICES, on_polls_closed, on_polls_reopened
+from .partitioning import lock_voter, poll_votes
+from .purge import delete_poll
+from .services import VoteRejected, cast_vote, parse_choice_ids, voter_key
+from .ratelimit import rate_limit
+from .useragents import intern_user_agent
+from .snapshots import SNAPSHOT_MAX_AGE, get_results_snapshot, results_payload, snapshot_response
+
+VOTE_HISTORY_PAGE_SIZE = 50
 
 
 
@@ -34,11 +55,16 @@ class PollCreateView(LoginRequiredMixin, CreateView):
         return kwargs
     
     def form_valid(self, form):
+        try:
+            self.object = form.save()
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
         messages.success(
             self.request, 
             f'🎉 Poll "{form.instance.title}" created successfully! Share it with your WhatsApp group.'
         )
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
     
     def form_invalid(self, form):
         messages.error(
@@ -60,13 +86,17 @@ def create_poll_view(request):
     if request.method == 'POST':
         form = PollCreateForm(request.POST, user=request.user)
         if form.is_valid():
-            poll = form.save()
-            messages.success(
-                request, 
-                f'🎉 Poll "{poll.title}" created successfully!'
-            )
-            return redirect('polls:poll_success', slug=poll.slug)
-        else:
+            try:
+                poll = form.save()
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                messages.success(
+                    request, 
+                    f'🎉 Poll "{poll.title}" created successfully!'
+                )
+                return redirect('polls:poll_success', slug=poll.slug)
+        if form.errors:
             messages.error(
                 request,
                 'Please fix the errors below and try again.'
@@ -75,8 +105,8 @@ def create_poll_view(request):
         form = PollCreateForm(user=request.user)
     
     # Get user's existing polls count for context
-    user_polls_count = Poll.objects.filter(creator=request.user).count()
-    max_polls = 50 if request.user.is_premium else 1
+    user_polls_count = request.user.polls_created
+    max_polls = request.user.poll_limit
     remaining_polls = max_polls - user_polls_count
     
     context = {
@@ -98,13 +128,17 @@ def quick_poll_view(request):
     if request.method == 'POST':
         form = QuickPollForm(request.POST)
         if form.is_valid():
-            poll = form.create_poll(request.user)
-            messages.success(
-                request,
-                f'✨ Quick poll "{poll.title}" created! Ready to share.'
-            )
-            return redirect('polls:poll_success', slug=poll.slug)
-        else:
+            try:
+                poll = form.create_poll(request.user)
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                messages.success(
+                    request,
+                    f'✨ Quick poll "{poll.title}" created! Ready to share.'
+                )
+                return redirect('polls:poll_success', slug=poll.slug)
+        if form.errors:
             messages.error(request, 'Please fix the errors below.')
     else:
         form = QuickPollForm()
@@ -166,14 +200,15 @@ def publish_poll_view(request, slug):
         messages.error(request, 'Poll is already published.')
         return redirect('polls:poll_detail', slug=slug)
     
-    # Validate poll has choices
-    if poll.choices.count() < 2:
-        messages.error(request, 'Poll must have at least 2 choices before publishing.')
+    # Validate poll has choices (the scheduler applies the same rule)
+    if poll.choices.filter(is_active=True).count() < MIN_PUBLISH_CHOICES:
+        messages.error(request, f'Poll must have at least {MIN_PUBLISH_CHOICES} choices before publishing.')
         return redirect('polls:poll_preview', slug=slug)
     
     poll.status = 'active'
     poll.is_active = True
     poll.save()
+    bump_creator_stats(request.user.id, active=1)
     
     messages.success(request, f'✅ Poll "{poll.title}" is now live!')
     return redirect('polls:poll_success', slug=slug)
@@ -224,7 +259,7 @@ def poll_detail_view(request, slug):
         return redirect('polls:dashboard')
     
     choices = poll.choices.all()
-    recent_votes = poll.votes.select_related('choice', 'voter').order_by('-voted_at')[:10]
+    recent_votes = recent_activity(poll)
     
     context = {
         'poll': poll,
@@ -247,11 +282,10 @@ def delete_poll_view(request, slug):
     poll = get_object_or_404(Poll, slug=slug, creator=request.user)
     
     poll_title = poll.title
-    poll.delete()
-    
-    # Update user's poll count
-    request.user.polls_created = max(0, request.user.polls_created - 1)
-    request.user.save(update_fields=['polls_created'])
+    # Hidden right away; votes and choices are purged in the background
+    if delete_poll(poll):
+        # Update user's poll count
+        request.user.release_poll_slots()
     
     messages.success(request, f'🗑️ Poll "{poll_title}" has been deleted.')
     return redirect('polls:dashboard')
@@ -266,6 +300,10 @@ def toggle_poll_status_view(request, slug):
     
     poll.is_active = not poll.is_active
     poll.save(update_fields=['is_active'])
+    if poll.is_active:
+        transaction.on_commit(lambda: on_polls_reopened([poll.id]))
+    else:
+        transaction.on_commit(lambda: on_polls_closed([poll.id]))
     
     status = "activated" if poll.is_active else "deactivated"
     messages.success(request, f'✅ Poll "{poll.title}" has been {status}.')
@@ -274,6 +312,7 @@ def toggle_poll_status_view(request, slug):
 
 
 @require_http_methods(["GET"])
+@rate_limit('results')
 def poll_stats_api(request, slug):
     """
     API endpoint for real-time poll statistics
@@ -284,6 +323,15 @@ def poll_stats_api(request, slug):
     if not poll.show_results and poll.creator != request.user:
         return JsonResponse({'error': 'Results not available'}, status=403)
     
+    snapshot = get_results_snapshot(poll)
+    if snapshot:
+        document, etag = snapshot
+        return snapshot_response(request, poll, results_payload(poll, document), etag)
+    
+    stale = stale_results(poll.id, 'stats')
+    if stale:
+        return JsonResponse(stale)
+    
     choices_data = []
     for choice in poll.choices.all():
         choices_data.append({
@@ -305,9 +353,11 @@ def poll_stats_api(request, slug):
         'last_updated': timezone.now().isoformat(),
     }
     
+    remember_results(poll.id, 'stats', data)
     return JsonResponse(data)
 
 
+@rate_limit('results')
 def poll_share_stats(request, slug):
     """
     Public stats for sharing (limited data)
@@ -317,6 +367,17 @@ def poll_share_stats(request, slug):
     if not poll.show_results:
         return JsonResponse({'error': 'Results not public'}, status=403)
     
+    snapshot = get_results_snapshot(poll)
+    if snapshot:
+        document, etag = snapshot
+        return snapshot_response(request, poll, {
+            'title': document['title'],
+            'total_votes': document['total_votes'],
+            'choices_count': len(document['choices']),
+            'is_active': False,
+            'created_at': document['created_at'][:10],
+        }, etag)
+    
     data = {
         'title': poll.title,
         'total_votes': poll.total_votes,
@@ -356,6 +417,7 @@ def results(request, slug):
     return HttpResponse(f"Results for: {poll.title} - Coming soon in Day 13-14!")
 
 # API endpoints (placeholders for Day 15-16)
+@rate_limit('results')
 def poll_results_api(request, slug):
     """API endpoint for real-time results"""
     poll = get_object_or_404(Poll, slug=slug)
@@ -364,7 +426,9 @@ def poll_results_api(request, slug):
         'message': 'Real-time API coming in Day 15-16!'
     })
 
+@idempotent('vote')
 @require_http_methods(["POST"])
+@rate_limit('vote')
 def vote_api(request, slug):
     """API endpoint for voting"""
     poll = get_object_or_404(Poll, slug=slug)
@@ -382,9 +446,31 @@ def poll_analytics(request, slug):
 
 @login_required
 def poll_export(request, slug):
-    """Export poll data (premium feature)"""
-    poll = get_object_or_404(Poll, slug=slug)
-    return HttpResponse(f"Export data for: {poll.title} - Coming in Day 25-28!")
+    """
+    Export poll votes as CSV (premium feature)
+
+    Exports are built in the background by ``process_exports``. Until the
+    file for the poll's current results version is ready this returns the
+    job's progress; once it is, the cached file is served directly.
+    """
+    poll = get_object_or_404(Poll, slug=slug, creator=request.user)
+    job = enqueue_export(poll, user=request.user)
+
+    if job.status == 'completed' and job.artifact:
+        return FileResponse(
+            job.artifact.open('rb'),
+            as_attachment=True,
+            filename=f"poll-{poll.slug}-votes.csv",
+            content_type='text/csv'
+        )
+
+    return JsonResponse({
+        'job_id': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+    }, status=202)
 
 
 def get_client_ip(request):
@@ -397,6 +483,12 @@ def get_client_ip(request):
     return ip
 
 
+def get_voter_key(request, client_ip, session_key):
+    """Identify a voter for duplicate-vote checks"""
+    voter = request.user if request.user.is_authenticated else None
+    return voter_key(voter, client_ip, session_key)
+
+
 def get_user_agent(request):
     """Extract user agent from request"""
     return request.META.get('HTTP_USER_AGENT', '')[:500]  # Limit length
@@ -436,12 +528,11 @@ def vote_view(request, slug):
     
     if request.user.is_authenticated:
         # Check by user
-        previous_votes = Vote.objects.filter(poll=poll, voter=request.user)
+        previous_votes = poll_votes(poll).filter(voter=request.user)
         has_voted = previous_votes.exists()
     else:
         # Check by IP and session for anonymous users
-        previous_votes = Vote.objects.filter(
-            poll=poll, 
+        previous_votes = poll_votes(poll).filter(
             voter_ip=client_ip,
             voter_session=session_key
         )
@@ -524,11 +615,11 @@ def handle_vote_submission(request, poll, client_ip, session_key):
         # Check for duplicate voting
         if not poll.allow_multiple_votes:
             existing_votes = None
+            lock_voter(poll.id, get_voter_key(request, client_ip, session_key))
             if request.user.is_authenticated:
-                existing_votes = Vote.objects.filter(poll=poll, voter=request.user)
+                existing_votes = poll_votes(poll).filter(voter=request.user)
             else:
-                existing_votes = Vote.objects.filter(
-                    poll=poll, 
+                existing_votes = poll_votes(poll).filter(
                     voter_ip=client_ip,
                     voter_session=session_key
                 )
@@ -542,7 +633,7 @@ def handle_vote_submission(request, poll, client_ip, session_key):
         
         # Create vote records
         votes_created = []
-        user_agent = get_user_agent(request)
+        user_agent_id = intern_user_agent(get_user_agent(request))
         
         for choice in valid_choices:
             vote = Vote.objects.create(
@@ -551,33 +642,34 @@ def handle_vote_submission(request, poll, client_ip, session_key):
                 voter=request.user if request.user.is_authenticated else None,
                 voter_ip=client_ip,
                 voter_session=session_key,
-                user_agent=user_agent,
+                user_agent_id=user_agent_id,
                 is_valid=True
             )
             votes_created.append(vote)
-            
-            # Increment choice vote count
-            choice.increment_votes()
         
-        # Update poll statistics
+        # Update poll statistics, then choice counts: the poll row is
+        # locked first, as retally_polls does
         poll.increment_vote_count()
+        for choice in valid_choices:
+            choice.increment_votes()
+        transaction.on_commit(lambda: record_activity(poll, votes_created))
         
         # Check if this is a new unique voter
         if request.user.is_authenticated:
             # Check if user has voted on this poll before
-            if not Vote.objects.filter(
-                poll=poll, 
+            new_voter = not poll_votes(poll).filter(
                 voter=request.user
-            ).exclude(id__in=[v.id for v in votes_created]).exists():
-                poll.increment_voter_count()
+            ).exclude(id__in=[v.id for v in votes_created]).exists()
         else:
             # Check if this IP/session has voted before
-            if not Vote.objects.filter(
-                poll=poll,
+            new_voter = not poll_votes(poll).filter(
                 voter_ip=client_ip,
                 voter_session=session_key
-            ).exclude(id__in=[v.id for v in votes_created]).exists():
-                poll.increment_voter_count()
+            ).exclude(id__in=[v.id for v in votes_created]).exists()
+        if new_voter:
+            poll.increment_voter_count()
+        
+        bump_creator_stats(poll.creator_id, votes=1, voters=int(new_voter))
         
         # Success message
         choice_names = ', '.join([choice.text for choice in valid_choices])
@@ -608,12 +700,11 @@ def vote_success_view(request, slug):
     # Get user's votes for this poll
     user_votes = []
     if request.user.is_authenticated:
-        user_votes = Vote.objects.filter(poll=poll, voter=request.user).select_related('choice')
+        user_votes = poll_votes(poll).filter(voter=request.user).select_related('choice')
     else:
         client_ip = get_client_ip(request)
         session_key = request.session.session_key
-        user_votes = Vote.objects.filter(
-            poll=poll,
+        user_votes = poll_votes(poll).filter(
             voter_ip=client_ip,
             voter_session=session_key
         ).select_related('choice')
@@ -645,35 +736,46 @@ def results_view(request, slug):
         messages.error(request, 'Results are not available for this poll.')
         return redirect('polls:vote', slug=poll.slug)
     
-    # Get choices with vote counts
-    choices = poll.choices.filter(is_active=True).order_by('order')
+    # Closed polls render their frozen results; there is no live feed
+    snapshot = get_results_snapshot(poll)
+    if snapshot:
+        choices = [
+            dict(choice, vote_percentage=choice['percentage'])
+            for choice in snapshot[0]['choices']
+        ]
+        labels = [choice['text'] for choice in choices]
+        counts = [choice['votes'] for choice in choices]
+        recent_votes = []
+    else:
+        # Get choices with vote counts
+        choices = poll.choices.filter(is_active=True).order_by('order')
+        labels = [choice.text for choice in choices]
+        counts = [choice.votes for choice in choices]
+        # Get recent votes for activity feed
+        recent_votes = recent_activity(poll)
     
     # Prepare data for charts
     chart_data = {
-        'labels': [choice.text for choice in choices],
-        'data': [choice.votes for choice in choices],
+        'labels': labels,
+        'data': counts,
         'backgroundColor': [
             '#25d366', '#128c7e', '#075e54', '#34ce57', '#1fa045',
             '#ffc107', '#fd7e14', '#dc3545', '#6f42c1', '#20c997'
         ][:len(choices)]
     }
     
-    # Get recent votes for activity feed
-    recent_votes = poll.votes.select_related('choice', 'voter').order_by('-voted_at')[:10]
-    
     # Check if current user has voted
     user_has_voted = False
     user_votes = []
     
     if request.user.is_authenticated:
-        user_votes = Vote.objects.filter(poll=poll, voter=request.user).select_related('choice')
+        user_votes = poll_votes(poll).filter(voter=request.user).select_related('choice')
         user_has_voted = user_votes.exists()
     else:
         client_ip = get_client_ip(request)
         session_key = request.session.session_key
         if session_key:
-            user_votes = Vote.objects.filter(
-                poll=poll,
+            user_votes = poll_votes(poll).filter(
                 voter_ip=client_ip,
                 voter_session=session_key
             ).select_related('choice')
@@ -692,10 +794,15 @@ def results_view(request, slug):
         'whatsapp_url': poll.get_whatsapp_share_url(),
     }
     
-    return render(request, 'polls/results.html', context)
+    response = render(request, 'polls/results.html', context)
+    if snapshot:
+        # The page also shows the visitor's own votes, so only their browser may cache it
+        patch_cache_control(response, private=True, max_age=SNAPSHOT_MAX_AGE)
+    return response
 
 
 @require_http_methods(["GET"])
+@rate_limit('results')
 def poll_results_api(request, slug):
     """
     API endpoint for real-time poll results (HTMX/AJAX)
@@ -711,6 +818,17 @@ def poll_results_api(request, slug):
     if not can_view_results:
         return JsonResponse({'error': 'Results not available'}, status=403)
     
+    # Closed polls serve their frozen results
+    snapshot = get_results_snapshot(poll)
+    if snapshot:
+        document, etag = snapshot
+        return snapshot_response(request, poll, results_payload(poll, document), etag)
+    
+    # While the database is struggling, serve the last live results
+    stale = stale_results(poll.id, 'results')
+    if stale:
+        return JsonResponse(stale)
+    
     # Get updated choice data
     choices_data = []
     for choice in poll.choices.filter(is_active=True).order_by('order'):
@@ -733,14 +851,89 @@ def poll_results_api(request, slug):
         'last_updated': timezone.now().isoformat(),
     }
     
+    remember_results(poll.id, 'results', data)
     return JsonResponse(data)
 
 
+@login_required
+@require_http_methods(["GET"])
+def vote_history_api(request, slug):
+    """
+    API endpoint for browsing a poll's vote history (creator only)
+
+    Paginated with a keyset cursor on (voted_at, id); pass the returned
+    ``next_cursor`` back as ``?cursor=`` to load more. Votes moved to cold
+    storage are not listed here (``archived`` is true); they remain in
+    CSV exports.
+    """
+    poll = get_object_or_404(Poll, slug=slug, creator=request.user)
+
+    paginator = KeysetPaginator(
+        poll_votes(poll).values(
+            'id', 'voted_at', 'choice__text', 'voter__username', 'is_valid'
+        ),
+        ordering=('-voted_at', '-id'),
+        per_page=VOTE_HISTORY_PAGE_SIZE,
+    )
+    try:
+        page = paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    votes_data = []
+    for vote in page:
+        votes_data.append({
+            'id': vote['id'],
+            'choice': vote['choice__text'],
+            'voter': vote['voter__username'] or 'Anonymous',
+            'voted_at': vote['voted_at'].isoformat(),
+            'is_valid': vote['is_valid'],
+        })
+
+    return JsonResponse({
+        'votes': votes_data,
+        'next_cursor': page.next_cursor,
+        'has_next': page.has_next,
+        'archived': VoteArchive.objects.filter(poll=poll, purged_at__isnull=False).exists(),
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_create_polls_api(request):
+    """
+    API endpoint for creating many polls at once (JSON or CSV body)
+
+    Every row is validated before anything is written; if any row fails,
+    nothing is created and the per-row errors are returned.
+    """
+    try:
+        definitions = parse_definitions(
+            request.body.decode('utf-8'), request.content_type or ''
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Could not parse poll definitions: {e}'
+        }, status=400)
+    
+    report = import_polls(request.user, definitions)
+    if report['errors']:
+        return JsonResponse({'success': False, **report}, status=400)
+    
+    return JsonResponse({'success': True, **report}, status=201)
+
+
 @csrf_exempt
+@idempotent('vote')
 @require_http_methods(["POST"])
+@rate_limit('vote')
 def vote_api(request, slug):
     """
     API endpoint for voting (for HTMX/AJAX submissions)
+
+    Send an ``Idempotency-Key`` header to make retries safe: a repeat
+    with the same key returns the original response.
     """
     poll = get_object_or_404(Poll, slug=slug)
     
@@ -775,6 +968,12 @@ def vote_api(request, slug):
                 'success': False,
                 'error': 'Please select at least one option.'
             }, status=400)
+
+        # Queued ballots are only checked against the poll when drained
+        try:
+            choice_ids = parse_choice_ids(choice_ids)
+        except VoteRejected as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
         
         # Get client info
         client_ip = get_client_ip(request)
@@ -783,74 +982,38 @@ def vote_api(request, slug):
             request.session.create()
             session_key = request.session.session_key
         
+        if is_critical():
+            # The database is saturated: queue the ballot for drain_vote_buffer
+            buffer_vote(
+                poll,
+                choice_ids,
+                request.user.pk if request.user.is_authenticated else None,
+                client_ip,
+                session_key,
+                get_user_agent(request),
+            )
+            return JsonResponse({
+                'success': True,
+                'queued': True,
+                'message': 'Your vote has been received and will be counted shortly.',
+                'redirect': reverse('polls:results', kwargs={'slug': slug}) if poll.show_results else None,
+            }, status=202)
+        
         # Process the vote using the same logic as regular form submission
-        with transaction.atomic():
-            # Validate choices exist and belong to this poll
-            valid_choices = Choice.objects.filter(
-                id__in=choice_ids,
-                poll=poll,
-                is_active=True
+        try:
+            valid_choices = cast_vote(
+                poll,
+                choice_ids,
+                request.user if request.user.is_authenticated else None,
+                client_ip,
+                session_key,
+                get_user_agent(request),
             )
-            
-            if len(valid_choices) != len(choice_ids):
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Invalid choice selected.'
-                }, status=400)
-            
-            # Check for duplicate voting
-            if not poll.allow_multiple_votes:
-                existing_votes = None
-                if request.user.is_authenticated:
-                    existing_votes = Vote.objects.filter(poll=poll, voter=request.user)
-                else:
-                    existing_votes = Vote.objects.filter(
-                        poll=poll,
-                        voter_ip=client_ip,
-                        voter_session=session_key
-                    )
-                
-                if existing_votes.exists():
-                    return JsonResponse({
-                        'success': False,
-                        'error': 'You have already voted on this poll.',
-                        'redirect': reverse('polls:results', kwargs={'slug': slug}) if poll.show_results else None
-                    }, status=400)
-            
-            # Create votes
-            votes_created = []
-            user_agent = get_user_agent(request)
-            
-            for choice in valid_choices:
-                vote = Vote.objects.create(
-                    poll=poll,
-                    choice=choice,
-                    voter=request.user if request.user.is_authenticated else None,
-                    voter_ip=client_ip,
-                    voter_session=session_key,
-                    user_agent=user_agent,
-                    is_valid=True
-                )
-                votes_created.append(vote)
-                choice.increment_votes()
-            
-            # Update poll stats
-            poll.increment_vote_count()
-            
-            # Update unique voter count if needed
-            if request.user.is_authenticated:
-                if not Vote.objects.filter(
-                    poll=poll,
-                    voter=request.user
-                ).exclude(id__in=[v.id for v in votes_created]).exists():
-                    poll.increment_voter_count()
-            else:
-                if not Vote.objects.filter(
-                    poll=poll,
-                    voter_ip=client_ip,
-                    voter_session=session_key
-                ).exclude(id__in=[v.id for v in votes_created]).exists():
-                    poll.increment_voter_count()
+        except VoteRejected as e:
+            data = {'success': False, 'error': str(e)}
+            if e.duplicate:
+                data['redirect'] = reverse('polls:results', kwargs={'slug': slug}) if poll.show_results else None
+            return JsonResponse(data, status=400)
         
         # Return success response
         choice_names = [choice.text for choice in valid_choices]
@@ -891,11 +1054,16 @@ class PollCreateView(LoginRequiredMixin, CreateView):
         return kwargs
     
     def form_valid(self, form):
+        try:
+            self.object = form.save()
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
         messages.success(
             self.request, 
             f'🎉 Poll "{form.instance.title}" created successfully! Share it with your WhatsApp group.'
         )
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
     
     def form_invalid(self, form):
         messages.error(
@@ -916,13 +1084,17 @@ def create_poll_view(request):
     if request.method == 'POST':
         form = PollCreateForm(request.POST, user=request.user)
         if form.is_valid():
-            poll = form.save()
-            messages.success(
-                request, 
-                f'🎉 Poll "{poll.title}" created successfully!'
-            )
-            return redirect('polls:poll_success', slug=poll.slug)
-        else:
+            try:
+                poll = form.save()
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                messages.success(
+                    request, 
+                    f'🎉 Poll "{poll.title}" created successfully!'
+                )
+                return redirect('polls:poll_success', slug=poll.slug)
+        if form.errors:
             messages.error(
                 request,
                 'Please fix the errors below and try again.'
@@ -931,8 +1103,8 @@ def create_poll_view(request):
         form = PollCreateForm(user=request.user)
     
     # Get user's existing polls count for context
-    user_polls_count = Poll.objects.filter(creator=request.user).count()
-    max_polls = 50 if request.user.is_premium else 1
+    user_polls_count = request.user.polls_created
+    max_polls = request.user.poll_limit
     remaining_polls = max_polls - user_polls_count
     
     context = {
@@ -954,13 +1126,17 @@ def quick_poll_view(request):
     if request.method == 'POST':
         form = QuickPollForm(request.POST)
         if form.is_valid():
-            poll = form.create_poll(request.user)
-            messages.success(
-                request,
-                f'✨ Quick poll "{poll.title}" created! Ready to share.'
-            )
-            return redirect('polls:poll_success', slug=poll.slug)
-        else:
+            try:
+                poll = form.create_poll(request.user)
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                messages.success(
+                    request,
+                    f'✨ Quick poll "{poll.title}" created! Ready to share.'
+                )
+                return redirect('polls:poll_success', slug=poll.slug)
+        if form.errors:
             messages.error(request, 'Please fix the errors below.')
     else:
         form = QuickPollForm()
@@ -1007,7 +1183,7 @@ def poll_detail_view(request, slug):
         return redirect('polls:dashboard')
     
     choices = poll.choices.all()
-    recent_votes = poll.votes.select_related('choice', 'voter').order_by('-voted_at')[:10]
+    recent_votes = recent_activity(poll)
     
     context = {
         'poll': poll,
@@ -1029,11 +1205,10 @@ def delete_poll_view(request, slug):
     poll = get_object_or_404(Poll, slug=slug, creator=request.user)
     
     poll_title = poll.title
-    poll.delete()
-    
-    # Update user's poll count
-    request.user.polls_created = max(0, request.user.polls_created - 1)
-    request.user.save(update_fields=['polls_created'])
+    # Hidden right away; votes and choices are purged in the background
+    if delete_poll(poll):
+        # Update user's poll count
+        request.user.release_poll_slots()
     
     messages.success(request, f'🗑️ Poll "{poll_title}" has been deleted.')
     return redirect('polls:dashboard')
@@ -1047,6 +1222,10 @@ def toggle_poll_status_view(request, slug):
     
     poll.is_active = not poll.is_active
     poll.save(update_fields=['is_active'])
+    if poll.is_active:
+        transaction.on_commit(lambda: on_polls_reopened([poll.id]))
+    else:
+        transaction.on_commit(lambda: on_polls_closed([poll.id]))
     
     status = "activated" if poll.is_active else "deactivated"
     messages.success(request, f'✅ Poll "{poll.title}" has been {status}.')
@@ -1055,6 +1234,7 @@ def toggle_poll_status_view(request, slug):
 
 
 @require_http_methods(["GET"])
+@rate_limit('results')
 def poll_stats_api(request, slug):
     """API endpoint for poll statistics"""
     poll = get_object_or_404(Poll, slug=slug)
@@ -1063,6 +1243,15 @@ def poll_stats_api(request, slug):
     if not poll.show_results and poll.creator != request.user:
         return JsonResponse({'error': 'Results not available'}, status=403)
     
+    snapshot = get_results_snapshot(poll)
+    if snapshot:
+        document, etag = snapshot
+        return snapshot_response(request, poll, results_payload(poll, document), etag)
+    
+    stale = stale_results(poll.id, 'stats')
+    if stale:
+        return JsonResponse(stale)
+    
     choices_data = []
     for choice in poll.choices.all():
         choices_data.append({
@@ -1084,6 +1273,7 @@ def poll_stats_api(request, slug):
         'last_updated': timezone.now().isoformat(),
     }
     
+    remember_results(poll.id, 'stats', data)
     return JsonResponse(data)
 
 
@@ -1100,6 +1290,7 @@ def poll_delete(request, slug):
     return HttpResponse(f"Delete poll: {poll.title} - Coming soon!")
 
 
+@rate_limit('results')
 def poll_share_stats(request, slug):
     """Public stats for sharing (limited data)"""
     poll = get_object_or_404(Poll, slug=slug)
@@ -1107,6 +1298,17 @@ def poll_share_stats(request, slug):
     if not poll.show_results:
         return JsonResponse({'error': 'Results not public'}, status=403)
     
+    snapshot = get_results_snapshot(poll)
+    if snapshot:
+        document, etag = snapshot
+        return snapshot_response(request, poll, {
+            'title': document['title'],
+            'total_votes': document['total_votes'],
+            'choices_count': len(document['choices']),
+            'is_active': False,
+            'created_at': document['created_at'][:10],
+        }, etag)
+    
     data = {
         'title': poll.title,
         'total_votes': poll.total_votes,